@@ -0,0 +1,180 @@
+"""
+盘中触线预警
+
+在盘前触线价格表 (calASM_premarket) 之上盯盘: 每隔 interval 秒拉一次全市场实时快照
+与全部基准指数的实时点位 (各一次请求)，按实时指数重新折算触线价格，
+把自选股的现价与 10日 / 30日 触线价格整体向量比较:
+    - 临近: 允许涨幅 <= near_pct%
+    - 触发: 区间偏离已达阈值
+只在状态升级时 (无 -> 临近 -> 触发) 发出一次预警，回落后再次升级会重新预警。
+预警同时写入只追加的日志文件 alerts/alerts_日期.log，并回调给 GUI。
+
+一次轮询 = 一次快照请求 + 一次 O(股票数) 的数组比较，2000 只股票的比较耗时在毫秒以内。
+
+用法:
+    python calASM_alert.py --interval 3 --near 5 [--codes 600372,002149] [--table cache/premarket/xxx.npz]
+"""
+import argparse
+import os
+import threading
+import time
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from calASM_data import fetch_index_spot, fetch_spot_prices, index_spot_level, trading_days_between
+from calASM_premarket import TriggerTable
+from calASM_symbols import parse_codes
+
+ALERT_DIR = "alerts"
+DEFAULT_INTERVAL = 3.0
+DEFAULT_NEAR_PCT = 5.0
+
+LEVEL_NONE, LEVEL_NEAR, LEVEL_HIT = 0, 1, 2
+LEVEL_TEXT = {LEVEL_NEAR: "临近触线", LEVEL_HIT: "已触线"}
+
+
+class AlertEngine:
+    """按触线价格表整体比较现价，并记住每只股票、每条规则上一次的预警级别"""
+
+    def __init__(self, table, codes=None, near_pct=DEFAULT_NEAR_PCT, k=1, log_path=None):
+        self.table = table
+        codes = table.codes if codes is None else [c for c in codes if c in table]
+        self.codes = list(codes)
+        self.rows = np.array([table.row[c] for c in self.codes], dtype=np.int64)
+        self.near_pct = near_pct
+        self.k = min(max(k, 1), table.horizon)
+        self.level = np.zeros((len(table.rules), len(self.codes)), dtype=np.int8)
+        self.log_path = log_path or os.path.join(ALERT_DIR, f"alerts_{datetime.now().strftime('%Y%m%d')}.log")
+        self._index = pd.Index(self.codes)
+        self._index_codes = [table.index_codes[r] for r in self.rows]
+
+    def index_levels(self, index_spot):
+        """各股票对应基准指数的实时点位；取不到的指数按最新收盘 (指数不变)"""
+        if index_spot is None:
+            return None
+        levels = {c: index_spot_level(index_spot, c) for c in set(self._index_codes)}
+        return np.array([levels[c] if levels[c] is not None else self.table.index_close[r]
+                         for c, r in zip(self._index_codes, self.rows)], dtype=np.float64)
+
+    def check(self, prices, index_spot=None):
+        """
+        prices: Series[代码 -> 现价] (全市场快照即可，多余代码忽略)
+        index_spot: Series[指数代码 -> 实时点位]，缺省按指数不变
+        返回本次新产生的预警 [dict(time, code, name, rule, level, price, trigger_price, room_pct, deviation)]
+        """
+        live = prices.reindex(self._index).to_numpy(dtype=np.float64)
+        res = self.table.evaluate(live, self.index_levels(index_spot), k=self.k, rows=self.rows)
+        now = datetime.now().strftime("%H:%M:%S")
+        alerts = []
+        for r, (rule, v) in enumerate(res.items()):
+            level = np.where(v["triggered"], LEVEL_HIT,
+                             np.where(v["room_pct"] <= self.near_pct, LEVEL_NEAR, LEVEL_NONE)).astype(np.int8)
+            # 没有报价 (停牌/未取到) 的股票保持原状态
+            level = np.where(np.isnan(live) | np.isnan(v["trigger_price"]), self.level[r], level)
+            for j in np.flatnonzero(level > self.level[r]):
+                alerts.append({
+                    "time": now, "code": self.codes[j], "name": self.table.names[self.rows[j]],
+                    "rule": rule, "level": int(level[j]), "price": float(live[j]),
+                    "trigger_price": float(v["trigger_price"][j]),
+                    "room_pct": float(v["room_pct"][j]), "deviation": float(v["deviation"][j]),
+                })
+            self.level[r] = level
+        if alerts:
+            self.append_log(alerts)
+        return alerts
+
+    def append_log(self, alerts):
+        try:
+            os.makedirs(os.path.dirname(self.log_path) or ".", exist_ok=True)
+            with open(self.log_path, "a", encoding="utf-8") as f:
+                for a in alerts:
+                    f.write(format_alert(a) + "\n")
+        except Exception as e:
+            print(f"写入预警日志失败: {e}")
+
+
+def format_alert(a):
+    days, threshold = a["rule"]
+    return (f"[{a['time']}] {LEVEL_TEXT[a['level']]} {a['name']}({a['code']}) {days}日({threshold:.0f}%) "
+            f"现价 {a['price']:.2f} | 触线价 {a['trigger_price']:.2f} | "
+            f"距触线 {a['room_pct']:.2f}% | 偏离 {a['deviation']:.2f}%")
+
+
+def current_k(table, today=None):
+    """触线价格表日期到今天相隔的交易日数，即今天对应的 T+k"""
+    today = today or datetime.now().strftime("%Y%m%d")
+    return max(1, trading_days_between(table.date, today))
+
+
+class AlertWatcher(threading.Thread):
+    """
+    后台轮询线程: fetch() 返回快照 Series，fetch_index() 返回指数实时点位 Series (None 表示不用)，
+    on_alert(list) 接收新预警
+    """
+
+    def __init__(self, engine, interval=DEFAULT_INTERVAL, on_alert=None, on_error=None, fetch=fetch_spot_prices,
+                 fetch_index=fetch_index_spot):
+        super().__init__(daemon=True)
+        self.engine = engine
+        self.interval = interval
+        self.on_alert = on_alert
+        self.on_error = on_error
+        self.fetch = fetch
+        self.fetch_index = fetch_index
+        self._stop_event = threading.Event()
+
+    def stop(self):
+        self._stop_event.set()
+
+    def run(self):
+        while not self._stop_event.is_set():
+            started = time.time()
+            try:
+                prices = self.fetch()
+                if prices is None:
+                    raise RuntimeError("实时快照获取失败")
+                # 指数点位取不到时按指数不变继续盯盘
+                index_spot = self.fetch_index() if self.fetch_index else None
+                alerts = self.engine.check(prices, index_spot)
+                if alerts and self.on_alert:
+                    self.on_alert(alerts)
+            except Exception as e:
+                if self.on_error:
+                    self.on_error(e)
+            self._stop_event.wait(max(0.0, self.interval - (time.time() - started)))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="盘中触线预警")
+    parser.add_argument("--interval", type=float, default=DEFAULT_INTERVAL, help="轮询间隔(秒)")
+    parser.add_argument("--near", type=float, default=DEFAULT_NEAR_PCT, help="允许涨幅低于该值(%%)时预警")
+    parser.add_argument("--codes", default=None, help="只盯这些代码，逗号分隔；默认整张表")
+    parser.add_argument("--table", default=None)
+    args = parser.parse_args()
+
+    table = TriggerTable.load(args.table)
+    if table is None:
+        print("没有找到触线价格表，请先运行 calASM_premarket.py build")
+        return
+    codes = parse_codes(args.codes) if args.codes else None
+    engine = AlertEngine(table, codes, near_pct=args.near, k=current_k(table))
+    print(f"盯盘 {len(engine.codes)} 支股票 (触线表 {table.date}, T+{engine.k})，间隔 {args.interval}s，"
+          f"预警日志 {engine.log_path}")
+
+    def on_alert(alerts):
+        for a in alerts:
+            print(format_alert(a))
+
+    watcher = AlertWatcher(engine, args.interval, on_alert=on_alert, on_error=lambda e: print(f"轮询出错: {e}"))
+    watcher.start()
+    try:
+        while watcher.is_alive():
+            watcher.join(1.0)
+    except KeyboardInterrupt:
+        watcher.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,229 @@
+"""
+库接口: 供 notebook、调度任务在进程内直接调用的分析入口
+
+与 calASM_gui / calASM_batch 的 process_one_stock 相同的计算，但没有副作用:
+不打印、不出图、不写报告、不读 TARGET_DATE_STR 之类的全局设置，也不导入 tkinter / matplotlib。
+    - analyze_frame  : 已对齐的行情表 -> StockAnalysis (纯计算，GUI 与批量脚本也用它)
+    - analyze_stock  : 单只股票 (取数 + 计算)，出错时抛出异常
+    - analyze_stocks : 多只股票，逐只产出 StockAnalysis (生成器，按 batch_size 分批取数，内存不随股票数增长)
+    - summary_frame / detail_frame : 结果拼成 DataFrame，列结构同 calASM_export
+
+数据源可注入: 任何提供 calendar() / stock_daily(code, date) / index_daily(index_code, date) 的对象都可以，
+如本地分析服务的 ServiceClient，或测试里放内存数据的对象；可选提供 market_rules(code) 与 stock_name(code)。
+默认的 LocalSource 经共享数据仓库 (cache/data) 取数，缺失时下载并写入缓存。
+
+用法:
+    from calASM_api import analyze_stock, analyze_stocks, summary_frame
+    a = analyze_stock("600372", horizon=5)
+    a.summary(10).space            # 10日规则 T+1..T+5 的允许涨幅 (%)
+    summary_frame(analyze_stocks(["600372", "002149"], rules=((10, 100.0),)))
+"""
+from datetime import datetime
+
+import pandas as pd
+
+from calASM_data import fetch_index_live, fetch_stock_daily, fetch_trade_calendar, future_trading_dates
+from calASM_export import result_rows, summary_row
+from calASM_panel import MarketPanel
+from calASM_period import MAX_HORIZON, period_result, period_summary
+from calASM_rules import ALL_BOARDS, AnomalyRule, evaluate_rules, get_board, get_rules
+from calASM_security import get_market_rules, stock_name
+from calASM_symbols import normalize_code
+
+DEFAULT_RULES = ((10, 100.0), (30, 200.0))
+MIN_HISTORY = 30
+BATCH_SIZE = 200
+
+
+def _quiet(*args, **kwargs):
+    pass
+
+
+class LocalSource:
+    """默认数据源: 共享数据仓库 (cache/data)，缺失时经 akshare 下载；默认不打印，log 可接 GUI 日志"""
+
+    def __init__(self, log=_quiet):
+        self.log = log
+
+    def calendar(self):
+        return fetch_trade_calendar()
+
+    def stock_daily(self, code, date):
+        return fetch_stock_daily(code, date, log=self.log)
+
+    def index_daily(self, index_code, date):
+        return fetch_index_live(index_code, date)
+
+
+class StockAnalysis:
+    """
+    单只股票的分析结果
+        results / summaries : {(天数, 阈值): PeriodResult / PeriodSummary}，顺序同传入的 rules
+        status              : evaluate_rules 的结果 (T 日各注册规则的偏离、剩余空间、次日触线价)
+        error               : 取数或计算失败时的异常 (此时其余字段可能为空)
+    """
+    __slots__ = ("code", "name", "date", "price", "limit_ratio", "results", "summaries", "status", "error")
+
+    def __init__(self, code, name, date=None, price=float("nan"), limit_ratio=float("nan"),
+                 results=None, summaries=None, status=None, error=None):
+        self.code = code
+        self.name = name
+        self.date = date
+        self.price = price
+        self.limit_ratio = limit_ratio
+        self.results = results or {}
+        self.summaries = summaries or {}
+        self.status = status or []
+        self.error = error
+
+    @property
+    def ok(self):
+        return self.error is None
+
+    def _key(self, days, threshold):
+        for key in self.results:
+            if key[0] == days and (threshold is None or key[1] == threshold):
+                return key
+        raise KeyError(f"{self.code} 没有 {days} 日规则的结果")
+
+    def result(self, days, threshold=None):
+        return self.results[self._key(days, threshold)]
+
+    def summary(self, days, threshold=None):
+        return self.summaries[self._key(days, threshold)]
+
+    def tightest(self):
+        """T+1 允许涨幅最小的规则汇总 (总览"取T1空间极小值"的口径)，没有结果时为 None"""
+        return min(self.summaries.values(), key=lambda s: s.first_space(), default=None)
+
+    def pairs(self):
+        """[(PeriodResult, PeriodSummary), ...]，可直接交给 calASM_export 的写出器"""
+        return [(self.results[key], self.summaries[key]) for key in self.results]
+
+    def detail_frame(self):
+        return detail_frame([self])
+
+    def summary_frame(self):
+        return summary_frame([self])
+
+    def __repr__(self):
+        if self.error is not None:
+            return f"StockAnalysis({self.code!r}, error={self.error!r})"
+        return f"StockAnalysis({self.code!r}, {self.name!r}, {self.date}, {self.price:.2f}, {len(self.results)} 条规则)"
+
+
+def analyze_frame(code, merged, future_dates, limit_ratio, name=None, rules=DEFAULT_RULES, status_rules=None,
+                  no_limit=()):
+    """
+    merged: 行情表 [date, close, pct_chg, index_close]，最后一行为 T 日；future_dates: T+1..T+N
+    status_rules 为空时取该板块的全部注册规则 (含3日、下跌等)
+    no_limit: 新股不设涨跌幅限制的日期 (MarketPanel.no_limit)，这些日子不推算连板
+    """
+    if len(merged) < MIN_HISTORY:
+        raise ValueError(f"{code} 数据不足{MIN_HISTORY}天")
+    name = name or code
+    price = float(merged['close'].iloc[-1])
+    status_rules = get_rules(get_board(code)) if status_rules is None else list(status_rules)
+    table_rules = [_table_rule(days, threshold, status_rules) for days, threshold in rules]
+    # 全部规则单遍评估；明细表的历史行直接取引擎结果，只推算预测行
+    evaluated = evaluate_rules(merged['close'].to_numpy(), merged['index_close'].to_numpy(),
+                               status_rules + [r for r in table_rules if r not in status_rules])
+    by_rule = {res["rule"]: res for res in evaluated}
+    results, summaries = {}, {}
+    for (days, threshold), rule in zip(rules, table_rules):
+        res = period_result(merged, future_dates, days, threshold, limit_ratio, no_limit=no_limit,
+                            window=by_rule[rule])
+        results[(days, threshold)] = res
+        summaries[(days, threshold)] = period_summary(res, future_dates, name, f"{days}日", price)
+    return StockAnalysis(code, name, str(merged['date'].iloc[-1]), price, float(limit_ratio),
+                         results, summaries, evaluated[:len(status_rules)])
+
+
+def _table_rule(days, threshold, registered):
+    """明细表规则 (天数, 阈值) 对应的已注册上涨规则；未注册 (如自定义阈值) 时临时构造一条"""
+    for rule in registered:
+        if (rule.days, rule.threshold, rule.method, rule.direction) == (days, threshold, "cum", "up"):
+            return rule
+    return AnomalyRule(f"{days}日({threshold:.0f}%)", int(days), float(threshold), "up", "cum", ALL_BOARDS)
+
+
+def _stock_list(codes):
+    """'600372' / ('600372', '名称') -> [(原始写法, 代码或 None, 名称或 None), ...]"""
+    out = []
+    for item in codes:
+        raw, name = item if isinstance(item, (tuple, list)) else (item, None)
+        out.append((raw, normalize_code(raw), name))
+    return out
+
+
+def _analyze_batch(batch, source, horizon, rules, date, status_rules, calendar):
+    market_rules = getattr(source, "market_rules", get_market_rules)
+    lookup_name = getattr(source, "stock_name", lambda code: stock_name(code, code))
+    out = {}
+    stocks, index_frames = [], {}
+    for raw, code, name in batch:
+        if code is None:
+            out[raw] = StockAnalysis(raw, name or raw, error=ValueError(f"无法识别的代码 {raw}"))
+            continue
+        name = name or lookup_name(code) or code
+        try:
+            index_code, _, limit_ratio = market_rules(code)
+            if index_code not in index_frames:
+                index_frames[index_code] = source.index_daily(index_code, date)
+            stock_df = source.stock_daily(code, date)
+            if stock_df is None or stock_df.empty or index_frames[index_code] is None:
+                raise LookupError(f"无法获取 {code} 或指数 {index_code} 数据")
+            stocks.append((code, name, stock_df[stock_df['date'] <= date], index_code, limit_ratio))
+        except Exception as e:
+            out[code] = StockAnalysis(code, name, error=e)
+
+    panel = MarketPanel.from_frames(stocks, index_frames, calendar) if stocks else None
+    for code, name, _, _, limit_ratio in stocks:
+        try:
+            merged = panel.frame(code)
+            future_dates = future_trading_dates(str(merged['date'].iloc[-1]), horizon, calendar)
+            out[code] = analyze_frame(code, merged, future_dates, limit_ratio, name, rules, status_rules,
+                                      panel.no_limit[panel.row[code]])
+        except Exception as e:
+            out[code] = StockAnalysis(code, name, error=e)
+    # 按输入顺序产出
+    for raw, code, name in batch:
+        yield out[raw if code is None else code]
+
+
+def analyze_stocks(codes, source=None, horizon=3, rules=DEFAULT_RULES, date=None, status_rules=None,
+                   batch_size=BATCH_SIZE):
+    """
+    codes: ['600372', 'sh002149', ('300058', '蓝色光标'), ...]；date: 分析日 'YYYYMMDD' (默认今天)
+    逐只产出 StockAnalysis (出错的股票 error 非空，不中断后续股票)
+    """
+    if not 1 <= horizon <= MAX_HORIZON:
+        raise ValueError(f"horizon 须在 1~{MAX_HORIZON} 之间")
+    source = source or LocalSource()
+    date = date or datetime.now().strftime("%Y%m%d")
+    stocks = _stock_list(codes)
+    calendar = source.calendar() if stocks else []
+    for i in range(0, len(stocks), batch_size):
+        yield from _analyze_batch(stocks[i:i + batch_size], source, horizon, tuple(rules), date, status_rules,
+                                  calendar)
+
+
+def analyze_stock(code, name=None, source=None, horizon=3, rules=DEFAULT_RULES, date=None, status_rules=None):
+    """单只股票 -> StockAnalysis；取数或计算失败时抛出对应异常"""
+    analysis = next(analyze_stocks([(code, name)], source, horizon, rules, date, status_rules))
+    if analysis.error is not None:
+        raise analysis.error
+    return analysis
+
+
+def detail_frame(analyses):
+    """逐日明细 DataFrame (calASM_export.ROW_SCHEMA)，跳过出错的股票"""
+    frames = [result_rows(a.code, a.name, a.date, res, summary.kind)
+              for a in analyses if a.ok for res, summary in a.pairs() if len(res)]
+    return pd.concat(frames, ignore_index=True) if frames else pd.DataFrame()
+
+
+def summary_frame(analyses):
+    """每只股票每条规则一行的汇总 DataFrame (calASM_export.SUMMARY_SCHEMA)，跳过出错的股票"""
+    frames = [summary_row(a.code, a.date, res, summary) for a in analyses if a.ok for res, summary in a.pairs()]
+    return pd.concat(frames, ignore_index=True) if frames else pd.DataFrame()
@@ -0,0 +1,178 @@
+"""
+历史回测: 把 10日/30日 规则在过去每一个交易日重放一遍
+
+对区间内的每个交易日 t (as-of)，按当时可见的数据、假设股价与指数不变，
+预测 T+1..T+K 的触线价格，然后与 t+k 日的实际收盘对比:
+    - 价格命中: 实际收盘 >= 当时预测的触线价格
+    - 实际触发: t+k 日的真实区间偏离 >= 阈值
+    - 临近天数: 当日 T+1 允许涨幅低于 near_pct 的天数
+
+全部在 MarketPanel 上用 (股票 × 交易日 × 预测天数) 的数组一次算完。
+
+用法:
+    python calASM_backtest.py --codes 600372,002149 --start 20250101 --end 20251231
+    python calASM_backtest.py --codes 600372 --asof 20250620
+"""
+import argparse
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+
+import calASM_panel
+from calASM_data import fetch_index_daily, fetch_stock_daily, fetch_trade_calendar
+from calASM_numeric import cum_deviation_array, round_half_up_array
+from calASM_security import ensure_fresh, stock_name
+from calASM_symbols import parse_codes
+
+DEFAULT_RULES = ((10, 100.0), (30, 200.0))
+
+
+def _as_of_columns(panel, start=None, end=None):
+    dates = panel.dates
+    lo = 0 if start is None else int(np.searchsorted(dates, start, side='left'))
+    hi = len(dates) if end is None else int(np.searchsorted(dates, end, side='right'))
+    return np.arange(lo, hi)
+
+
+def backtest(panel, rules=DEFAULT_RULES, horizon=3, start=None, end=None, near_pct=20.0):
+    """
+    返回 {(days, threshold): dict}，数组形状 (股票数, as-of 天数, horizon):
+        dates          : as-of 日期
+        trigger_price  : 当日预测的 T+k 触线价格
+        price_hit      : t+k 实际收盘 >= 预测触线价格
+        actual_hit     : t+k 实际区间偏离 >= 阈值
+        known          : t+k 已有真实数据 (用于求命中率)
+        near           : (股票数, as-of 天数) T+1 允许涨幅 < near_pct 且未触发
+    """
+    p, i = panel.close_ffill, panel.index_close
+    n, total = p.shape
+    cols = _as_of_columns(panel, start, end)
+    t = cols[:, None]                        # (A, 1)
+    k = np.arange(1, horizon + 1)[None, :]   # (1, K)
+    target = t + k
+    known = target < total
+    tgt = np.clip(target, 0, total - 1)
+    # as-of 当天及 t+k 都必须是已上市交易日
+    live = panel.listed[:, cols][:, :, None] & ~panel.suspended[:, tgt]
+
+    p_t = p[:, cols][:, :, None]             # (N, A, 1)
+    i_t = i[:, cols][:, :, None]
+
+    out = {}
+    for days, threshold in rules:
+        base = target - days
+        hist = base <= t
+        b = np.clip(base, 0, total - 1)
+        valid = (base >= 0)[None] & panel.listed[:, b] & live
+        p_base = np.where(hist[None], p[:, b], p_t)
+        i_base = np.where(hist[None], i[:, b], i_t)
+        # 与 MarketPanel.predict 同一算法，回测里的 as-of 触线价与当时的实时预测逐位一致
+        _, index_cum, deviation = cum_deviation_array(p_t, p_base, i_t, i_base)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            trigger = round_half_up_array(p_base * (1 + (threshold + index_cum) / 100))
+            room1 = (trigger[:, :, 0] / p_t[:, :, 0] - 1) * 100
+            actual_dev = panel.window_deviation(days)[:, tgt]
+            price_hit = (p[:, tgt] >= trigger) & valid & known[None]
+            actual_hit = (actual_dev >= threshold) & valid & known[None]
+            near = (room1 < near_pct) & (np.abs(deviation[:, :, 0]) < threshold) & valid[:, :, 0]
+        out[(days, threshold)] = {
+            "dates": panel.dates[cols],
+            "trigger_price": np.where(valid, trigger, np.nan),
+            "price_hit": price_hit,
+            "actual_hit": actual_hit,
+            "known": valid & known[None],
+            "near": near,
+        }
+    return out
+
+
+def summarize(panel, result):
+    """按股票、规则汇总回测结果为 DataFrame"""
+    rows = []
+    for (days, threshold), r in result.items():
+        known = r["known"].sum(axis=1)          # (N, K)
+        hits = r["price_hit"].sum(axis=1)
+        actual = r["actual_hit"].sum(axis=1)
+        near_days = r["near"].sum(axis=1)
+        for s, code in enumerate(panel.codes):
+            row = {"代码": code, "名称": panel.names[s], "规则": f"{days}日({threshold:.0f}%)",
+                   "临近天数": int(near_days[s])}
+            for k in range(known.shape[1]):
+                rate = hits[s, k] / known[s, k] * 100 if known[s, k] else float('nan')
+                row[f"T+{k + 1}命中"] = int(hits[s, k])
+                row[f"T+{k + 1}命中率"] = rate
+                row[f"T+{k + 1}实际触发"] = int(actual[s, k])
+            rows.append(row)
+    return pd.DataFrame(rows)
+
+
+def as_of(panel, date, rules=DEFAULT_RULES, horizon=3):
+    """
+    单一历史日期的时点分析 (只使用 date 当日及以前的数据)
+    返回 {(days, threshold): MarketPanel.predict 的结果}，以及实际采用的交易日
+    """
+    col = int(np.searchsorted(panel.dates, date, side='right')) - 1
+    if col < 0:
+        raise ValueError(f"{date} 早于面板首个交易日")
+    return {rule: panel.predict(rule[0], rule[1], horizon, at=col) for rule in rules}, panel.dates[col]
+
+
+class HistorySource:
+    """回测数据源: 个股日线留足 start 之前的窗口 (直到今天，用于对照实际结果)，指数取全部日线"""
+
+    def __init__(self, start, log=print):
+        # 30个交易日窗口约合 60 个自然日，再留余量
+        self.lookback = (datetime.now() - datetime.strptime(start, "%Y%m%d")).days + 90
+        self.log = log
+
+    def calendar(self):
+        return fetch_trade_calendar()
+
+    def stock_daily(self, code, date):
+        return fetch_stock_daily(code, date, lookback_days=self.lookback, log=self.log)
+
+    def index_daily(self, index_code, date):
+        return fetch_index_daily(index_code)
+
+
+def load_panel(codes, start, log=print):
+    """为回测拉取 start 之前留足窗口的历史，组装面板 (取数循环同 calASM_panel.load_panel)"""
+    ensure_fresh()
+    return calASM_panel.load_panel([(code, stock_name(code)) for code in codes], datetime.now().strftime("%Y%m%d"),
+                                   HistorySource(start, log), log=log, pause=0)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="严重异动规则历史回测")
+    parser.add_argument("--codes", required=True, help="股票代码，逗号分隔")
+    parser.add_argument("--start", default=(datetime.now() - timedelta(days=365)).strftime("%Y%m%d"))
+    parser.add_argument("--end", default=None)
+    parser.add_argument("--horizon", type=int, default=3)
+    parser.add_argument("--asof", default=None, help="只做单一日期的时点分析")
+    args = parser.parse_args()
+
+    codes = parse_codes(args.codes)
+    start = args.asof or args.start
+    panel = load_panel(codes, start)
+    if panel is None:
+        print("没有可用数据")
+        return
+
+    if args.asof:
+        res, used = as_of(panel, args.asof, horizon=args.horizon)
+        print(f"\n时点分析: {used}")
+        for (days, threshold), r in res.items():
+            df = pd.DataFrame(r["trigger_price"], index=panel.codes,
+                              columns=[f"T+{k}触线" for k in range(1, args.horizon + 1)])
+            print(f"\n【{days}日({threshold:.0f}%)】")
+            print(df.to_string())
+        return
+
+    pd.set_option('display.width', 200)
+    result = backtest(panel, horizon=args.horizon, start=args.start, end=args.end)
+    print(summarize(panel, result).to_string(index=False, float_format=lambda v: f"{v:.1f}"))
+
+
+if __name__ == "__main__":
+    main()
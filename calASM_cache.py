@@ -0,0 +1,658 @@
+"""
+分析结果记忆化、按内容寻址的图片缓存与共享行情数据仓库
+
+    - 结果缓存: 键由 (代码, 最后K线日期, 最新收盘, 指数收盘, 预测天数, 规则集) 生成，
+      命中时直接复用上次的分析结果，跳过计算与绘图
+    - 图片缓存: 以表格内容的哈希为键记录已生成的图片，内容相同则不再渲染、不再保存；
+      索引文件被多个进程共享，读-改-写在文件锁内进行，并在持锁后重新读取
+    - 行情数据仓库 (DataStore): 个股历史、指数、交易日历、全市场快照、证券主表共用一个目录，
+      三个工具 (calASM_gui / calASM_batch / findStoke_gui) 及多个进程可同时读写:
+      写入先落临时文件再原子替换，读者永远看不到半个文件；
+      下载前按 key 加文件锁并复查，多个进程同时缺同一份数据时只下载一次。
+      表格数据存为 numpy 结构化数组 (.npy)，以内存映射方式读取。
+    - 容量管理: 各缓存区域 (图片、历史分区、快照、结果等) 有容量与保留天数上限，
+      超出时按最近使用时间 (LRU) 淘汰，并可输出当前占用报告。
+
+缓存文件位于 cache/ 目录，图片索引位于 images/.index.json
+
+用法:
+    python calASM_cache.py report     查看各缓存区域占用
+    python calASM_cache.py evict      按上限立即清理
+"""
+import hashlib
+import json
+import os
+import pickle
+import shutil
+import threading
+import time
+import warnings
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+if os.name == "nt":
+    import msvcrt
+else:
+    import fcntl
+
+CACHE_DIR = "cache"
+IMAGE_DIR = "images"
+IMAGE_INDEX_FILE = os.path.join(IMAGE_DIR, ".index.json")
+IMAGE_INDEX_LOCK = os.path.join(IMAGE_DIR, ".index.lock")
+
+# 收盘后多久认为当日行情已定稿 (HHMM)
+SESSION_CLOSE_HHMM = "1505"
+
+
+def make_key(*parts):
+    """把任意可 repr 的参数组合成稳定的 sha1 键"""
+    return hashlib.sha1(repr(parts).encode("utf-8")).hexdigest()
+
+
+def analysis_key(code, last_date, last_close, index_close, horizon, rules):
+    """单只股票分析结果的缓存键"""
+    return make_key("analysis", code, str(last_date), f"{float(last_close):.4f}",
+                    f"{float(index_close):.4f}", int(horizon), tuple(rules))
+
+
+def session_closed(target_date_str, now=None):
+    """target_date 的行情是否已定稿 (历史日期，或当天已收盘)"""
+    now = now or datetime.now()
+    today = now.strftime("%Y%m%d")
+    if target_date_str < today:
+        return True
+    return now.weekday() >= 5 or now.strftime("%H%M") >= SESSION_CLOSE_HHMM
+
+
+def touch(path):
+    """记录一次使用: 只更新访问时间 (mtime 仍表示写入时间，用于判断新鲜度)"""
+    try:
+        os.utime(path, (time.time(), os.path.getmtime(path)))
+    except OSError:
+        pass
+
+
+def settled_max_age(date_str, ttl, now=None):
+    """
+    date 对应数据的缓存有效期 (秒，None 为永久):
+    该日收盘后写入的文件永久有效 (返回距收盘的秒数，早于收盘写入的文件视为过期)；
+    盘中按 ttl 刷新；周末不变
+    """
+    now = now or datetime.now()
+    close = datetime.strptime(date_str + SESSION_CLOSE_HHMM, "%Y%m%d%H%M")
+    if now >= close:
+        return (now - close).total_seconds()
+    if now.weekday() >= 5:
+        return None
+    return ttl
+
+
+def _replace(tmp, path):
+    # Windows 下目标文件正被其他进程读取时 os.replace 会短暂失败，稍后重试
+    for attempt in range(50):
+        try:
+            os.replace(tmp, path)
+            return
+        except PermissionError:
+            if attempt == 49:
+                raise
+            time.sleep(0.05)
+
+
+def _atomic_write(path, data):
+    tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(data)
+    _replace(tmp, path)
+
+
+class FileLock:
+    """
+    跨进程排他文件锁 (Windows 用 msvcrt，其他系统用 fcntl)
+    锁文件可能在打开之后、加锁之前被 remove_lock 删除，加锁后核对持有的仍是该路径上的文件，否则重新打开
+    """
+
+    def __init__(self, path, timeout=120.0):
+        self.path = path
+        self.timeout = timeout
+        self._f = None
+
+    def _current(self):
+        if os.name == "nt":
+            return True
+        try:
+            st, own = os.stat(self.path), os.fstat(self._f.fileno())
+        except OSError:
+            return False
+        return (st.st_dev, st.st_ino) == (own.st_dev, own.st_ino)
+
+    def __enter__(self):
+        deadline = time.time() + self.timeout
+        while True:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            self._f = open(self.path, "a+b")
+            try:
+                if os.name == "nt":
+                    self._f.seek(0)
+                    msvcrt.locking(self._f.fileno(), msvcrt.LK_NBLCK, 1)
+                else:
+                    fcntl.flock(self._f.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except OSError:
+                self._f.close()
+                if time.time() > deadline:
+                    raise TimeoutError(f"等待文件锁超时: {self.path}")
+                time.sleep(0.05)
+                continue
+            if self._current():
+                return self
+            self.__exit__()
+
+    def __exit__(self, *exc):
+        try:
+            if os.name == "nt":
+                self._f.seek(0)
+                msvcrt.locking(self._f.fileno(), msvcrt.LK_UNLCK, 1)
+            else:
+                fcntl.flock(self._f.fileno(), fcntl.LOCK_UN)
+        finally:
+            self._f.close()
+
+
+def remove_lock(path):
+    """
+    删除未被持有的锁文件: 非阻塞加锁成功后持锁删除，正被持有时保留；返回是否删除
+    Windows 下打开着的文件不能删除，锁文件一律保留
+    """
+    if os.name == "nt":
+        return False
+    lock = FileLock(path, timeout=0)
+    try:
+        lock.__enter__()
+    except (OSError, TimeoutError):
+        return False
+    try:
+        os.remove(path)
+        return True
+    except OSError:
+        return False
+    finally:
+        lock.__exit__()
+
+
+class ResultCache:
+    """内存 + 磁盘(pickle) 两级缓存，线程安全"""
+
+    def __init__(self, directory=os.path.join(CACHE_DIR, "results")):
+        self.directory = directory
+        self._mem = {}
+        self._lock = threading.Lock()
+
+    def _path(self, key):
+        return os.path.join(self.directory, f"{key}.pkl")
+
+    def get(self, key):
+        with self._lock:
+            if key in self._mem:
+                return self._mem[key]
+        path = self._path(key)
+        if not os.path.exists(path):
+            return None
+        try:
+            with open(path, "rb") as f:
+                value = pickle.load(f)
+        except Exception:
+            # 文件损坏视为未命中
+            return None
+        touch(path)
+        with self._lock:
+            self._mem[key] = value
+        return value
+
+    def put(self, key, value):
+        with self._lock:
+            self._mem[key] = value
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            _atomic_write(self._path(key), pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL))
+        except Exception as e:
+            print(f"写入缓存失败: {e}")
+
+    def clear_memory(self):
+        with self._lock:
+            self._mem.clear()
+
+
+# ================= 图片缓存 =================
+
+_image_lock = threading.Lock()
+_image_index = None
+_image_index_mtime = None
+
+
+def table_digest(kind, title, rows):
+    """表格内容哈希: kind + 标题 + 全部单元格"""
+    return make_key("image", kind, title, rows)
+
+
+def _load_index(force=False):
+    """图片索引；文件被其他进程改写过 (mtime 变化) 或 force 时重新读取"""
+    global _image_index, _image_index_mtime
+    try:
+        mtime = os.stat(IMAGE_INDEX_FILE).st_mtime_ns
+    except OSError:
+        mtime = None
+    if force or _image_index is None or mtime != _image_index_mtime:
+        try:
+            with open(IMAGE_INDEX_FILE, "r", encoding="utf-8") as f:
+                _image_index = json.load(f)
+        except Exception:
+            _image_index = {}
+        _image_index_mtime = mtime
+    return _image_index
+
+
+def _update_index(change):
+    """在跨进程文件锁内重新读取索引、调用 change(index) 修改并写回"""
+    global _image_index_mtime
+    with _image_lock, FileLock(IMAGE_INDEX_LOCK):
+        index = _load_index(force=True)
+        if not change(index):
+            return
+        try:
+            _atomic_write(IMAGE_INDEX_FILE, json.dumps(index, ensure_ascii=False, indent=0).encode("utf-8"))
+            _image_index_mtime = os.stat(IMAGE_INDEX_FILE).st_mtime_ns
+        except Exception as e:
+            print(f"写入图片索引失败: {e}")
+
+
+def cached_image(digest):
+    """内容相同的图片已存在则返回其路径，否则返回 None"""
+    with _image_lock:
+        path = _load_index().get(digest)
+    if path and os.path.exists(path):
+        touch(path)
+        return path
+    return None
+
+
+def record_image(digest, path):
+    """记录新生成的图片"""
+    def change(index):
+        index[digest] = path
+        return True
+    _update_index(change)
+
+
+# ================= 行情数据仓库 =================
+
+def _frame_to_records(df):
+    """DataFrame -> 结构化数组 (文本列转为定长字符串)，可直接 np.save 并内存映射读取"""
+    columns = {}
+    for col in df.columns:
+        series = df[col]
+        if pd.api.types.is_bool_dtype(series):
+            arr = series.to_numpy(dtype=bool)
+        elif pd.api.types.is_numeric_dtype(series):
+            arr = series.to_numpy()
+            if arr.dtype == object:
+                arr = series.to_numpy(dtype=np.float64, na_value=np.nan)
+        else:
+            arr = np.array(["" if pd.isna(v) else str(v) for v in series], dtype=str)
+        columns[str(col)] = arr
+    rec = np.empty(len(df), dtype=[(name, arr.dtype) for name, arr in columns.items()])
+    for name, arr in columns.items():
+        rec[name] = arr
+    return rec
+
+
+def _records_to_frame(rec):
+    return pd.DataFrame({name: np.array(rec[name]) for name in rec.dtype.names})
+
+
+class DataStore:
+    """
+    按 (命名空间, key) 存放行情数据的磁盘仓库，进程/线程安全
+
+    get_or_fetch(namespace, key, fetch, max_age=None):
+        磁盘上有且未过期 (max_age 秒，None 为永不过期) 直接读取；
+        否则加锁、复查、调用 fetch() 下载并原子写入。fetch 返回 None 视为失败，不写入。
+    支持的值: DataFrame、numpy 数组 (均存为 .npy 内存映射读取)，其他对象用 pickle。
+    """
+
+    def __init__(self, directory=os.path.join(CACHE_DIR, "data")):
+        self.directory = directory
+        self.fetches = 0
+        self._lock = threading.Lock()
+
+    def path(self, namespace, key):
+        """key 中的 '/' 表示分区子目录 (如 history 按日期分区，便于整日淘汰)"""
+        parts = ["".join(c if c.isalnum() or c in "-_." else "_" for c in part) for part in str(key).split("/")]
+        return os.path.join(self.directory, namespace, *parts)
+
+    def _find(self, base):
+        for ext in (".frame.npy", ".npy", ".pkl"):
+            if os.path.exists(base + ext):
+                return base + ext
+        return None
+
+    def _read(self, path):
+        if path.endswith(".frame.npy"):
+            rec = np.load(path, mmap_mode="r", allow_pickle=False)
+            try:
+                return _records_to_frame(rec)
+            finally:
+                # 及时释放映射，避免 Windows 下阻塞其他进程替换文件
+                del rec
+        if path.endswith(".npy"):
+            return np.load(path, mmap_mode="r", allow_pickle=False)
+        with open(path, "rb") as f:
+            return pickle.load(f)
+
+    def _write(self, base, value):
+        os.makedirs(os.path.dirname(base), exist_ok=True)
+        if isinstance(value, pd.DataFrame):
+            path, arr = base + ".frame.npy", _frame_to_records(value)
+        elif isinstance(value, np.ndarray) and value.dtype != object:
+            path, arr = base + ".npy", value
+        else:
+            path, arr = base + ".pkl", None
+        tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp, "wb") as f:
+            if arr is None:
+                pickle.dump(value, f, protocol=pickle.HIGHEST_PROTOCOL)
+            else:
+                with warnings.catch_warnings():
+                    # 中文列名需要 .npy 3.0 格式，numpy 会提示版本要求
+                    warnings.simplefilter("ignore", UserWarning)
+                    np.save(f, arr, allow_pickle=False)
+        _replace(tmp, path)
+        # 同一 key 换了存储格式时删除旧文件
+        for ext in (".frame.npy", ".npy", ".pkl"):
+            if base + ext != path and os.path.exists(base + ext):
+                try:
+                    os.remove(base + ext)
+                except OSError:
+                    pass
+
+    def get(self, namespace, key, max_age=None):
+        """读取缓存值，不存在、过期或损坏返回 None"""
+        path = self._find(self.path(namespace, key))
+        if path is None:
+            return None
+        if max_age is not None and time.time() - os.path.getmtime(path) > max_age:
+            return None
+        try:
+            value = self._read(path)
+        except Exception:
+            return None
+        touch(path)
+        return value
+
+    def keys(self, namespace):
+        """命名空间下已有的 key (按名称排序)"""
+        folder = os.path.join(self.directory, namespace)
+        if not os.path.isdir(folder):
+            return []
+        keys = set()
+        for name in os.listdir(folder):
+            for ext in (".frame.npy", ".npy", ".pkl"):
+                if name.endswith(ext):
+                    keys.add(name[:-len(ext)])
+                    break
+        return sorted(keys)
+
+    def mtime(self, namespace, key):
+        path = self._find(self.path(namespace, key))
+        return os.path.getmtime(path) if path else None
+
+    def put(self, namespace, key, value):
+        base = self.path(namespace, key)
+        with FileLock(base + ".lock"):
+            self._write(base, value)
+
+    def get_or_fetch(self, namespace, key, fetch, max_age=None):
+        value = self.get(namespace, key, max_age)
+        if value is not None:
+            return value
+        base = self.path(namespace, key)
+        with FileLock(base + ".lock"):
+            # 等锁期间其他进程可能已经下载好了
+            value = self.get(namespace, key, max_age)
+            if value is not None:
+                return value
+            with self._lock:
+                self.fetches += 1
+            value = fetch()
+            if value is not None:
+                try:
+                    self._write(base, value)
+                except Exception as e:
+                    print(f"写入数据缓存失败: {e}")
+            return value
+
+    def update(self, namespace, key, fetch_more):
+        """
+        增量更新: 加锁读出当前值 (没有为 None)，new = fetch_more(current)；
+        new 为 None 表示没有新数据，不写盘。返回更新后的值
+        """
+        base = self.path(namespace, key)
+        with FileLock(base + ".lock"):
+            path = self._find(base)
+            current = None
+            if path is not None:
+                try:
+                    current = self._read(path)
+                    if isinstance(current, np.ndarray):
+                        # 读入内存，释放映射后才能替换文件
+                        current = np.array(current)
+                except Exception:
+                    current = None
+            with self._lock:
+                self.fetches += 1
+            value = fetch_more(current)
+            if value is None:
+                return current
+            try:
+                self._write(base, value)
+            except Exception as e:
+                print(f"写入数据缓存失败: {e}")
+            return value
+
+    def invalidate(self, namespace, key):
+        base = self.path(namespace, key)
+        with FileLock(base + ".lock"):
+            for ext in (".frame.npy", ".npy", ".pkl"):
+                if os.path.exists(base + ext):
+                    os.remove(base + ext)
+
+
+_store = None
+
+
+def data_store():
+    """进程内共享的 DataStore"""
+    global _store
+    if _store is None:
+        _store = DataStore()
+    return _store
+
+
+# ================= 容量管理 =================
+
+# 区域: (目录, 容量上限 MB, 最长保留天数)；可在 cache/limits.json 中按区域覆盖，如 {"images": [200, 7]}
+CACHE_LIMITS = {
+    "images": (IMAGE_DIR, 500, 30),
+    "results": (os.path.join(CACHE_DIR, "results"), 200, 30),
+    "history": (os.path.join(CACHE_DIR, "data", "history"), 300, 30),
+    "index": (os.path.join(CACHE_DIR, "data", "index"), 50, 7),
+    "index_spot": (os.path.join(CACHE_DIR, "data", "index_spot"), 10, 7),
+    "minute": (os.path.join(CACHE_DIR, "data", "minute"), 200, 7),
+    "calendar": (os.path.join(CACHE_DIR, "data", "calendar"), 10, 7),
+    "snapshot": (os.path.join(CACHE_DIR, "data", "snapshot"), 300, 7),
+    "intraday": (os.path.join(CACHE_DIR, "intraday"), 300, 30),
+    "security": (os.path.join(CACHE_DIR, "data", "security"), 50, 7),
+    "premarket": (os.path.join(CACHE_DIR, "premarket"), 50, 30),
+    "reports": ("reports", 200, 90),
+}
+LIMITS_FILE = os.path.join(CACHE_DIR, "limits.json")
+
+# 不参与淘汰的文件
+_KEEP_FILES = {os.path.basename(IMAGE_INDEX_FILE), os.path.basename(IMAGE_INDEX_LOCK), "recorder.lock"}
+# 按整个子目录 (一天) 淘汰的区域: 目录内的分区互相依赖 (增量帧依赖关键帧)，不能单独删
+_DIR_AREAS = {"intraday"}
+
+
+def load_limits():
+    limits = dict(CACHE_LIMITS)
+    try:
+        with open(LIMITS_FILE, "r", encoding="utf-8") as f:
+            for area, (size_mb, days) in json.load(f).items():
+                if area in limits:
+                    limits[area] = (limits[area][0], size_mb, days)
+    except (OSError, ValueError, TypeError):
+        pass
+    return limits
+
+
+def _scan(directory):
+    """[(路径, 字节数, 最近使用时间)]；锁文件与临时文件单独处理"""
+    files, aux = [], []
+    for root, _, names in os.walk(directory):
+        for name in names:
+            if name in _KEEP_FILES:
+                continue
+            path = os.path.join(root, name)
+            try:
+                st = os.stat(path)
+            except OSError:
+                continue
+            entry = (path, st.st_size, max(st.st_atime, st.st_mtime))
+            (aux if name.endswith((".lock", ".tmp")) else files).append(entry)
+    return files, aux
+
+
+def usage_report(limits=None):
+    """各区域的文件数、占用与上限"""
+    report = []
+    for area, (directory, size_mb, days) in (limits or load_limits()).items():
+        files, _ = _scan(directory) if os.path.isdir(directory) else ([], [])
+        used = [f[2] for f in files]
+        report.append({
+            "area": area, "directory": directory, "files": len(files),
+            "size_mb": sum(f[1] for f in files) / 1024 / 1024, "limit_mb": size_mb, "max_days": days,
+            "oldest": datetime.fromtimestamp(min(used)).strftime("%Y-%m-%d") if used else "-",
+            "newest": datetime.fromtimestamp(max(used)).strftime("%Y-%m-%d %H:%M") if used else "-",
+        })
+    return report
+
+
+def format_usage(report):
+    lines = [f"{'区域':<10}{'文件数':>5}{'占用MB':>8}{'上限MB':>6}{'保留天':>4}  最早使用    最近使用"]
+    for r in report:
+        lines.append(f"{r['area']:<12}{r['files']:>8}{r['size_mb']:>10.1f}{r['limit_mb']:>8}{r['max_days']:>7}  "
+                     f"{r['oldest']:<11} {r['newest']}")
+    lines.append(f"合计 {sum(r['size_mb'] for r in report):.1f} MB")
+    return lines
+
+
+def _remove(path):
+    try:
+        if os.path.isdir(path):
+            shutil.rmtree(path)
+        else:
+            os.remove(path)
+        return True
+    except OSError:
+        return False
+
+
+def _group_by_dir(directory, files):
+    """文件按 directory 下的第一级子目录合并为淘汰单位 [(子目录, 字节数, 最近使用时间, 文件数)]"""
+    groups = {}
+    for path, size, used in files:
+        top = os.path.relpath(path, directory).split(os.sep)[0]
+        unit = os.path.join(directory, top)
+        g = groups.setdefault(unit, [0, 0.0, 0])
+        g[0] += size
+        g[1] = max(g[1], used)
+        g[2] += 1
+    return [(unit, size, used, count) for unit, (size, used, count) in groups.items()]
+
+
+def _prune_empty_dirs(directory):
+    for root, dirs, names in os.walk(directory, topdown=False):
+        if root != directory and not dirs and not names:
+            try:
+                os.rmdir(root)
+            except OSError:
+                pass
+
+
+def _prune_image_index():
+    def change(index):
+        dead = [k for k, v in index.items() if not os.path.exists(v)]
+        for k in dead:
+            del index[k]
+        return bool(dead)
+    _update_index(change)
+
+
+def evict(areas=None, limits=None, now=None):
+    """
+    按保留天数与容量上限淘汰: 先删超过保留天数未使用的文件，再按最近使用时间从旧到新删到容量以下
+    返回 {区域: (删除文件数, 释放字节数)}
+    """
+    now = now or time.time()
+    limits = limits or load_limits()
+    result = {}
+    for area, (directory, size_mb, days) in limits.items():
+        if (areas and area not in areas) or not os.path.isdir(directory):
+            continue
+        files, aux = _scan(directory)
+        if area in _DIR_AREAS:
+            units = _group_by_dir(directory, files)
+        else:
+            units = [(path, size, used, 1) for path, size, used in files]
+        units.sort(key=lambda u: u[2])
+        total = sum(u[1] for u in units)
+        cap = size_mb * 1024 * 1024
+        removed = freed = 0
+        for path, size, used, count in units:
+            if now - used <= days * 86400 and total <= cap:
+                break
+            if _remove(path):
+                removed += count
+                freed += size
+                total -= size
+        # 一天以上的残留临时文件；锁文件只在没有进程持有时删除
+        for path, _, used in aux:
+            if now - used > 86400:
+                if path.endswith(".lock"):
+                    remove_lock(path)
+                else:
+                    _remove(path)
+        _prune_empty_dirs(directory)
+        result[area] = (removed, freed)
+    if result.get("images", (0, 0))[0]:
+        _prune_image_index()
+    return result
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description="缓存占用与清理")
+    parser.add_argument("cmd", choices=["report", "evict"])
+    args = parser.parse_args()
+    if args.cmd == "evict":
+        for area, (removed, freed) in evict().items():
+            if removed:
+                print(f"{area}: 删除 {removed} 个文件，释放 {freed / 1024 / 1024:.1f} MB")
+    for line in format_usage(usage_report()):
+        print(line)
+
+
+if __name__ == "__main__":
+    main()
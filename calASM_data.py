@@ -0,0 +1,351 @@
+"""
+行情数据获取
+
+把原先散落在 process_one_stock 里的拉取逻辑集中到这里:
+    - 个股日线 (盘中自动用分钟线补全当日)
+    - 基准指数日线 (同一次运行内按指数代码复用，不再每只股票拉一遍)
+    - 基准指数实时点位 (全部指数一次请求，短时缓存)，盘中补全指数当日点位
+    - 交易日历 (同一次运行内只拉一次)
+
+多个线程同时请求同一份数据时 (single-flight)，只有第一个真正下载，其余等待并共享结果。
+日线、指数、交易日历、快照、证券列表都经过 cache/data 下的共享磁盘仓库 (DataStore)，
+多个进程 (GUI、批量脚本、findStoke) 之间同样只下载一次。
+"""
+import threading
+from datetime import datetime, timedelta
+
+import akshare as ak
+import numpy as np
+import pandas as pd
+
+from calASM_cache import data_store, settled_max_age
+from calASM_rules import BOARD_BSE, BOARD_CHINEXT, BOARD_SH_MAIN, BOARD_STAR, BOARD_SZ_MAIN, get_board
+
+# 盘中个股日线 (含实时价) 的磁盘缓存有效期 (秒)
+INTRADAY_TTL = 60
+# 指数实时点位的缓存有效期 (秒)，一次刷新内所有股票共用同一份
+INDEX_SPOT_TTL = 15
+
+# 证券列表: (包含的板块, 取数函数, 代码列, 简称列, 上市日期列)
+SECURITY_SOURCES = (
+    ((BOARD_SH_MAIN,), lambda: ak.stock_info_sh_name_code(symbol="主板A股"), '证券代码', '证券简称', '上市日期'),
+    ((BOARD_STAR,), lambda: ak.stock_info_sh_name_code(symbol="科创板"), '证券代码', '证券简称', '上市日期'),
+    ((BOARD_SZ_MAIN, BOARD_CHINEXT), lambda: ak.stock_info_sz_name_code(symbol="A股列表"), 'A股代码', 'A股简称',
+     'A股上市日期'),
+    ((BOARD_BSE,), lambda: ak.stock_info_bj_name_code(), '证券代码', '证券简称', '上市日期'),
+)
+
+_memo = {}
+_memo_lock = threading.Lock()
+
+
+class SingleFlight:
+    """同一 key 的并发调用只执行一次，其余调用方阻塞等待并拿到同一个结果 (或同一个异常)"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+
+    def do(self, key, fn):
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = {"done": threading.Event(), "value": None, "error": None}
+        if not leader:
+            call["done"].wait()
+        else:
+            try:
+                call["value"] = fn()
+            except BaseException as e:
+                call["error"] = e
+            finally:
+                with self._lock:
+                    self._calls.pop(key, None)
+                call["done"].set()
+        if call["error"] is not None:
+            raise call["error"]
+        return call["value"]
+
+
+_flight = SingleFlight()
+
+
+def _memoized(key, loader):
+    with _memo_lock:
+        if key in _memo:
+            return _memo[key]
+
+    def load():
+        value = loader()
+        if value is not None:
+            with _memo_lock:
+                _memo[key] = value
+        return value
+    return _flight.do(key, load)
+
+
+def clear_memo():
+    """清空进程内缓存 (强制刷新时调用)"""
+    with _memo_lock:
+        _memo.clear()
+
+
+def get_realtime_quote_single(code):
+    """
+    单独获取某只股票的最新分钟级价格 (替代全市场扫描，速度更快)
+    经分钟线增量缓存: 只下载上次之后的新分钟
+    """
+    from calASM_minute import minute_bars
+
+    try:
+        return minute_bars().latest(code)
+    except Exception:
+        return None
+
+
+def fetch_spot_snapshot():
+    """全市场实时快照 DataFrame[代码, 名称, 最新价, 最高, 涨跌幅, ...]，失败返回 None"""
+    try:
+        df = ak.stock_zh_a_spot_em()
+    except Exception:
+        return None
+    if df is None or df.empty:
+        return None
+    return df
+
+
+def load_spot_snapshot(max_age=None, refresh=False):
+    """
+    经磁盘仓库的全市场快照 (当天一份，多个进程共享)；max_age 秒内的快照直接复用，
+    refresh=True 强制重新下载
+    """
+    today = datetime.now().strftime("%Y%m%d")
+    store = data_store()
+    if refresh:
+        store.invalidate("snapshot", today)
+    return store.get_or_fetch("snapshot", today, fetch_spot_snapshot, max_age=max_age)
+
+
+def fetch_spot_prices(snapshot=None):
+    """全市场实时快照，一次请求: Series[代码 -> 最新价]，失败返回 None"""
+    df = fetch_spot_snapshot() if snapshot is None else snapshot
+    if df is None:
+        return None
+    prices = pd.to_numeric(df['最新价'], errors='coerce')
+    return pd.Series(prices.to_numpy(), index=df['代码'].astype(str).to_numpy()).dropna()
+
+
+def filter_by_high(snapshot, target_price, tol=0.01):
+    """快照中当日最高价等于 target_price 的股票 (停牌股最高价为 '-' 或空，自动排除)"""
+    high = pd.to_numeric(snapshot['最高'], errors='coerce')
+    return snapshot[(high - target_price).abs() < tol]
+
+
+def trading_days_between(start_date_str, end_date_str):
+    """(start, end] 之间的交易日数；日历不可用时按工作日估算"""
+    calendar = fetch_trade_calendar()
+    if calendar:
+        return sum(1 for d in calendar if start_date_str < d <= end_date_str)
+    return len(pd.bdate_range(pd.to_datetime(start_date_str) + timedelta(days=1), pd.to_datetime(end_date_str)))
+
+
+def future_trading_dates(start_date_str, count, calendar=None):
+    """start 之后的 count 个交易日 ['YYYYMMDD', ...]；日历不够时按工作日顺延 (calendar 缺省时取交易日历)"""
+    calendar = fetch_trade_calendar() if calendar is None else calendar
+    dates = [d for d in calendar if d > start_date_str][:count]
+    try:
+        current_date = datetime.strptime(dates[-1] if dates else start_date_str, "%Y%m%d")
+    except ValueError:
+        return [f"T+{i + 1}" for i in range(count)]
+    while len(dates) < count:
+        current_date += timedelta(days=1)
+        if current_date.weekday() < 5:
+            dates.append(current_date.strftime("%Y%m%d"))
+    return dates
+
+
+def fetch_security_list(previous=None):
+    """
+    全部 A 股代码、简称与上市日期: DataFrame[code, name, list_date]
+    按交易所列表取数，共 SECURITY_SOURCES 的 4 次请求 (ak.stock_info_a_code_name 内部就是拼接这 4 个列表，
+    只是丢掉了上市日期，所以不再另外调用它)。交易所之间没有一个同时给出代码、简称和上市日期的统一接口。
+    某个列表取不到时沿用 previous (上一份主表) 里该板块的记录，该板块的 ST / 涨跌停比例识别不会丢失；
+    没有可沿用的记录时返回 None，不缓存缺了一个板块的主表，下次再取
+    """
+    parts = []
+    for boards, load, code_col, name_col, date_col in SECURITY_SOURCES:
+        try:
+            part = load()
+            if part is None or part.empty:
+                raise ValueError("empty")
+            parts.append(pd.DataFrame({
+                "code": part[code_col].astype(str).str.zfill(6),
+                "name": part[name_col].astype(str).str.replace(' ', ''),
+                "list_date": pd.to_datetime(part[date_col], errors='coerce').dt.strftime('%Y%m%d').fillna(''),
+            }))
+        except Exception:
+            if previous is None or previous.empty:
+                return None
+            old = previous[previous['code'].astype(str).map(get_board).isin(boards)]
+            if old.empty:
+                return None
+            parts.append(old[["code", "name", "list_date"]])
+    return pd.concat(parts, ignore_index=True).drop_duplicates("code").reset_index(drop=True)
+
+
+def fetch_trade_calendar():
+    """交易日历 ['YYYYMMDD', ...]，失败返回空列表"""
+    def download():
+        try:
+            df = ak.tool_trade_date_hist_sina()
+            return np.array([pd.Timestamp(d).strftime("%Y%m%d") for d in df['trade_date']])
+        except Exception:
+            return None
+
+    def load():
+        dates = data_store().get_or_fetch("calendar", datetime.now().strftime("%Y%m%d"), download)
+        return None if dates is None else [str(d) for d in dates]
+    return _memoized(("calendar",), load) or []
+
+
+def fetch_index_daily(index_code):
+    """基准指数日线 DataFrame[date, index_close, index_pct_chg]，date 为 'YYYYMMDD'"""
+    def download():
+        index_df = ak.stock_zh_index_daily(symbol=index_code)
+        if index_df is None or index_df.empty:
+            return None
+        index_df['date'] = pd.to_datetime(index_df['date']).dt.strftime('%Y%m%d')
+        index_df = index_df.sort_values('date')
+        index_df['index_pct_chg'] = index_df['close'].pct_change() * 100
+        return index_df.rename(columns={'close': 'index_close'})[['date', 'index_close', 'index_pct_chg']]
+
+    def load():
+        today = datetime.now().strftime("%Y%m%d")
+        return data_store().get_or_fetch("index", f"{index_code}_{today}", download,
+                                         max_age=settled_max_age(today, INTRADAY_TTL))
+    return _memoized(("index", index_code), load)
+
+
+def fetch_index_spot(max_age=INDEX_SPOT_TTL):
+    """
+    全部指数实时点位，一次批量请求: Series[指数代码(sh000002) -> 最新点位]，失败返回 None
+    经共享数据仓库，max_age 秒内多个线程/进程共用同一份
+    """
+    def download():
+        try:
+            df = ak.stock_zh_index_spot_sina()
+        except Exception:
+            return None
+        if df is None or df.empty:
+            return None
+        levels = pd.to_numeric(df['最新价'], errors='coerce')
+        return pd.DataFrame({"code": df['代码'].astype(str), "level": levels}).dropna()
+
+    def load():
+        today = datetime.now().strftime("%Y%m%d")
+        return data_store().get_or_fetch("index_spot", today, download, max_age=max_age)
+    df = _flight.do(("index_spot",), load)
+    if df is None:
+        return None
+    return pd.Series(df['level'].to_numpy(dtype=np.float64), index=df['code'].to_numpy())
+
+
+def index_spot_level(spot, index_code):
+    """按代码取实时点位；交易所前缀不一致 (如北证 sz899050 / bj899050) 时按 6 位数字匹配"""
+    if spot is None:
+        return None
+    level = spot.get(index_code)
+    if level is None:
+        matched = spot[spot.index.str[-6:] == index_code[-6:]]
+        level = matched.iloc[0] if len(matched) else None
+    return float(level) if level is not None and level > 0 else None
+
+
+def append_index_spot(index_df, index_code, target_date_str, spot):
+    """
+    指数日线还没有今天 (盘中) 时，用实时点位补上今天这一行；
+    非交易日、分析的是历史日期或取不到实时点位时原样返回
+    """
+    today = datetime.now().strftime("%Y%m%d")
+    if index_df is None or index_df.empty or target_date_str < today or index_df['date'].iloc[-1] >= today:
+        return index_df
+    calendar = fetch_trade_calendar()
+    if calendar and today not in calendar:
+        return index_df
+    level = index_spot_level(spot, index_code)
+    if level is None:
+        return index_df
+    prev = float(index_df['index_close'].iloc[-1])
+    row = pd.DataFrame({'date': [today], 'index_close': [level], 'index_pct_chg': [(level / prev - 1) * 100]})
+    return pd.concat([index_df, row], ignore_index=True)
+
+
+def fetch_index_live(index_code, target_date_str, spot=None):
+    """指数日线 + 盘中实时点位 (spot 缺省时取共享的实时点位，同一次刷新只请求一次)"""
+    index_df = fetch_index_daily(index_code)
+    if index_df is None:
+        return None
+    today = datetime.now().strftime("%Y%m%d")
+    if spot is None and target_date_str >= today > index_df['date'].iloc[-1]:
+        spot = fetch_index_spot()
+    return append_index_spot(index_df, index_code, target_date_str, spot)
+
+
+def fetch_stock_daily(stock_code, target_date_str, lookback_days=120, log=print):
+    """
+    个股日线 DataFrame[date, close, pct_chg]，截止 target_date；
+    历史数据缺少最新交易日时用分钟线补全当日。同一 (代码, 日期, 窗口) 的并发请求只下载一次
+    """
+    def load():
+        return data_store().get_or_fetch(
+            "history", f"{target_date_str}/{stock_code}_{lookback_days}",
+            lambda: _fetch_stock_daily(stock_code, target_date_str, lookback_days, log),
+            max_age=settled_max_age(target_date_str, INTRADAY_TTL))
+    return _flight.do(("stock", stock_code, target_date_str, lookback_days), load)
+
+
+def _fetch_stock_daily(stock_code, target_date_str, lookback_days, log):
+    start_date = (pd.to_datetime(target_date_str) - timedelta(days=lookback_days)).strftime("%Y%m%d")
+    stock_df = ak.stock_zh_a_hist(symbol=stock_code, start_date=start_date, end_date=target_date_str, adjust="")
+
+    # 补全实时数据
+    need_realtime = False
+    if stock_df is None or stock_df.empty:
+         stock_df = pd.DataFrame(columns=['日期', '收盘', '涨跌幅'])
+         need_realtime = True
+    else:
+         last_date = stock_df.iloc[-1]['日期']
+         if isinstance(last_date, str):
+             last_d_str = last_date.replace('-', '')
+         else:
+             last_d_str = last_date.strftime("%Y%m%d")
+         if last_d_str < target_date_str:
+             need_realtime = True
+
+    if need_realtime:
+        real_data = get_realtime_quote_single(stock_code)
+        if real_data:
+            rt_time = real_data['time']
+            rt_date_str = rt_time.split(' ')[0].replace('-', '')
+            if rt_date_str > str(stock_df.iloc[-1]['日期'] if not stock_df.empty else '19900101').replace('-', ''):
+                price = real_data['price']
+                pct_chg = 0.0
+                if not stock_df.empty:
+                     last_close = float(stock_df.iloc[-1]['收盘'])
+                     if last_close > 0:
+                        pct_chg = (price - last_close) / last_close * 100
+
+                new_row = pd.DataFrame({'日期': [rt_date_str], '收盘': [float(price)], '涨跌幅': [float(pct_chg)]})
+                stock_df = pd.concat([stock_df, new_row], ignore_index=True)
+                log(f"   [实时补充] 现价:{price}")
+
+    if stock_df is None or stock_df.empty:
+        return None
+
+    stock_df = stock_df.rename(columns={'日期': 'date', '收盘': 'close', '涨跌幅': 'pct_chg'})
+    stock_df['date'] = pd.to_datetime(stock_df['date']).dt.strftime('%Y%m%d')
+    stock_df = stock_df[stock_df['date'] <= target_date_str]
+    stock_df['close'] = pd.to_numeric(stock_df['close'], errors='coerce')
+    stock_df['pct_chg'] = pd.to_numeric(stock_df['pct_chg'], errors='coerce')
+    return stock_df[['date', 'close', 'pct_chg']].sort_values('date').reset_index(drop=True)
@@ -0,0 +1,217 @@
+"""
+结果导出: 逐只股票流式写出明细与汇总，供风控看板等下游系统读取
+
+每算完一只股票就写出它的逐日明细 (PeriodResult) 与汇总 (PeriodSummary)，内存里不攒全市场的结果:
+    - csv     : <base>_rows.csv / <base>_summary.csv，表头在打开时写好，每只股票写完即 flush
+    - jsonl   : <base>_rows.jsonl / <base>_summary.jsonl，一行一条记录 (nan 写为 null)
+    - parquet : <base>_rows/part-00000.parquet ... 攒够 PARQUET_PART_ROWS 行或 PARQUET_PART_STOCKS 只股票
+                写一个分片 (需要 pyarrow)
+中途中止或进程被杀时，已写出的部分仍然完整可读: 文本格式按行追加，Parquet 分片先写临时文件再改名，
+最多丢失最后一个未满的分片 (几百只股票)，缓冲也只占几 MB。
+
+列结构固定 (ROW_SCHEMA / SUMMARY_SCHEMA)，与预测天数、规则无关；预测日的 T+n 由 offset 给出。
+"""
+import abc
+import os
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+EXPORT_DIR = "exports"
+FORMATS = ("csv", "jsonl", "parquet")
+PARQUET_PART_ROWS = 5_000
+PARQUET_PART_STOCKS = 200
+
+# (列名, dtype)
+ROW_SCHEMA = (
+    ("code", object), ("name", object), ("rule", object), ("days", np.int64), ("threshold", np.float64),
+    ("last_date", object), ("offset", np.int64), ("date", object), ("kind", object), ("base_date", object),
+    ("actual_pct", np.float64), ("deviation", np.float64), ("left_space", np.float64),
+    ("trigger_price", np.float64), ("room_pct", np.float64), ("boards", np.int64), ("triggered", bool),
+)
+SUMMARY_SCHEMA = (
+    ("code", object), ("name", object), ("rule", object), ("days", np.int64), ("threshold", np.float64),
+    ("last_date", object), ("price", np.float64), ("today_pct", np.float64), ("today_deviation", np.float64),
+    ("horizon", np.int64), ("next_trigger", np.float64), ("next_space", np.float64), ("next_boards", np.int64),
+    ("min_space", np.float64), ("min_space_day", np.int64),
+)
+
+
+def _frame(columns, schema):
+    return pd.DataFrame({name: np.asarray(columns[name], dtype=dtype) for name, dtype in schema})
+
+
+def result_rows(code, name, last_date, res, rule):
+    """PeriodResult -> 明细 DataFrame (ROW_SCHEMA)，每个 offset 一行"""
+    n = len(res)
+    return _frame({
+        "code": [code] * n, "name": [name] * n, "rule": [rule] * n,
+        "days": np.full(n, res.days), "threshold": np.full(n, res.threshold), "last_date": [last_date] * n,
+        "offset": res.offset, "date": res.dates, "kind": res.kinds, "base_date": res.base_dates,
+        "actual_pct": res.actual_pct, "deviation": res.deviation, "left_space": res.left_space,
+        "trigger_price": res.trigger_price, "room_pct": res.room_pct, "boards": res.boards,
+        "triggered": res.triggered,
+    }, ROW_SCHEMA)
+
+
+def summary_row(code, last_date, res, summary):
+    """PeriodSummary -> 汇总 DataFrame (SUMMARY_SCHEMA)，一行；min_space_day 为允许涨幅最小的 T+n (无预测日为 0)"""
+    space = np.where(np.isnan(summary.space), np.inf, summary.space)
+    k = int(space.argmin()) if len(space) and np.isfinite(space.min()) else None
+    return _frame({
+        "code": [code], "name": [summary.name], "rule": [summary.kind], "days": [res.days],
+        "threshold": [res.threshold], "last_date": [last_date], "price": [summary.price],
+        "today_pct": [summary.today_pct], "today_deviation": [summary.today_deviation],
+        "horizon": [len(summary.dates)],
+        "next_trigger": [summary.trigger[0] if len(summary.trigger) else np.nan],
+        "next_space": [summary.space[0] if len(summary.space) else np.nan],
+        "next_boards": [summary.boards[0] if len(summary.boards) else 0],
+        "min_space": [np.nan if k is None else summary.space[k]],
+        "min_space_day": [0 if k is None else k + 1],
+    }, SUMMARY_SCHEMA)
+
+
+class ResultWriter(abc.ABC):
+    """
+    流式结果写出器基类: write() 每只股票调用一次，close() 收尾 (也可用 with)
+    rows / summaries 为已写出的行数；子类实现 _write(kind, frame)
+    """
+    suffix = ""
+
+    def __init__(self, base):
+        self.base = base
+        self.rows = 0
+        self.summaries = 0
+        parent = os.path.dirname(base)
+        if parent:
+            os.makedirs(parent, exist_ok=True)
+
+    def write(self, code, name, last_date, results):
+        """results: [(PeriodResult, PeriodSummary), ...] (各规则)"""
+        rows = [result_rows(code, name, last_date, res, summary.kind) for res, summary in results if len(res)]
+        summaries = [summary_row(code, last_date, res, summary) for res, summary in results]
+        if rows:
+            frame = pd.concat(rows, ignore_index=True)
+            self._write("rows", frame)
+            self.rows += len(frame)
+        if summaries:
+            self._write("summary", pd.concat(summaries, ignore_index=True))
+            self.summaries += len(summaries)
+
+    @abc.abstractmethod
+    def _write(self, kind, frame):
+        """写出一只股票的 kind ('rows' / 'summary') 结果"""
+
+    def paths(self):
+        return [f"{self.base}_{kind}{self.suffix}" for kind in ("rows", "summary")]
+
+    def close(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class CsvWriter(ResultWriter):
+    suffix = ".csv"
+
+    def __init__(self, base):
+        super().__init__(base)
+        self._files = {}
+        for kind, schema in (("rows", ROW_SCHEMA), ("summary", SUMMARY_SCHEMA)):
+            f = open(f"{base}_{kind}{self.suffix}", "w", encoding="utf-8", newline="")
+            f.write(",".join(name for name, _ in schema) + "\n")
+            f.flush()
+            self._files[kind] = f
+
+    def _write(self, kind, frame):
+        f = self._files[kind]
+        frame.to_csv(f, header=False, index=False, lineterminator="\n")
+        f.flush()
+
+    def close(self):
+        for f in self._files.values():
+            f.close()
+
+
+class JsonlWriter(ResultWriter):
+    suffix = ".jsonl"
+
+    def __init__(self, base):
+        super().__init__(base)
+        self._files = {kind: open(f"{base}_{kind}{self.suffix}", "w", encoding="utf-8")
+                       for kind in ("rows", "summary")}
+
+    def _write(self, kind, frame):
+        f = self._files[kind]
+        text = frame.to_json(orient="records", lines=True, force_ascii=False)
+        f.write(text if text.endswith("\n") else text + "\n")
+        f.flush()
+
+    def close(self):
+        for f in self._files.values():
+            f.close()
+
+
+class ParquetWriter(ResultWriter):
+    """每种结果一个目录，攒够 part_rows 行或 part_stocks 只股票写一个分片；可直接用 pd.read_parquet(目录) 读取"""
+
+    def __init__(self, base, part_rows=PARQUET_PART_ROWS, part_stocks=PARQUET_PART_STOCKS):
+        try:
+            import pyarrow  # noqa: F401
+        except ImportError:
+            raise ImportError("导出 Parquet 需要安装 pyarrow: pip install pyarrow")
+        super().__init__(base)
+        self.part_rows = part_rows
+        self.part_stocks = part_stocks
+        self._stocks = 0
+        self._buffers = {"rows": [], "summary": []}
+        self._parts = {"rows": 0, "summary": 0}
+        for path in self.paths():
+            os.makedirs(path, exist_ok=True)
+
+    def write(self, code, name, last_date, results):
+        super().write(code, name, last_date, results)
+        self._stocks += 1
+        if self._stocks >= self.part_stocks:
+            self.close()        # 写出全部缓冲，可继续写入
+
+    def _write(self, kind, frame):
+        buf = self._buffers[kind]
+        buf.append(frame)
+        if sum(len(f) for f in buf) >= self.part_rows:
+            self._flush(kind)
+
+    def _flush(self, kind):
+        buf = self._buffers[kind]
+        if not buf:
+            return
+        folder, name = f"{self.base}_{kind}", f"part-{self._parts[kind]:05d}.parquet"
+        path = os.path.join(folder, name)
+        # 以 . 开头的临时文件读取目录时会被忽略，写到一半被杀也不影响已有分片
+        tmp = os.path.join(folder, f".{name}.tmp")
+        pd.concat(buf, ignore_index=True).to_parquet(tmp, index=False)
+        os.replace(tmp, path)
+        self._parts[kind] += 1
+        buf.clear()
+
+    def close(self):
+        for kind in self._buffers:
+            self._flush(kind)
+        self._stocks = 0
+
+
+def open_writer(fmt, base=None):
+    """fmt: 'csv' / 'jsonl' / 'parquet' (为空返回 None)；base 为空时写到 exports/异动分析_日期_时分秒"""
+    if not fmt:
+        return None
+    fmt = fmt.lower()
+    if fmt not in FORMATS:
+        raise ValueError(f"不支持的导出格式: {fmt} (可选 {', '.join(FORMATS)})")
+    if base is None:
+        base = os.path.join(EXPORT_DIR, f"异动分析_{datetime.now().strftime('%Y%m%d_%H%M%S')}")
+    return {"csv": CsvWriter, "jsonl": JsonlWriter, "parquet": ParquetWriter}[fmt](base)
@@ -1,12 +1,10 @@
 import tkinter as tk
 from tkinter import ttk, scrolledtext, messagebox
 import threading
+import multiprocessing
 import sys
 import pandas as pd
-import akshare as ak
-from datetime import datetime, timedelta
-import math
-from decimal import Decimal, ROUND_HALF_UP, ROUND_CEILING
+from datetime import datetime
 import time
 import os
 import matplotlib
@@ -15,6 +13,29 @@ import matplotlib.pyplot as plt
 import socket
 socket.setdefaulttimeout(15) # 设置全局网络超时时间(秒)
 
+import numpy as np
+
+from calASM_numeric import round_half_up
+from calASM_limitpath import DEFAULT_PATH_DAYS, limit_path_lines
+from calASM_period import MAX_HORIZON, overview_columns, period_result
+from calASM_scenario import DEFAULT_MOVES, parse_moves, scenario_grid_from_frames
+from calASM_montecarlo import DEFAULT_PATHS, estimate_many
+from calASM_rules import format_rule_status, get_board, get_rules
+from calASM_api import LocalSource, analyze_frame
+from calASM_security import get_market_rules, stock_name
+from calASM_data import clear_memo, future_trading_dates
+from calASM_panel import load_panel
+from calASM_cache import (ResultCache, analysis_key, session_closed, table_digest, cached_image,
+                          record_image, evict)
+from calASM_report import write_report
+from calASM_export import open_writer
+from calASM_premarket import TriggerTable, build_table
+from calASM_alert import AlertEngine, AlertWatcher, current_k, format_alert
+from calASM_service import connect as connect_service
+from calASM_symbols import parse_stock_list
+from calASM_timeline import build_timeline, minute_label
+from calASM_prefetch import Prefetcher
+
 
 DEFAUT_STOKE = """600372 中航机载
 601698 中国卫通
@@ -43,190 +64,12 @@ DEFAUT_STOKE = """600372 中航机载
 
 # ================= 核心逻辑 (复用自原脚本) =================
 
-def round_half_up(value, decimals=2):
-    try:
-        d = Decimal(str(value))
-        fmt = "0." + "0" * decimals
-        return float(d.quantize(Decimal(fmt), rounding=ROUND_HALF_UP))
-    except:
-        return value
-
-def get_realtime_quote_single(code):
-    try:
-        df = ak.stock_zh_a_hist_min_em(symbol=code, period='1', adjust='')
-        if df is None or df.empty:
-            return None
-        last_row = df.iloc[-1]
-        time_str = str(last_row['时间'])
-        price = float(last_row['收盘'])
-        return {'time': time_str, 'price': price}
-    except Exception as e:
-        return None
-
-def get_market_rules(stock_code):
-    # 默认值 (上交所主板)
-    # 上证A股指数: 根据最新信息，使用 000002 或 999998 (wind/交易所代码习惯不同，akshare通常支持sh000002)
-    # sh000002 是上证A股指数的标准代码
-    index_code = "sh000002"
-    index_name = "上证A股"
-    limit_ratio = 1.10
-    
-    # 1. 科创板 (688开头)
-    if stock_code.startswith("688"):
-        # 核心基准: 科创50 (000688)
-        index_code = "sh000688"
-        index_name = "科创50"
-        limit_ratio = 1.20
-
-    # 2. 上交所主板 (60开头)
-    elif stock_code.startswith("60"):
-        # 基准: 上证A股 (000002)
-        index_code = "sh000002" 
-        index_name = "上证A股"
-        limit_ratio = 1.10
-
-    # 3. 创业板 (30开头)
-    elif stock_code.startswith("30"):
-        # 基准: 创业板综 (399102)
-        index_code = "sz399102"
-        index_name = "创业板综"
-        limit_ratio = 1.20
-
-    # 4. 深交所主板 (00开头)
-    elif stock_code.startswith("00"):
-        # 基准: 深证A股 (399107)
-        index_code = "sz399107"
-        index_name = "深证A股"
-        limit_ratio = 1.10
-
-    # 5. 北交所 (8开头)
-    elif stock_code.startswith("8") or stock_code.startswith("92"): 
-         # 基准: 北证50 (899050)
-         # 尝试使用 sz899050 (AKShare部分接口可能支持)
-         # 如果接口报错，需要后续维护
-         index_code = "sz899050" 
-         index_name = "北证50"
-         limit_ratio = 1.30 
-
-    return index_code, index_name, limit_ratio
-
 def get_future_trading_dates(start_date_str, count):
-    dates = []
-    try:
-        df = ak.tool_trade_date_hist_sina()
-        all_dates = df['trade_date'].astype(str).tolist()
-        dates = [d for d in all_dates if d > start_date_str]
-        dates = dates[:count]
-    except:
-        pass
-    
-    try:
-        current_date = datetime.strptime(start_date_str, "%Y%m%d")
-    except:
-        return [f"T+{i+1}" for i in range(count)]
-
-    while len(dates) < count:
-        current_date += timedelta(days=1)
-        if current_date.weekday() < 5:
-            d_str = current_date.strftime("%Y%m%d")
-            if d_str not in dates:
-                dates.append(d_str)
-    return dates
+    return future_trading_dates(start_date_str, count)
 
 def analyze_period_combined(df, future_dates, days, threshold, limit_ratio):
-    result_data = []
-    current_idx = len(df) - 1
-    
-    # 确保有数据
-    if current_idx < 0: return pd.DataFrame()
-
-    t_row = df.iloc[current_idx]
-    current_price = t_row['close']
-    current_index = t_row['index_close']
-    
-    for offset in range(-2, len(future_dates) + 1):
-        if offset <= 0:
-            type_label = "历史" if offset < 0 else "今日"
-            target_idx = current_idx + offset
-            if target_idx < 0: continue
-            
-            target_row = df.iloc[target_idx]
-            target_date_str = target_row['date']
-            p_end = target_row['close']
-            i_end = target_row['index_close']
-            actual_pct = target_row['pct_chg']
-            base_idx = target_idx - days
-            p_prev = df.iloc[target_idx - 1]['close'] if target_idx > 0 else p_end
-        else:
-            type_label = "预测"
-            date_str = future_dates[offset - 1]
-            try:
-                target_date_str = datetime.strptime(date_str, "%Y%m%d").strftime("%m-%d") + f"(T+{offset})"
-            except:
-                target_date_str = f"{date_str}(T+{offset})"
-            
-            p_end = current_price
-            i_end = current_index
-            p_prev = current_price 
-            actual_pct = 0.0
-            base_idx = current_idx + offset - days
-
-        if base_idx < 0: continue
-
-        base_row = df.iloc[base_idx]
-        p_base = base_row['close']
-        i_base = base_row['index_close']
-        base_date_str = base_row['date']
-
-        try:
-            d_p_end = Decimal(str(p_end)) 
-            d_p_base = Decimal(str(p_base))
-            d_i_end = Decimal(str(i_end))
-            d_i_base = Decimal(str(i_base))
-            
-            stock_cum_d = ((d_p_end / d_p_base) - 1) * 100
-            index_cum_d = ((d_i_end / d_i_base) - 1) * 100
-            
-            deviation_d = stock_cum_d - index_cum_d
-            
-            stock_cum = float(stock_cum_d)
-            index_cum = float(index_cum_d)
-            deviation = float(deviation_d)
-        except:
-            stock_cum = (p_end / p_base - 1) * 100
-            index_cum = (i_end / i_base - 1) * 100
-            deviation = stock_cum - index_cum
-        
-        is_triggered = abs(deviation) >= threshold
-        
-        target_stock_cum = threshold + index_cum
-        trigger_price = p_base * (1 + target_stock_cum / 100)
-        
-        left_space = threshold - deviation
-        
-        rp_tri_pri = round_half_up(trigger_price, 2)
-        room_pct = (rp_tri_pri / p_prev - 1) * 100 if p_prev > 0 else 0
-            
-        limit_boards_val = 0
-        if room_pct > 0:
-             ratio = 1 + room_pct/100
-             if ratio > 1 and math.log(limit_ratio) > 0:
-                limit_boards_val = math.floor(math.log(ratio) / math.log(limit_ratio))
-        
-        row_dict = {
-            "日期": target_date_str,
-            "类型": type_label,
-            "基准日期": base_date_str,
-            "实际涨幅": f"{round_half_up(actual_pct, 2):.2f}%", 
-            "区间偏离": f"{round_half_up(deviation, 2):.2f}%",
-            "剩余空间": "已触发" if is_triggered else f"{round_half_up(left_space, 2):.2f}%",
-            "触线价格": float(f"{round_half_up(trigger_price, 2):.2f}"),
-            "允许涨幅": "0.00%" if is_triggered else f"{room_pct:.2f}%",
-            "允许连板": 0 if is_triggered else limit_boards_val
-        }
-        result_data.append(row_dict)
-    
-    return pd.DataFrame(result_data)
+    # 全部偏移 (T-2..T+N) 一次数组运算，见 calASM_period；这里返回展示用的文字表
+    return period_result(df, future_dates, days, threshold, limit_ratio).to_frame()
 
 # ================= 绘图逻辑 =================
 import matplotlib
@@ -284,33 +127,25 @@ TABLE_FIG_HEIGHT_PER_ROW = 0.4
 def plot_summary_overview(summary_data, title_prefix, show_boards=True):
     if not summary_data: return
 
-    meta_dates = []
-    if "_meta_dates" in summary_data[0]:
-        meta_dates = summary_data[0]["_meta_dates"]
-    
+    # 预测天数较多时只画代表性的日子 (T+1..T+5、10/20/40/60/120/250 日)，图宽不再随天数增长
+    columns = overview_columns(summary_data[0])
     clean_data = []
     # 动态构建列：名称, 现价, T1组...
     
     for item in summary_data:
-        new_item = item.copy()
-        if "_meta_dates" in new_item: del new_item["_meta_dates"]
-        
-        row_data = [
-            new_item.get('名称', '-'),
-            new_item.get('现价', '-')
-        ]
+        row_data = [item.name, f"{item.price:.2f}"]
         
-        # 根据 meta_dates 的长度确定有多少天的数据
-        for i in range(1, len(meta_dates) + 1):
-            row_data.append(new_item.get(f'T{i}_触线', '-'))
-            row_data.append(new_item.get(f'T{i}_空间', '-'))
-            if show_boards:
-                row_data.append(new_item.get(f'T{i}_板', '-'))
+        for i, _ in columns:
+            trigger, space, boards = item.cells(i)
+            row_data += [trigger, space, boards] if show_boards else [trigger, space]
             
         clean_data.append(row_data)
+
+    digest = table_digest("overview", title_prefix, [show_boards, columns] + clean_data)
+    if cached_image(digest): return
     
     # 基础列 2 + 每天 (2 or 3) 列
-    days_count = len(meta_dates)
+    days_count = len(columns)
     col_per_day = 3 if show_boards else 2
     n_cols = 2 + days_count * col_per_day
     n_rows = len(clean_data)
@@ -338,8 +173,7 @@ def plot_summary_overview(summary_data, title_prefix, show_boards=True):
     even_day_bg = '#ffffff' # 白 (用于偶数天 T2, T4...)
     
     headers = ["名称", "现价"]
-    for i, d_str in enumerate(meta_dates):
-        # 如果 d_str 太长 (比如 T+10)，只显示日期部分
+    for _, d_str in columns:
         headers.append(f"{d_str}\n触线价")
         headers.append(f"{d_str}\n允许涨幅")
         if show_boards:
@@ -385,7 +219,6 @@ def plot_summary_overview(summary_data, title_prefix, show_boards=True):
             data_row_idx = row - 1
             cell.set_height(TABLE_ROW_HEIGHT)
             cell.set_facecolor(cell_bg) # 应用背景色
-            text_val = cell.get_text().get_text()
             
             # col 0: 名称
             if col == 0: cell.set_text_props(weight='bold')
@@ -395,29 +228,23 @@ def plot_summary_overview(summary_data, title_prefix, show_boards=True):
             if col > 1:
                 rel_col = (col - 2) % col_per_day
                 
-                # 允许涨幅列
-                if rel_col == 1:
-                    if "触发" in text_val or "已触发" in text_val:
+                item = summary_data[data_row_idx]
+                i = columns[(col - 2) // col_per_day][0]
+                
+                # 允许涨幅列 (按数值与触发标志着色，不再解析文字)
+                if rel_col == 1 and item.has(i):
+                    val = item.space[i]
+                    if item.triggered[i]:
                         cell.set_text_props(color='white', weight='bold')
                         cell.set_facecolor('#c0392b')
-                    else:
-                        try:
-                            val = float(text_val.replace('%', ''))
-                            rounded_val = round_half_up(val, 2)
-                            cell.get_text().set_text(f"{rounded_val:.2f}%") 
-                            if val < 10.0: cell.set_text_props(color='red', weight='bold')
-                            elif val < 20.0: cell.set_text_props(color='#e67e22', weight='bold') 
-                            elif val < 30.0: cell.set_text_props(color='#2980b9', weight='bold') # 20-30% 蓝色提示
-                        except: pass
+                    elif val < 10.0: cell.set_text_props(color='red', weight='bold')
+                    elif val < 20.0: cell.set_text_props(color='#e67e22', weight='bold') 
+                    elif val < 30.0: cell.set_text_props(color='#2980b9', weight='bold') # 20-30% 蓝色提示
                 
                 # 允许连板列
-                if show_boards and rel_col == 2:
-                    try:
-                        val = int(text_val)
-                        if val > 0:
-                            cell.set_text_props(weight='bold', color='#2980b9')
-                            cell.set_fontsize(TABLE_CELL_FONT_SIZE)
-                    except: pass
+                if show_boards and rel_col == 2 and item.has(i) and item.boards[i] > 0:
+                    cell.set_text_props(weight='bold', color='#2980b9')
+                    cell.set_fontsize(TABLE_CELL_FONT_SIZE)
 
     full_title = f"{title_prefix} - 异动分析总览"
     plt.title(full_title, fontsize=TABLE_TITLE_FONT_SIZE, weight='bold', pad=20)
@@ -429,11 +256,17 @@ def plot_summary_overview(summary_data, title_prefix, show_boards=True):
     safe_title = f"images/总览_{title_prefix}_{datetime.now().strftime('%H%M')}.png"
     try:
         plt.savefig(safe_title, dpi=300, bbox_inches='tight')
+        record_image(digest, safe_title)
     except: pass
     plt.close()
 
-def plot_result_table(df, title):
-    if df.empty: return
+def plot_result_table(res, title):
+    if not len(res): return
+    df = res.to_frame()
+    kinds = res.kinds
+    # 内容相同的表格已渲染过则直接复用
+    digest = table_digest("result", title, [list(df.columns)] + df.values.tolist())
+    if cached_image(digest): return
     rows, cols = df.shape
     fig_height = max(3, rows * 0.4 + 1.5)
     fig_width = 10 
@@ -461,32 +294,26 @@ def plot_result_table(df, title):
         else:
             cell.set_height(0.1)
             cell.set_facecolor(row_colors[row % 2])
-            text_val = cell.get_text().get_text()
+            r = row - 1
             column_name = df.columns[col]
 
             if column_name == "类型":
-                if "预测" in text_val: cell.set_text_props(color='#d62728', weight='bold') 
-                elif "今日" in text_val: cell.set_text_props(color='#2ca02c', weight='bold') 
-                elif "历史" in text_val: cell.set_text_props(color='#7f7f7f')
+                if kinds[r] == "预测": cell.set_text_props(color='#d62728', weight='bold') 
+                elif kinds[r] == "今日": cell.set_text_props(color='#2ca02c', weight='bold') 
+                else: cell.set_text_props(color='#7f7f7f')
 
-            if column_name == "剩余空间":
-                if "触发" in text_val or "已触发" in text_val:
-                    cell.set_text_props(color='red', weight='bold')
-                    cell.set_facecolor('#ffeeee')
+            if column_name == "剩余空间" and res.triggered[r]:
+                cell.set_text_props(color='red', weight='bold')
+                cell.set_facecolor('#ffeeee')
 
             if column_name == "允许涨幅":
-                try:
-                    val_float = float(text_val.replace('%', ''))
-                    if val_float < 10.0: cell.set_text_props(color='red', weight='bold') 
-                    elif val_float < 20.0: cell.set_text_props(color='#e67e22', weight='bold')
-                    elif val_float < 30.0: cell.set_text_props(color='#2980b9', weight='bold')
-                except: pass
-
-            if column_name == "允许连板":
-                try:
-                    val = int(text_val)
-                    if val > 0: cell.set_text_props(weight='bold', color='#1f77b4')
-                except: pass
+                val = res.room_pct[r]
+                if val < 10.0: cell.set_text_props(color='red', weight='bold') 
+                elif val < 20.0: cell.set_text_props(color='#e67e22', weight='bold')
+                elif val < 30.0: cell.set_text_props(color='#2980b9', weight='bold')
+
+            if column_name == "允许连板" and res.boards[r] > 0:
+                cell.set_text_props(weight='bold', color='#1f77b4')
 
     plt.title(title, fontsize=24, weight='bold', pad=20)
     plt.tight_layout()
@@ -494,6 +321,7 @@ def plot_result_table(df, title):
     filename = f"images/{title.replace(' ', '_').replace('/', '-')}.png"
     try:
         plt.savefig(filename, dpi=300, bbox_inches='tight')
+        record_image(digest, filename)
     except: pass
     plt.close()
 
@@ -508,6 +336,23 @@ class AnalysisApp:
         # 运行状态标志
         self.is_running = False
         self.stop_requested = False
+
+        # 分析结果缓存 (行情数据经共享数据仓库 cache/data)
+        self.result_cache = ResultCache()
+        self.panel = None
+
+        # 最近一次分析的行情数据 {代码: (名称, merged_df, limit_ratio)}，供情景网格复用
+        self.frames = {}
+
+        # 本次运行各股票的明细 [(名称, 代码, 日期, res_10, res_30)] (PeriodResult)，供 HTML 报告使用
+        self.details = []
+
+        # 盘前触线价格表: 启动时载入最近一份，盘中按价格直接查表
+        self.trigger_table = TriggerTable.load()
+        self.watcher = None
+
+        # 按容量与保留天数清理图片、历史分区、快照等缓存
+        threading.Thread(target=evict, daemon=True).start()
         
         # 顶部输入区域
         top_frame = tk.Frame(root, pady=10)
@@ -529,25 +374,62 @@ class AnalysisApp:
         self.days_entry = tk.Entry(opt_frame, width=5)
         self.days_entry.insert(0, "3")
         self.days_entry.pack(side=tk.LEFT, padx=5)
-        tk.Label(opt_frame, text="(最大建议10天)").pack(side=tk.LEFT)
+        tk.Label(opt_frame, text="(最长250天)").pack(side=tk.LEFT)
 
-        self.save_img_var = tk.BooleanVar(value=True)
-        tk.Checkbutton(opt_frame, text="保存图片", variable=self.save_img_var).pack(side=tk.LEFT, padx=10)
+        # HTML 报告毫秒级生成，默认输出；PNG 渲染较慢，按需勾选
+        self.html_var = tk.BooleanVar(value=True)
+        tk.Checkbutton(opt_frame, text="HTML报告", variable=self.html_var).pack(side=tk.LEFT, padx=10)
+
+        self.save_img_var = tk.BooleanVar(value=False)
+        tk.Checkbutton(opt_frame, text="保存图片", variable=self.save_img_var).pack(side=tk.LEFT, padx=5)
         
         self.show_boards_var = tk.BooleanVar(value=True)
         tk.Checkbutton(opt_frame, text="显示连板", variable=self.show_boards_var).pack(side=tk.LEFT, padx=5)
 
+        # 逐只股票流式导出明细与汇总到 exports/，供下游系统读取
+        tk.Label(opt_frame, text="导出:").pack(side=tk.LEFT, padx=(10, 0))
+        self.export_var = tk.StringVar(value="不导出")
+        ttk.Combobox(opt_frame, textvariable=self.export_var, state='readonly', width=8,
+                     values=["不导出", "CSV", "JSONL", "Parquet"]).pack(side=tk.LEFT, padx=5)
+        self.exporter = None
+
         btn_frame = tk.Frame(top_frame)
         btn_frame.pack(fill=tk.X)
         
         self.run_btn = tk.Button(btn_frame, text="开始分析", command=self.start_analysis, bg="#007acc", fg="white", font=("微软雅黑", 10, "bold"), padx=20)
         self.run_btn.pack(side=tk.LEFT)
+
+        self.scenario_btn = tk.Button(btn_frame, text="情景网格", command=self.open_scenario_window, padx=10)
+        self.scenario_btn.pack(side=tk.LEFT, padx=10)
+
+        self.mc_btn = tk.Button(btn_frame, text="触发概率", command=self.start_montecarlo, padx=10)
+        self.mc_btn.pack(side=tk.LEFT)
+
+        tk.Button(btn_frame, text="盘中走势", command=self.open_timeline_window, padx=10).pack(side=tk.LEFT, padx=10)
+
+        tk.Label(btn_frame, text="代码 价格:").pack(side=tk.LEFT, padx=(20, 0))
+        self.query_entry = tk.Entry(btn_frame, width=18)
+        self.query_entry.pack(side=tk.LEFT, padx=5)
+        self.query_entry.bind("<Return>", lambda e: self.query_trigger())
+        tk.Button(btn_frame, text="触线查询", command=self.query_trigger, padx=10).pack(side=tk.LEFT)
+
+        self.watch_btn = tk.Button(btn_frame, text="盯盘预警", command=self.toggle_watch, padx=10)
+        self.watch_btn.pack(side=tk.LEFT, padx=10)
+        self.watch_btn_bg = self.watch_btn.cget("bg")
         
         # 底部输出区域
         tk.Label(root, text="运行日志与结果:", font=("微软雅黑", 10)).pack(anchor="w", padx=10)
         
         self.output_text = scrolledtext.ScrolledText(root, height=20, font=("Consolas", 10), state='disabled')
         self.output_text.pack(fill=tk.BOTH, expand=True, padx=10, pady=5)
+
+        # 启动预取: 窗口出现后在后台把证券主表 (不是今天的则刷新)、交易日历、基准指数
+        # 与输入框中股票的日线拉进缓存，第一次点击直接命中；前台分析时自动让行
+        self.prefetch_var = tk.StringVar(value="")
+        tk.Label(root, textvariable=self.prefetch_var, fg="#555555", anchor="w").pack(fill=tk.X, padx=10, pady=(0, 5))
+        stock_list, _, _ = parse_stock_list(self.input_text.get("1.0", tk.END))
+        self.prefetcher = Prefetcher([code for code, _ in stock_list], on_status=self.show_prefetch_status)
+        self.root.after(200, self.prefetcher.start)
         
     def log(self, msg):
         self.output_text.config(state='normal')
@@ -556,6 +438,9 @@ class AnalysisApp:
         self.output_text.config(state='disabled')
         self.root.update()
 
+    def show_prefetch_status(self, msg):
+        self.root.after(0, lambda: self.prefetch_var.set(msg))
+
     def start_analysis(self):
         # 如果正在运行，则视为停止请求
         if self.is_running:
@@ -571,15 +456,14 @@ class AnalysisApp:
         
         # 获取输入
         raw_input = self.input_text.get("1.0", tk.END).strip()
-        lines = [l.strip() for l in raw_input.split('\n') if l.strip()]
-        
-        stock_list = []
-        for line in lines:
-            parts = line.replace(',', ' ').split()
-            if len(parts) >= 1:
-                code = parts[0]
-                name = parts[1] if len(parts) > 1 else code
-                stock_list.append((code, name))
+        # 代码统一规范化 (sh600372 / 600372.SH -> 600372)，重复的只分析一次
+        stock_list, duplicates, invalid = parse_stock_list(raw_input)
+        if duplicates:
+            self.log(f"已去除重复代码: {', '.join(duplicates)}")
+        if invalid:
+            self.log(f"无法识别的代码已忽略: {', '.join(invalid)}")
+        # 只填了代码的按证券主表补全名称
+        stock_list = [(code, stock_name(code) if name == code else name) for code, name in stock_list]
         
         if not stock_list:
             messagebox.showwarning("提示", "请输入股票代码")
@@ -590,7 +474,8 @@ class AnalysisApp:
         try:
             days_count = int(self.days_entry.get().strip())
             if days_count <= 0: days_count = 3
-            if days_count > 20: days_count = 20 # 限制一个硬上限防止卡死
+            # 偏离计算按偏移向量化，最长可预测一整年 (250 个交易日)
+            days_count = min(days_count, MAX_HORIZON)
         except:
             days_count = 3
         
@@ -603,6 +488,8 @@ class AnalysisApp:
         # 按钮变为红色停止按钮
         self.run_btn.config(state='normal', text="停止 / 刷新", bg="#e74c3c")
 
+        # 预取让行，分析结束后继续
+        self.prefetcher.pause()
         # 启动线程
         threading.Thread(target=self.run_process, args=(stock_list, days_count, show_boards), daemon=True).start()
 
@@ -610,6 +497,7 @@ class AnalysisApp:
         summary_list_10 = []
         summary_list_30 = []
         summary_list_combined = [] # 综合最严异动列表
+        self.details = []
 
         target_date_str = datetime.now().strftime("%Y%m%d")
         self.log(f"分析日期: {target_date_str}")
@@ -617,26 +505,30 @@ class AnalysisApp:
         self.log(f"共 {len(stock_list)} 支股票待处理...")
         self.log("-" * 40)
 
-        def parse_space(val_str):
-            # 解析剩余空间，返回float用于比较
-            # "已触发" -> -9999 (优先级最高，最严)
-            if not val_str: return 9999.0
-            s_val = str(val_str)
-            if "触发" in s_val: return -9999.0
-            try:
-                return float(s_val.replace('%', ''))
-            except:
-                return 9999.0
+        # 第一阶段: 拉取行情，按交易日历对齐为面板
+        self.panel = self.build_panel(stock_list, target_date_str)
+        if self.panel is not None:
+            self.build_trigger_table(days_count, target_date_str)
+            self.log("-" * 40)
+
+        fmt = self.export_var.get()
+        try:
+            self.exporter = open_writer(None if fmt == "不导出" else fmt)
+        except Exception as e:
+            self.exporter = None
+            self.log(f"无法导出结果: {e}")
 
         for code, name in stock_list:
             # 检查中止标志
             if self.stop_requested:
                 self.log(f"\n>>> 检测到中止信号，停止后续任务。")
                 break
+            if self.panel is None or code not in self.panel.row:
+                continue
 
             try:
-                self.log(f"正在处理: {code} {name} ...")
-                s10, s30 = self.process_one_stock(code, name, target_date_str, days_count)
+                self.log(f"正在分析: {code} {name} ...")
+                s10, s30 = self.process_one_stock(code, name, self.panel.frame(code), days_count)
                 
                 # 收集分表数据
                 if s10: summary_list_10.append(s10)
@@ -644,8 +536,8 @@ class AnalysisApp:
 
                 # 计算综合极小值 (取T+1空间较小者)
                 if s10 and s30:
-                    v10 = parse_space(s10.get('T1_空间'))
-                    v30 = parse_space(s30.get('T1_空间'))
+                    v10 = s10.first_space()
+                    v30 = s30.first_space()
                     if v10 <= v30:
                         summary_list_combined.append(s10)
                     else:
@@ -654,8 +546,6 @@ class AnalysisApp:
                     summary_list_combined.append(s10)
                 elif s30:
                     summary_list_combined.append(s30)
-
-                time.sleep(0.5) 
             except socket.timeout:
                 self.log(f"❌ 处理出错: 网络连接超时，请检查网络或重试。")
             except Exception as e:
@@ -664,6 +554,13 @@ class AnalysisApp:
                      err_msg = "网络请求超时"
                 self.log(f"❌ 处理出错: {err_msg}")
 
+        # 每只股票已即时写出，中止时已处理的部分同样保留
+        if self.exporter is not None:
+            self.exporter.close()
+            self.log(f"\n已导出 {self.exporter.rows} 行明细、{self.exporter.summaries} 行汇总: "
+                     + ", ".join(os.path.abspath(p) for p in self.exporter.paths()))
+            self.exporter = None
+
         if not self.stop_requested:
             self.log("\n" + "="*40)
             self.log("分析完成。生成汇总表...")
@@ -682,30 +579,31 @@ class AnalysisApp:
             else:
                 self.log("未生成任何有效异动数据。")
 
+            if self.html_var.get() and summary_list_combined:
+                self.save_html_report(target_date_str, [
+                    ("异动分析总览(取T1空间极小值)", summary_list_combined, show_boards),
+                    ("10日严重异动(100%偏离)", summary_list_10, show_boards),
+                    ("30日严重异动(200%偏离)", summary_list_30, show_boards),
+                ])
+
             messagebox.showinfo("完成", "分析已完成！")
         else:
              self.log("\n>>> 任务已手动中止。")
 
         self.is_running = False
         self.stop_requested = False
+        self.prefetcher.resume()
         self.root.after(0, lambda: self.run_btn.config(state='normal', text="开始分析", bg="#007acc"))
 
     def print_summary_table(self, title, summary_data, show_boards=True):
         if not summary_data: return
         
-        # 探测数据中包含多少天 (读取一条数据看看T1, T2最大到多少)
-        # 或者直接取 _meta_dates
-        meta_dates = []
-        if "_meta_dates" in summary_data[0]:
-            meta_dates = summary_data[0]["_meta_dates"]
-        
-        if not meta_dates:
-             # 兜底旧逻辑
-             meta_dates = ["T+1", "T+2", "T+3"]
+        # 预测天数较多时只列代表性的日子，完整逐日数据见明细表 / HTML 报告
+        columns = overview_columns(summary_data[0])
 
         # 动态构建列头
         headers = ["名称", "现价"]
-        for i, _ in enumerate(meta_dates):
+        for i, _ in columns:
             idx = i + 1
             headers.extend([f"T{idx}_触线", f"T{idx}_空间"])
             if show_boards:
@@ -714,15 +612,10 @@ class AnalysisApp:
         # 构建 DataFrame
         rows = []
         for item in summary_data:
-            row = [
-                item.get('名称', '-'), item.get('现价', '-')
-            ]
-            for i, _ in enumerate(meta_dates):
-                idx = i + 1
-                row.append(item.get(f"T{idx}_触线", '-'))
-                row.append(item.get(f"T{idx}_空间", '-'))
-                if show_boards:
-                    row.append(item.get(f"T{idx}_板", '-'))
+            row = [item.name, f"{item.price:.2f}"]
+            for i, _ in columns:
+                trigger, space, boards = item.cells(i)
+                row += [trigger, space, boards] if show_boards else [trigger, space]
             rows.append(row)
             
         df = pd.DataFrame(rows, columns=headers)
@@ -741,67 +634,21 @@ class AnalysisApp:
                  self.log(f"绘图失败: {e}")
                  traceback.print_exc()
 
-    def process_one_stock(self, stock_code, name, target_date_str, days_count=3):
+    def build_panel(self, stock_list, target_date_str):
+        """
+        拉取全部股票与所需基准指数，组装 MarketPanel (calASM_panel.load_panel)；指数与交易日历每次运行只拉一次
+        本地分析服务在线时作为瘦客户端从服务取数，不再自己下载
+        """
+        clear_memo()
+        service = connect_service()
+        if service:
+            self.log(f"使用本地分析服务: {service.base}")
+        # 经共享数据仓库: 其他进程/上次运行已下载的直接读取；指数盘中用实时点位补全当日
+        return load_panel(stock_list, target_date_str, service or LocalSource(log=self.log), log=self.log,
+                          stop=lambda: self.stop_requested)
+
+    def process_one_stock(self, stock_code, name, merged, days_count=3):
         index_code, index_name, limit_ratio = get_market_rules(stock_code)
-        start_date = (pd.to_datetime(target_date_str) - timedelta(days=120)).strftime("%Y%m%d")
-        
-        # 1. 获取个股
-        stock_df = ak.stock_zh_a_hist(symbol=stock_code, start_date=start_date, end_date=target_date_str, adjust="")
-        
-        # 补全实时数据
-        need_realtime = False
-        if stock_df is None or stock_df.empty:
-             stock_df = pd.DataFrame(columns=['日期', '收盘', '涨跌幅'])
-             need_realtime = True
-        else:
-             last_date = stock_df.iloc[-1]['日期']
-             if isinstance(last_date, str):
-                 last_d_str = last_date.replace('-', '')
-             else:
-                 last_d_str = last_date.strftime("%Y%m%d")
-             if last_d_str < target_date_str:
-                 need_realtime = True
-
-        if need_realtime:
-            real_data = get_realtime_quote_single(stock_code)
-            if real_data:
-                rt_time = real_data['time']
-                rt_date_str = rt_time.split(' ')[0].replace('-', '')
-                if rt_date_str > str(stock_df.iloc[-1]['日期'] if not stock_df.empty else '19900101').replace('-', ''):
-                    price = real_data['price']
-                    pct_chg = 0.0
-                    if not stock_df.empty:
-                         last_close = float(stock_df.iloc[-1]['收盘'])
-                         if last_close > 0:
-                            pct_chg = (price - last_close) / last_close * 100
-                    
-                    new_row = pd.DataFrame({'日期': [rt_date_str], '收盘': [float(price)], '涨跌幅': [float(pct_chg)]})
-                    stock_df = pd.concat([stock_df, new_row], ignore_index=True)
-                    self.log(f"   [实时补充] 现价:{price}")
-
-        if stock_df is None or stock_df.empty:
-            return None, None
-
-        stock_df = stock_df.rename(columns={'日期': 'date', '收盘': 'close', '涨跌幅': 'pct_chg'})
-        stock_df['date'] = pd.to_datetime(stock_df['date']).dt.strftime('%Y%m%d')
-
-        # 2. 获取指数
-        index_df = ak.stock_zh_index_daily(symbol=index_code)
-        if index_df is None or index_df.empty:
-            return None, None
-            
-        index_df['date'] = pd.to_datetime(index_df['date']).dt.strftime('%Y%m%d')
-        index_df = index_df.sort_values('date')
-        index_df['index_pct_chg'] = index_df['close'].pct_change() * 100 
-        index_df = index_df.rename(columns={'close': 'index_close'})[['date', 'index_close', 'index_pct_chg']]
-        
-        merged = pd.merge(stock_df, index_df, on='date', how='left')
-        if merged['index_close'].isnull().any():
-            merged['index_close'] = merged['index_close'].ffill()
-            merged['index_pct_chg'] = merged['index_pct_chg'].fillna(0.0)
-
-        merged = merged.sort_values('date')
-        merged = merged[merged['date'] <= target_date_str]
         
         if len(merged) < 30:
             self.log("   [警告] 数据不足30天")
@@ -809,74 +656,442 @@ class AnalysisApp:
 
         last_date_str = merged.iloc[-1]['date']
         current_price = merged.iloc[-1]['close']
+        self.frames[stock_code] = (name, merged, limit_ratio)
+
+        rules = get_rules(get_board(stock_code))
+        result_key = analysis_key(stock_code, last_date_str, current_price, merged.iloc[-1]['index_close'],
+                                  days_count, [(10, 100.0, limit_ratio), (30, 200.0, limit_ratio)] + rules
+                                  + [("limit_path", max(days_count, DEFAULT_PATH_DAYS)), ("result", "typed")])
+        cached = self.result_cache.get(result_key)
+        if cached is not None:
+            self.log("   [缓存命中] 输入未变化，跳过计算")
+            res_10, res_30, rule_lines, s10, s30 = cached
+            for line in rule_lines:
+                self.log(line)
+            s10, s30 = s10.renamed(name), s30.renamed(name)
+            self.export_results(stock_code, name, last_date_str, res_10, res_30, s10, s30)
+            self.details.append((name, stock_code, last_date_str, res_10, res_30))
+            self.save_stock_images(res_10, res_30, name, stock_code, last_date_str)
+            return s10, s30
+
         future_dates = get_future_trading_dates(last_date_str, days_count)
 
-        df_10 = analyze_period_combined(merged, future_dates, 10, 100.0, limit_ratio)
-        df_30 = analyze_period_combined(merged, future_dates, 30, 200.0, limit_ratio)
+        # 计算走无副作用的库接口 (calASM_api)，这里只负责日志、出图与缓存
+        # T-2..T+N 全部偏移一次数组运算，结果保持为数值记录；其余已注册规则 (3日、下跌等) 仅输出 T 日状态
+        analysis = analyze_frame(stock_code, merged, future_dates, limit_ratio, name, status_rules=rules,
+                                 no_limit=self.panel.no_limit[self.panel.row[stock_code]])
+        res_10, res_30 = analysis.result(10), analysis.result(30)
+        s10, s30 = analysis.summary(10), analysis.summary(30)
+        rule_lines = format_rule_status(analysis.status)
+        # 连续一字涨停路径 (基准日随之后移) 首次触线的是第几个涨停
+        rule_lines += limit_path_lines(merged, limit_ratio, max(days_count, DEFAULT_PATH_DAYS))
+        for line in rule_lines:
+            self.log(line)
+
+        self.result_cache.put(result_key, (res_10, res_30, rule_lines, s10, s30))
+        self.export_results(stock_code, name, last_date_str, res_10, res_30, s10, s30)
+        self.details.append((name, stock_code, last_date_str, res_10, res_30))
+        self.save_stock_images(res_10, res_30, name, stock_code, last_date_str)
+        return s10, s30
+
+    def export_results(self, stock_code, name, last_date_str, res_10, res_30, s10, s30):
+        if self.exporter is not None:
+            self.exporter.write(stock_code, name, last_date_str, [(res_10, s10), (res_30, s30)])
+
+    def save_stock_images(self, res_10, res_30, name, stock_code, last_date_str):
+        if self.save_img_var.get():
+             safe_name = name.replace('*', '').replace(':', '')
+             title_base = f"{safe_name}({stock_code})异动分析({last_date_str})"
+             # 预测天数较多时图片只画代表性的日子，逐日明细见 HTML 报告
+             plot_result_table(res_10.condensed(), f"{title_base}-10日(100%)")
+             plot_result_table(res_30.condensed(), f"{title_base}-30日(200%)")
 
-        def extract_summary(res_df, type_name):
-            # 将所有预测行整理到字典 map
-            row_map = {}
-            for idx, row in res_df.iterrows():
-                # T日（今天）
-                if row['类型'] == '今日' or row['日期'] == last_date_str:
-                    row_map['T'] = row
-                else:
-                    # 预测日 T+x
-                    d_val = row['日期']
-                    if "(T+" in d_val:
-                        # 提取 T+x 部分
-                        key = d_val.split("(")[1].replace(")", "") # T+1
-                        row_map[key] = row
-            
-            t_row = row_map.get('T', {})
-            
-            # 动态生成结果
-            summary_dict = {
-                "名称": name,
-                "异动类型": type_name,
-                "现价": f"{current_price:.2f}",
-                # "T_偏离": t_row.get("区间偏离", "-") # 已从总览移除
-            }
-            
-            meta_dates_list = []
-            
-            # 根据 days_count 循环提取
-            for i in range(1, days_count + 1):
-                key = f"T+{i}"
-                sub_row = row_map.get(key, {})
-                
-                # 获取日期显示字符串
-                raw_d = sub_row.get("日期", "")
-                if not raw_d: 
-                     d_show_str = key
+    def save_html_report(self, target_date_str, overviews):
+        try:
+            path = write_report(f"异动分析报告 ({target_date_str})", overviews, self.details)
+            self.log(f"\nHTML 报告已生成: {os.path.abspath(path)}")
+        except Exception as e:
+            self.log(f"生成 HTML 报告失败: {e}")
+
+    def build_trigger_table(self, days_count, target_date_str):
+        try:
+            # 盘中最后一列是实时价，用昨收建表，T+1 即今日，供盯盘使用
+            intraday = self.panel.dates[-1] == target_date_str and not session_closed(target_date_str)
+            table = build_table(self.panel, horizon=days_count, at=-2 if intraday and self.panel.shape[1] > 1 else None)
+            # 只含本次分析的几只股票，仅留在内存里；不写 cache/premarket，以免覆盖 build 生成的全市场表
+            self.trigger_table = TriggerTable(table)
+        except Exception as e:
+            self.log(f"生成触线价格表失败: {e}")
+
+    def query_trigger(self):
+        """按触线价格表查询: 输入 '代码 价格 [T+k]'，不联网"""
+        parts = self.query_entry.get().replace(',', ' ').split()
+        if len(parts) < 2:
+            messagebox.showwarning("提示", "请输入: 代码 价格")
+            return
+        if self.trigger_table is None:
+            self.log("尚无触线价格表，请先完成一次分析或运行 calASM_premarket.py build")
+            return
+        code = parts[0]
+        try:
+            price = float(parts[1])
+            k = int(parts[2].upper().replace("T+", "")) if len(parts) > 2 else 1
+        except ValueError:
+            messagebox.showwarning("提示", "价格格式错误")
+            return
+        if code not in self.trigger_table:
+            self.log(f"{code} 不在 {self.trigger_table.date} 的触线价格表中")
+            return
+        k = min(max(k, 1), self.trigger_table.horizon)
+        for line in self.trigger_table.describe(code, price, k=k):
+            self.log(line)
+
+    def toggle_watch(self):
+        """开始/停止盯盘: 按触线价格表轮询全市场快照，临近或越过触线时预警"""
+        if self.watcher is not None:
+            self.watcher.stop()
+            self.watcher = None
+            self.watch_btn.config(text="盯盘预警", bg=self.watch_btn_bg)
+            self.log(">>> 已停止盯盘")
+            return
+        if self.trigger_table is None:
+            messagebox.showwarning("提示", "尚无触线价格表，请先完成一次分析")
+            return
+        engine = AlertEngine(self.trigger_table, k=current_k(self.trigger_table))
+        self.log(f"\n>>> 开始盯盘: {len(engine.codes)} 支股票，触线表 {self.trigger_table.date} (T+{engine.k})，"
+                 f"允许涨幅 <= {engine.near_pct:.0f}% 预警，日志 {engine.log_path}")
+        self.watcher = AlertWatcher(engine, on_alert=lambda alerts: self.root.after(0, self.show_alerts, alerts),
+                                    on_error=lambda e: self.root.after(0, self.log, f"盯盘轮询出错: {e}"))
+        self.watcher.start()
+        self.watch_btn.config(text="停止盯盘", bg="#f39c12")
+
+    def show_alerts(self, alerts):
+        for a in alerts:
+            self.log("⚠ " + format_alert(a))
+        self.root.bell()
+
+    def open_scenario_window(self):
+        if not self.frames:
+            messagebox.showwarning("提示", "请先完成一次分析")
+            return
+        ScenarioWindow(self.root, dict(self.frames))
+
+    def open_timeline_window(self):
+        if not self.frames:
+            messagebox.showwarning("提示", "请先完成一次分析")
+            return
+        TimelineWindow(self.root, dict(self.frames))
+
+    def start_montecarlo(self):
+        if not self.frames:
+            messagebox.showwarning("提示", "请先完成一次分析")
+            return
+        if self.is_running:
+            return
+        try:
+            days_count = min(max(1, int(self.days_entry.get().strip())), MAX_HORIZON)
+        except:
+            days_count = 3
+        self.mc_btn.config(state='disabled')
+        self.prefetcher.pause()
+        threading.Thread(target=self.run_montecarlo, args=(dict(self.frames), days_count), daemon=True).start()
+
+    def run_montecarlo(self, frames, days_count):
+        try:
+            self.log("\n" + "=" * 40)
+            self.log(f"蒙特卡洛模拟: {len(frames)} 支股票 × {DEFAULT_PATHS} 条路径 × {days_count} 天 ...")
+            t0 = time.time()
+            probs = estimate_many({c: (df, lr) for c, (_, df, lr) in frames.items()}, days_count)
+            self.log(f"模拟完成，耗时 {time.time() - t0:.2f}s (累计触线概率，取10日/30日较大者)")
+
+            headers = ["名称"] + [f"T+{i}" for i in range(1, days_count + 1)]
+            rows = []
+            for code, (name, _, _) in frames.items():
+                res = probs.get(code)
+                if not res: continue
+                cum = np.max([r["cumulative"] for r in res.values()], axis=0)
+                rows.append([name] + [f"{round_half_up(p * 100, 1):.1f}%" for p in cum])
+            self.log(pd.DataFrame(rows, columns=headers).to_string(index=False))
+        except Exception as e:
+            self.log(f"❌ 模拟出错: {e}")
+        finally:
+            self.prefetcher.resume()
+            self.root.after(0, lambda: self.mc_btn.config(state='normal'))
+
+
+class ScenarioWindow:
+    """情景网格窗口: 行为指数每日涨跌，列为个股每日涨跌，单元格为 T+k 允许涨幅"""
+    RULES = {"10日(100%)": (10, 100.0), "30日(200%)": (30, 200.0)}
+
+    def __init__(self, master, frames):
+        self.frames = frames
+        self.codes = list(frames.keys())
+        self.grid = None
+
+        self.win = tk.Toplevel(master)
+        self.win.title("情景网格")
+        self.win.geometry("1100x600")
+
+        opt = tk.Frame(self.win, pady=5)
+        opt.pack(fill=tk.X, padx=10)
+
+        tk.Label(opt, text="股票:").pack(side=tk.LEFT)
+        self.stock_var = tk.StringVar(value=self._stock_label(self.codes[0]))
+        stock_box = ttk.Combobox(opt, textvariable=self.stock_var, state='readonly', width=16,
+                                 values=[self._stock_label(c) for c in self.codes])
+        stock_box.pack(side=tk.LEFT, padx=5)
+        stock_box.bind('<<ComboboxSelected>>', lambda e: self.render())
+
+        tk.Label(opt, text="规则:").pack(side=tk.LEFT)
+        self.rule_var = tk.StringVar(value="10日(100%)")
+        rule_box = ttk.Combobox(opt, textvariable=self.rule_var, state='readonly', width=10,
+                                values=list(self.RULES.keys()))
+        rule_box.pack(side=tk.LEFT, padx=5)
+        rule_box.bind('<<ComboboxSelected>>', lambda e: self.compute())
+
+        tk.Label(opt, text="指数日涨跌%:").pack(side=tk.LEFT)
+        self.index_entry = tk.Entry(opt, width=12)
+        self.index_entry.insert(0, DEFAULT_MOVES)
+        self.index_entry.pack(side=tk.LEFT, padx=5)
+
+        tk.Label(opt, text="个股日涨跌%:").pack(side=tk.LEFT)
+        self.stock_entry = tk.Entry(opt, width=12)
+        self.stock_entry.insert(0, DEFAULT_MOVES)
+        self.stock_entry.pack(side=tk.LEFT, padx=5)
+
+        tk.Label(opt, text="天数:").pack(side=tk.LEFT)
+        self.days_entry = tk.Entry(opt, width=4)
+        self.days_entry.insert(0, "10")
+        self.days_entry.pack(side=tk.LEFT, padx=5)
+
+        tk.Label(opt, text="查看 T+").pack(side=tk.LEFT)
+        self.k_var = tk.IntVar(value=1)
+        self.k_spin = tk.Spinbox(opt, from_=1, to=10, width=4, textvariable=self.k_var, command=self.render)
+        self.k_spin.pack(side=tk.LEFT)
+
+        tk.Button(opt, text="计算", command=self.compute, bg="#007acc", fg="white").pack(side=tk.LEFT, padx=10)
+
+        self.status_var = tk.StringVar()
+        tk.Label(self.win, textvariable=self.status_var, anchor='w', fg="gray").pack(fill=tk.X, padx=10)
+
+        self.table_frame = tk.Frame(self.win)
+        self.table_frame.pack(fill=tk.BOTH, expand=True, padx=10, pady=5)
+
+        self.compute()
+
+    def _stock_label(self, code):
+        return f"{code} {self.frames[code][0]}"
+
+    def compute(self):
+        try:
+            index_moves = parse_moves(self.index_entry.get())
+            stock_moves = parse_moves(self.stock_entry.get())
+            horizon = max(1, int(self.days_entry.get().strip()))
+        except ValueError as e:
+            messagebox.showerror("错误", str(e), parent=self.win)
+            return
+        days, threshold = self.RULES[self.rule_var.get()]
+        frames = [(self.frames[c][1], self.frames[c][2]) for c in self.codes]
+        t0 = time.time()
+        self.grid = scenario_grid_from_frames(frames, days, threshold, horizon, index_moves, stock_moves)
+        self.k_spin.config(to=horizon)
+        if self.k_var.get() > horizon: self.k_var.set(horizon)
+        self.status_var.set(f"已计算 {len(frames)} 支股票 × {len(index_moves)} × {len(stock_moves)} × {horizon} 天，耗时 {time.time() - t0:.3f}s")
+        self.render()
+
+    def render(self):
+        if self.grid is None: return
+        for w in self.table_frame.winfo_children():
+            w.destroy()
+
+        code = self.stock_var.get().split()[0]
+        s_idx = self.codes.index(code)
+        try:
+            k = min(max(int(self.k_var.get()), 1), self.grid['room_pct'].shape[-1])
+        except (ValueError, tk.TclError):
+            k = 1
+        room = self.grid['room_pct'][s_idx, :, :, k - 1]
+        price = self.grid['trigger_price'][s_idx, :, :, k - 1]
+        hit = self.grid['triggered'][s_idx, :, :, k - 1]
+
+        tk.Label(self.table_frame, text="指数/个股", bg='#2c3e50', fg='white', relief='ridge',
+                 width=9).grid(row=0, column=0, sticky='nsew')
+        for j, mv in enumerate(self.grid['stock_moves']):
+            tk.Label(self.table_frame, text=f"{mv:+.2f}%", bg='#2c3e50', fg='white', relief='ridge',
+                     width=9).grid(row=0, column=j + 1, sticky='nsew')
+        for i, mv in enumerate(self.grid['index_moves']):
+            tk.Label(self.table_frame, text=f"{mv:+.2f}%", bg='#2c3e50', fg='white', relief='ridge',
+                     width=9).grid(row=i + 1, column=0, sticky='nsew')
+            for j in range(room.shape[1]):
+                if hit[i, j]:
+                    text, bg, fg = "已触发", '#c0392b', 'white'
+                elif not np.isfinite(room[i, j]):
+                    text, bg, fg = "-", '#ffffff', 'black'
                 else:
-                    if "(" in raw_d: 
-                        d_show_str = raw_d.split("(")[0] # 01-12
-                    elif len(raw_d) == 8 and raw_d.isdigit(): 
-                        d_show_str = f"{raw_d[4:6]}-{raw_d[6:8]}"
-                    else:
-                        d_show_str = raw_d
-                
-                meta_dates_list.append(d_show_str)
-                
-                # 设置 T1_xxx 字段
-                summary_dict[f"T{i}_触线"] = sub_row.get("触线价格", "-")
-                summary_dict[f"T{i}_空间"] = sub_row.get("允许涨幅", "-")
-                summary_dict[f"T{i}_板"] = sub_row.get("允许连板", "-")
+                    val = round_half_up(float(room[i, j]), 2)
+                    text = f"{val:.2f}%\n{price[i, j]:.2f}"
+                    if val < 10.0: bg, fg = '#f5b7b1', 'black'
+                    elif val < 20.0: bg, fg = '#fad7a0', 'black'
+                    elif val < 30.0: bg, fg = '#d4e6f1', 'black'
+                    else: bg, fg = '#ffffff', 'black'
+                tk.Label(self.table_frame, text=text, bg=bg, fg=fg, relief='ridge',
+                         width=9).grid(row=i + 1, column=j + 1, sticky='nsew')
+
+
+class TimelineWindow:
+    """盘中偏离走势: 上方为各股票当前状态与首次临近/触线时刻，下方为选中股票的逐分钟偏离折线"""
+    RULES = {"10日(100%)": (10, 100.0), "30日(200%)": (30, 200.0)}
+    COLUMNS = (("code", "代码", 70), ("name", "名称", 80), ("price", "现价", 70), ("dev", "偏离", 80),
+               ("trigger", "触线价", 70), ("room", "允许涨幅", 80), ("peak", "峰值偏离", 110),
+               ("near", "首次临近", 70), ("cross", "首次触线", 70))
+    AUTO_MS = 60000
+
+    def __init__(self, master, frames):
+        self.frames = frames
+        self.data = None
+        self.loading = False
+
+        self.win = tk.Toplevel(master)
+        self.win.title("盘中偏离走势")
+        self.win.geometry("900x650")
+
+        opt = tk.Frame(self.win, pady=5)
+        opt.pack(fill=tk.X, padx=10)
+        tk.Label(opt, text="规则:").pack(side=tk.LEFT)
+        self.rule_var = tk.StringVar(value="10日(100%)")
+        rule_box = ttk.Combobox(opt, textvariable=self.rule_var, state='readonly', width=10,
+                                values=list(self.RULES.keys()))
+        rule_box.pack(side=tk.LEFT, padx=5)
+        rule_box.bind('<<ComboboxSelected>>', lambda e: self.render())
+        self.refresh_btn = tk.Button(opt, text="刷新", command=self.refresh, bg="#007acc", fg="white")
+        self.refresh_btn.pack(side=tk.LEFT, padx=10)
+        self.auto_var = tk.BooleanVar(value=False)
+        tk.Checkbutton(opt, text="每分钟自动刷新", variable=self.auto_var).pack(side=tk.LEFT)
+
+        self.status_var = tk.StringVar()
+        tk.Label(self.win, textvariable=self.status_var, anchor='w', fg="gray").pack(fill=tk.X, padx=10)
+
+        self.tree = ttk.Treeview(self.win, columns=[c for c, _, _ in self.COLUMNS], show='headings', height=10)
+        for col, text, width in self.COLUMNS:
+            self.tree.heading(col, text=text)
+            self.tree.column(col, width=width, anchor='center')
+        self.tree.pack(fill=tk.BOTH, expand=True, padx=10, pady=5)
+        self.tree.bind('<<TreeviewSelect>>', lambda e: self.draw_chart())
+
+        self.canvas = tk.Canvas(self.win, height=240, bg='white')
+        self.canvas.pack(fill=tk.X, padx=10, pady=5)
+        self.canvas.bind('<Configure>', lambda e: self.draw_chart())
+
+        self.refresh()
+        self.win.after(self.AUTO_MS, self.auto_refresh)
+
+    def auto_refresh(self):
+        if not self.win.winfo_exists():
+            return
+        if self.auto_var.get():
+            self.refresh()
+        self.win.after(self.AUTO_MS, self.auto_refresh)
 
-            summary_dict["_meta_dates"] = meta_dates_list
-            return summary_dict
+    def refresh(self):
+        if self.loading:
+            return
+        self.loading = True
+        self.refresh_btn.config(state='disabled')
+        self.status_var.set(f"正在获取 {len(self.frames)} 支股票的分钟线 (只取新增分钟)...")
+        threading.Thread(target=self.load, daemon=True).start()
 
-        if self.save_img_var.get():
-             safe_name = name.replace('*', '').replace(':', '')
-             title_base = f"{safe_name}({stock_code})异动分析({last_date_str})"
-             plot_result_table(df_10, f"{title_base}-10日(100%)")
-             plot_result_table(df_30, f"{title_base}-30日(200%)")
+    def load(self):
+        try:
+            t0 = time.time()
+            data = build_timeline(self.frames)
+            msg = f"{data['date']} 已更新到 {minute_label(data['grid'], data['upto'] - 1)}，耗时 {time.time() - t0:.2f}s"
+            self.win.after(0, self.loaded, data, msg)
+        except Exception as e:
+            self.win.after(0, self.loaded, None, f"获取失败: {e}")
+
+    def loaded(self, data, msg):
+        self.loading = False
+        self.refresh_btn.config(state='normal')
+        self.status_var.set(msg)
+        if data is not None:
+            self.data = data
+            self.render()
+
+    def render(self):
+        if self.data is None: return
+        selected = self.tree.selection()
+        for item in self.tree.get_children():
+            self.tree.delete(item)
+        d = self.data
+        res = d['results'][self.RULES[self.rule_var.get()]]
+        last = d['upto'] - 1
+        grid = d['grid']
+        rows = []
+        for i, code in enumerate(d['codes']):
+            peak = res['peak'][i]
+            if last < 0 or not np.isfinite(res['deviation'][i, last]):
+                rows.append((np.inf, (code, d['names'][i], "-", "-", "-", "-", "-", "-", "-")))
+                continue
+            room = res['room_pct'][i, last]
+            rows.append((room, (
+                code, d['names'][i], f"{d['prices'][i, last]:.2f}", f"{res['deviation'][i, last]:.2f}%",
+                f"{res['trigger_price'][i, last]:.2f}",
+                "已触发" if res['triggered'][i, last] else f"{room:.2f}%",
+                f"{res['deviation'][i, peak]:.2f}% {minute_label(grid, peak)}" if peak >= 0 else "-",
+                minute_label(grid, res['first_near'][i]), minute_label(grid, res['first_cross'][i]),
+            )))
+        # 离触线最近的排在前面
+        for _, values in sorted(rows, key=lambda r: r[0]):
+            self.tree.insert('', 'end', iid=values[0], values=values)
+        keep = [s for s in selected if self.tree.exists(s)]
+        if keep:
+            self.tree.selection_set(keep)
+        elif self.tree.get_children():
+            self.tree.selection_set(self.tree.get_children()[0])
+        self.draw_chart()
+
+    def draw_chart(self):
+        self.canvas.delete('all')
+        if self.data is None or not self.tree.selection(): return
+        d = self.data
+        code = self.tree.selection()[0]
+        i = d['codes'].index(code)
+        days, threshold = self.RULES[self.rule_var.get()]
+        dev = d['results'][(days, threshold)]['deviation'][i]
+        ok = np.isfinite(dev)
+        w, h, pad = max(self.canvas.winfo_width(), 200), max(self.canvas.winfo_height(), 100), 40
+        if not ok.any():
+            self.canvas.create_text(w / 2, h / 2, text="暂无分钟数据", fill='gray')
+            return
+        lo = min(np.nanmin(dev), 0.0, -threshold if np.nanmin(dev) < 0 else 0.0)
+        hi = max(np.nanmax(dev), threshold if np.nanmax(dev) > 0 else 0.0)
+        span = (hi - lo) or 1.0
+        n = len(dev)
+
+        def xy(t, v):
+            return pad + t * (w - 2 * pad) / (n - 1), h - pad / 2 - (v - lo) * (h - pad) / span
+
+        for level, color in ((threshold, '#c0392b'), (-threshold, '#c0392b'), (0.0, '#bbbbbb')):
+            if lo <= level <= hi:
+                y = xy(0, level)[1]
+                self.canvas.create_line(pad, y, w - pad, y, fill=color, dash=(4, 2))
+                self.canvas.create_text(pad - 4, y, text=f"{level:.0f}%", anchor='e', fill=color)
+        points = [c for t in np.flatnonzero(ok) for c in xy(t, dev[t])]
+        if len(points) >= 4:
+            self.canvas.create_line(*points, fill='#2c3e50', width=2)
+        cross = d['results'][(days, threshold)]['first_cross'][i]
+        if cross >= 0:
+            x, y = xy(cross, dev[cross])
+            self.canvas.create_oval(x - 4, y - 4, x + 4, y + 4, fill='#c0392b', outline='')
+        for t, label in ((0, "09:31"), (119, "11:30"), (n - 1, "15:00")):
+            self.canvas.create_text(xy(t, lo)[0], h - pad / 4, text=label, fill='gray')
+        self.canvas.create_text(w / 2, 10, text=f"{d['names'][i]}({code}) {days}日偏离走势", fill='#2c3e50')
 
-        return extract_summary(df_10, "10日"), extract_summary(df_30, "30日")
 
 if __name__ == "__main__":
+    # 打包为 exe 后进程池需要
+    multiprocessing.freeze_support()
+
     if hasattr(sys, '_MEIPASS'):
         # 修正 pyinstaller 打包后的资源路径问题 (如果以后有静态文件)
         os.chdir(sys._MEIPASS)
@@ -0,0 +1,131 @@
+"""
+逐价位连板路径模拟
+
+原先的允许连板数按 floor(log(触线价/前收) / log(涨停倍数)) 估算，忽略了两点:
+    - 每天的涨停价是按前收四舍五入到分的 (连板越多，累积的取整误差越大)
+    - 连板期间基准日也在后移: T+k 的基准日落在 T 之后时，基准价本身就是路径上的涨停价
+这里用整数分逐日推进一字涨停路径，在每个板块的涨跌停比例 (含 ST 5%) 下:
+    - allowed_boards : 从前收起连续涨停、偏离仍低于阈值的最多板数 (逐价位判断)
+    - simulate_limit_paths : T+1..T+N 天天涨停时每天的偏离，及路径首次触线的是 T+几
+
+全部按股票 × 预测日 (× 板数) 广播一次算完，长预测周期也只是数组多几列。
+"""
+import numpy as np
+
+from calASM_numeric import limit_up_cents, to_cents_array
+
+MAX_BOARDS = 60
+DEFAULT_PATH_DAYS = 10
+
+
+def limit_up_ladder(start_cents, limit_ratio, steps):
+    """起始价 (分，任意形状) 连续 steps 个涨停: 形状 start.shape + (steps,) 的 int64 价格 (分)"""
+    cur = np.asarray(start_cents, dtype=np.int64)
+    ratio = np.broadcast_to(np.asarray(limit_ratio, dtype=np.float64), cur.shape)
+    out = np.empty(cur.shape + (steps,), dtype=np.int64)
+    for j in range(steps):
+        cur = limit_up_cents(cur, ratio)
+        out[..., j] = cur
+    return out
+
+
+def _cents(prices):
+    prices = np.asarray(prices, dtype=np.float64)
+    ok = np.isfinite(prices) & (prices > 0)
+    return np.where(ok, to_cents_array(np.where(ok, prices, 0.0)), 0), ok
+
+
+def allowed_boards(p_prev, p_base, index_cum, threshold, limit_ratio, max_boards=MAX_BOARDS):
+    """
+    从前收 p_prev 起连续一字涨停，偏离 (相对基准价 p_base、指数累计涨幅 index_cum%) 仍低于 threshold 的最多板数
+    各参数可广播 (如 (N, 1) 与 (N, K))；输入缺失时为 0
+    """
+    p_prev, p_base, index_cum, limit = np.broadcast_arrays(
+        np.asarray(p_prev, dtype=np.float64), np.asarray(p_base, dtype=np.float64),
+        np.asarray(index_cum, dtype=np.float64), np.asarray(limit_ratio, dtype=np.float64))
+    if p_prev.size == 0:
+        return np.zeros(p_prev.shape, dtype=np.int64)
+    start, ok = _cents(p_prev)
+    ok &= np.isfinite(p_base) & (p_base > 0) & np.isfinite(index_cum) & (limit > 1)
+
+    # 板数上界: 对数估算 + 2 (取整误差只会差一两板)，避免对所有股票都推进 MAX_BOARDS 步
+    with np.errstate(invalid='ignore', divide='ignore'):
+        est = (np.log1p((threshold + index_cum) / 100) + np.log(p_base / p_prev)) / np.log(limit)
+    est = est[ok & np.isfinite(est)]
+    steps = int(np.clip(np.max(est, initial=0) + 2, 1, max_boards))
+
+    ladder = limit_up_ladder(start, np.where(ok, limit, 1.0), steps) / 100
+    with np.errstate(invalid='ignore', divide='ignore'):
+        deviation = (ladder / p_base[..., None] - 1) * 100 - index_cum[..., None]
+    # 涨停路径单调不降，低于阈值的板数即连续可涨停的板数
+    boards = (deviation < threshold).sum(axis=-1)
+    return np.where(ok, boards, 0).astype(np.int64)
+
+
+def simulate_limit_paths(closes, index_closes, days, threshold, limit_ratio, horizon):
+    """
+    closes / index_closes: (N, L) 个股与基准指数收盘 (停牌已前向填充)，最后一列为 T 日
+    假设 T+1..T+horizon 每天一字涨停、指数不变，返回 dict:
+        path            (N, K) 路径收盘价
+        base_price      (N, K) 各日基准价 (基准日落在 T 之后时取路径上的涨停价)
+        deviation       (N, K) 路径上的区间偏离
+        triggered       (N, K)
+        first_trigger   (N,)   首次触线为 T+几 (horizon 内不触线为 0)
+        boards          (N, K) 股价不变假设下 T+k 的允许连板数 (逐价位，替代对数估算)
+    """
+    closes = np.atleast_2d(np.asarray(closes, dtype=np.float64))
+    index_closes = np.atleast_2d(np.asarray(index_closes, dtype=np.float64))
+    n, length = closes.shape
+    cur = length - 1
+    limit = np.broadcast_to(np.asarray(limit_ratio, dtype=np.float64), (n,))
+    k = np.arange(1, horizon + 1)
+
+    start, ok = _cents(closes[:, cur])
+    path = limit_up_ladder(start, np.where(ok, limit, 1.0), horizon) / 100      # (N, K)
+
+    # 基准日相对 T 的偏移 j = k - days；j <= 0 取历史收盘，j > 0 取路径上第 j 天的涨停价
+    j = k - days
+    valid = (cur + j) >= 0
+    hist_pos = np.clip(cur + j, 0, cur)
+    fut_pos = np.clip(j - 1, 0, max(horizon - 1, 0))
+    p_base = np.where(j > 0, path[:, fut_pos], closes[:, hist_pos])
+    i_t = index_closes[:, cur:cur + 1]
+    i_base = np.where(j > 0, i_t, index_closes[:, hist_pos])
+    p_base = np.where(valid & ok[:, None], p_base, np.nan)
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        index_cum = (i_t / i_base - 1) * 100
+        deviation = (path / p_base - 1) * 100 - index_cum
+    triggered = np.isfinite(deviation) & (np.abs(deviation) >= threshold)
+    first_trigger = np.where(triggered.any(axis=1), triggered.argmax(axis=1) + 1, 0)
+
+    # 股价不变假设下 (与预测表一致): 前收为 T 收盘，基准为 T+k-days 日收盘 (超出 T 时为 T 收盘)
+    flat_base = np.where(j > 0, closes[:, cur:cur + 1], closes[:, hist_pos])
+    flat_base = np.where(valid, flat_base, np.nan)
+    boards = allowed_boards(closes[:, cur:cur + 1], flat_base, index_cum, threshold, limit[:, None])
+
+    return {
+        "path": np.where(ok[:, None], path, np.nan),
+        "base_price": p_base,
+        "deviation": deviation,
+        "triggered": triggered,
+        "first_trigger": first_trigger,
+        "boards": boards,
+    }
+
+
+def limit_path_lines(merged, limit_ratio, horizon=DEFAULT_PATH_DAYS, rules=((10, 100.0), (30, 200.0))):
+    """单只股票: 各规则下连续一字涨停首次触线的日志行 (连板超过 MAX_BOARDS 已无意义，路径最长模拟这么多天)"""
+    horizon = min(horizon, MAX_BOARDS)
+    closes = merged['close'].to_numpy(dtype=np.float64)[None, :]
+    index_closes = merged['index_close'].to_numpy(dtype=np.float64)[None, :]
+    lines = []
+    for days, threshold in rules:
+        res = simulate_limit_paths(closes, index_closes, days, threshold, limit_ratio, horizon)
+        first = int(res["first_trigger"][0])
+        if first:
+            lines.append(f"   连续涨停路径 {days}日({threshold:.0f}%): 第 {first} 个涨停 (T+{first}) 触线，"
+                         f"收盘 {res['path'][0, first - 1]:.2f}，偏离 {res['deviation'][0, first - 1]:.2f}%")
+        else:
+            lines.append(f"   连续涨停路径 {days}日({threshold:.0f}%): T+1..T+{horizon} 连续涨停也不触线")
+    return lines
@@ -0,0 +1,172 @@
+"""
+分钟线增量缓存
+
+原先每次盘中补全现价都重新下载整天的 1 分钟线。这里按 (日期, 代码) 把当天的分钟线存成紧凑的结构化数组
+(cache/data/minute/日期/stock_代码.npy: 时间 + 开高低收(整数分) + 成交量)，
+刷新时只请求最后一根已缓存分钟 (含，最后一根可能尚未走完) 之后的数据，拼接到已有数组后面。
+
+    - latest(code)          最新价 (替代 get_realtime_quote_single 的整天下载)
+    - bars(code, since)     某时刻之后的分钟线
+    - 指数分钟线同样支持 (kind="index")，供盘中偏离走势计算
+
+同一进程内 MINUTE_TTL 秒内的重复刷新直接用内存结果；多个进程经共享数据仓库加锁增量更新。
+"""
+import threading
+import time
+from datetime import datetime
+
+import akshare as ak
+import numpy as np
+import pandas as pd
+
+from calASM_cache import data_store, settled_max_age
+from calASM_data import SingleFlight
+from calASM_numeric import to_cents_array
+
+MINUTE_TTL = 20
+
+BAR_DTYPE = np.dtype([
+    ("time", "datetime64[m]"),
+    ("open", np.int32),
+    ("high", np.int32),
+    ("low", np.int32),
+    ("close", np.int32),
+    ("volume", np.int64),
+])
+
+_END = "2222-01-01 09:32:00"
+
+
+def empty_bars():
+    return np.zeros(0, dtype=BAR_DTYPE)
+
+
+def to_bars(df):
+    """akshare 分钟线 DataFrame[时间, 开盘, 收盘, 最高, 最低, 成交量, ...] -> 结构化数组 (价格为整数分)"""
+    if df is None or df.empty:
+        return empty_bars()
+    close = pd.to_numeric(df['收盘'], errors='coerce').to_numpy(dtype=np.float64)
+    keep = ~np.isnan(close) & (close > 0)
+    bars = np.zeros(int(keep.sum()), dtype=BAR_DTYPE)
+    bars["time"] = pd.to_datetime(df['时间']).to_numpy()[keep].astype("datetime64[m]")
+    bars["close"] = to_cents_array(close[keep])
+    for field, col in (("open", '开盘'), ("high", '最高'), ("low", '最低')):
+        values = pd.to_numeric(df[col], errors='coerce').to_numpy(dtype=np.float64)[keep] if col in df else close[keep]
+        bars[field] = to_cents_array(np.where(np.isnan(values), close[keep], values))
+    if '成交量' in df:
+        bars["volume"] = np.nan_to_num(pd.to_numeric(df['成交量'], errors='coerce').to_numpy(dtype=np.float64)[keep])
+    return np.sort(bars, order="time")
+
+
+def download_bars(code, start, kind="stock"):
+    """start (含) 之后的 1 分钟线，失败返回 None"""
+    start_str = pd.Timestamp(start).strftime("%Y-%m-%d %H:%M:%S")
+    try:
+        if kind == "index":
+            df = ak.index_zh_a_hist_min_em(symbol=code[-6:], period='1', start_date=start_str, end_date=_END)
+        else:
+            df = ak.stock_zh_a_hist_min_em(symbol=code, period='1', adjust='', start_date=start_str, end_date=_END)
+    except Exception:
+        return None
+    return to_bars(df)
+
+
+def parse_since(since, date):
+    """'10:30' / datetime / datetime64 -> datetime64[m]"""
+    if since is None:
+        return None
+    if isinstance(since, str) and ":" in since and len(since) <= 8:
+        since = f"{date[:4]}-{date[4:6]}-{date[6:]} {since}"
+    return np.datetime64(pd.Timestamp(since).to_datetime64(), "m")
+
+
+class MinuteBarCache:
+    """按 (日期, 代码) 增量维护当天分钟线"""
+
+    def __init__(self, store=None, ttl=MINUTE_TTL):
+        self._store = store
+        self.ttl = ttl
+        self._mem = {}      # (kind, code, date) -> (检查时间, bars)
+        self._lock = threading.Lock()
+        self._flight = SingleFlight()
+        self.transferred = 0    # 累计新增 (解析) 的分钟数
+
+    @property
+    def store(self):
+        return self._store or data_store()
+
+    def _fresh(self, stamp, date):
+        """盘中 ttl 秒内有效；收盘后写入的永久有效"""
+        max_age = settled_max_age(date, self.ttl)
+        return max_age is None or time.time() - stamp <= max_age
+
+    def _extend(self, current, code, date, kind):
+        """在已缓存的分钟线后面接上新数据；没有新数据返回 None (不写盘)"""
+        current = empty_bars() if current is None else current
+        day = np.datetime64(f"{date[:4]}-{date[4:6]}-{date[6:]}", "m")
+        start = current["time"][-1] if len(current) else day + np.timedelta64(9 * 60 + 15, "m")
+        new = download_bars(code, start, kind)
+        if new is None:
+            return None
+        new = new[(new["time"] >= start) & (new["time"] < day + np.timedelta64(1, "D"))]
+        if not len(new):
+            return None
+        with self._lock:
+            self.transferred += len(new)
+        # 最后一根缓存分钟可能尚未走完，用新数据覆盖
+        return np.concatenate([current[current["time"] < new["time"][0]], new])
+
+    def refresh(self, code, kind="stock", date=None, force=False):
+        """取当天 (或 date 当天) 的全部分钟线，必要时增量下载"""
+        date = date or datetime.now().strftime("%Y%m%d")
+        key = (kind, code, date)
+        with self._lock:
+            hit = self._mem.get(key)
+        if hit is not None and not force and self._fresh(hit[0], date):
+            return hit[1]
+
+        def load():
+            store = self.store
+            store_key = f"{date}/{kind}_{code}"
+            mtime = store.mtime("minute", store_key)
+            bars = None
+            # 其他进程刚刷新过，或收盘后已完整下载: 直接读取
+            if not force and mtime and self._fresh(mtime, date):
+                bars = store.get("minute", store_key)
+            if bars is None:
+                bars = store.update("minute", store_key, lambda current: self._extend(current, code, date, kind))
+            bars = empty_bars() if bars is None else np.array(bars)
+            with self._lock:
+                self._mem[key] = (time.time(), bars)
+            return bars
+        return self._flight.do(key, load)
+
+    def bars(self, code, since=None, kind="stock", date=None):
+        """since 之后 (不含) 的分钟线；since 可为 '10:30' 或时间戳"""
+        date = date or datetime.now().strftime("%Y%m%d")
+        bars = self.refresh(code, kind, date)
+        since = parse_since(since, date)
+        return bars if since is None else bars[bars["time"] > since]
+
+    def latest(self, code, kind="stock"):
+        """最新一分钟的价格 {'time': 'YYYY-MM-DD HH:MM:00', 'price': float}，当天没有数据返回 None"""
+        bars = self.refresh(code, kind)
+        if not len(bars):
+            return None
+        last = bars[-1]
+        return {'time': pd.Timestamp(last["time"]).strftime("%Y-%m-%d %H:%M:00"), 'price': int(last["close"]) / 100}
+
+    def clear(self):
+        with self._lock:
+            self._mem.clear()
+
+
+_cache = None
+
+
+def minute_bars():
+    """进程内共享的 MinuteBarCache"""
+    global _cache
+    if _cache is None:
+        _cache = MinuteBarCache()
+    return _cache
@@ -0,0 +1,122 @@
+"""
+蒙特卡洛触线概率估计
+
+用个股与其基准指数最近 lookback 个交易日的 (个股日收益, 指数日收益) 成对做自助抽样(bootstrap)，
+保留两者的相关性，模拟未来 horizon 天的价格路径:
+    - 个股每日价格按涨跌停价(前收 × limit_ratio，四舍五入到分)截断，再四舍五入到分
+    - 对每条规则 (days, threshold) 计算 T+1..T+N 的区间偏离，统计触线概率
+
+单只股票内部全部是 NumPy 向量化运算 (路径数 × 天数)，多只股票可分发到进程池。
+"""
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from calASM_numeric import to_cents, limit_up_cents, limit_down_cents
+
+DEFAULT_RULES = ((10, 100.0), (30, 200.0))
+DEFAULT_PATHS = 10000
+DEFAULT_LOOKBACK = 60
+
+
+def simulate_paths(closes, index_closes, limit_ratio, horizon, n_paths=DEFAULT_PATHS,
+                   lookback=DEFAULT_LOOKBACK, seed=None):
+    """
+    返回 (个股路径, 指数路径)，形状均为 (n_paths, horizon)，第 k 列为 T+k+1 日收盘
+    个股路径单位为元 (由整数分换算)
+    """
+    closes = np.asarray(closes, dtype=np.float64)
+    index_closes = np.asarray(index_closes, dtype=np.float64)
+    rng = np.random.default_rng(seed)
+
+    tail = slice(-(lookback + 1), None)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        s_ret = np.diff(closes[tail]) / closes[tail][:-1]
+        i_ret = np.diff(index_closes[tail]) / index_closes[tail][:-1]
+    ok = np.isfinite(s_ret) & np.isfinite(i_ret)
+    s_ret, i_ret = s_ret[ok], i_ret[ok]
+    if len(s_ret) == 0:
+        s_ret = i_ret = np.zeros(1)
+
+    draw = rng.integers(0, len(s_ret), size=(n_paths, horizon))
+    s_draw = s_ret[draw]
+    i_draw = i_ret[draw]
+
+    # 价格路径用整数分推进，涨跌停价按交易所规则整数四舍五入
+    paths = np.empty((n_paths, horizon), dtype=np.int64)
+    prev = np.full(n_paths, to_cents(float(closes[-1])), dtype=np.int64)
+    for k in range(horizon):
+        hi = limit_up_cents(prev, limit_ratio)
+        lo = limit_down_cents(prev, limit_ratio)
+        nxt = np.floor(prev * (1 + s_draw[:, k]) + 0.5).astype(np.int64)
+        prev = np.clip(nxt, lo, hi)
+        paths[:, k] = prev
+    i_paths = index_closes[-1] * np.cumprod(1 + i_draw, axis=1)
+    return paths / 100, i_paths
+
+
+def trigger_probability(closes, index_closes, limit_ratio, horizon, rules=DEFAULT_RULES,
+                        n_paths=DEFAULT_PATHS, lookback=DEFAULT_LOOKBACK, seed=None):
+    """
+    对单只股票估计触线概率
+    返回 {(days, threshold): {"daily": (horizon,), "cumulative": (horizon,)}}
+        daily[k]      : T+k+1 当日偏离 >= 阈值 的概率
+        cumulative[k] : T+1..T+k+1 期间至少触线一次的概率
+    """
+    closes = np.asarray(closes, dtype=np.float64)
+    index_closes = np.asarray(index_closes, dtype=np.float64)
+    paths, i_paths = simulate_paths(closes, index_closes, limit_ratio, horizon,
+                                    n_paths, lookback, seed)
+    # 基准日在 T 日及之前取历史收盘，在 T 日之后取模拟路径
+    cur = len(closes) - 1
+    end = cur + np.arange(1, horizon + 1)
+
+    result = {}
+    for days, threshold in rules:
+        base = end - days
+        valid = base >= 0
+        hist = base <= cur
+        h_pos = np.clip(base, 0, cur)
+        f_pos = np.clip(base - cur - 1, 0, horizon - 1)
+        p_base = np.where(hist, closes[h_pos], paths[:, f_pos])
+        i_base = np.where(hist, index_closes[h_pos], i_paths[:, f_pos])
+        with np.errstate(invalid='ignore', divide='ignore'):
+            deviation = (paths / p_base - i_paths / i_base) * 100
+        hit = (np.abs(deviation) >= threshold) & valid
+        result[(days, threshold)] = {
+            "daily": hit.mean(axis=0),
+            "cumulative": np.logical_or.accumulate(hit, axis=1).mean(axis=0),
+        }
+    return result
+
+
+def _task(args):
+    code, closes, index_closes, limit_ratio, horizon, rules, n_paths, lookback, seed = args
+    return code, trigger_probability(closes, index_closes, limit_ratio, horizon, rules,
+                                     n_paths, lookback, seed)
+
+
+def estimate_many(frames, horizon, rules=DEFAULT_RULES, n_paths=DEFAULT_PATHS,
+                  lookback=DEFAULT_LOOKBACK, seed=None, workers=None):
+    """
+    批量估计触线概率
+    frames: {代码: (merged_df, limit_ratio)}，merged_df 含 close / index_close 列
+    workers: 进程数；None 为 CPU 核数，<=1 时在当前进程顺序计算
+    返回 {代码: trigger_probability 的结果}
+    """
+    keep = max(d for d, _ in rules) + lookback + 1
+    tasks = []
+    for i, (code, (df, limit_ratio)) in enumerate(frames.items()):
+        tasks.append((code, df['close'].to_numpy(dtype=np.float64)[-keep:],
+                      df['index_close'].to_numpy(dtype=np.float64)[-keep:],
+                      limit_ratio, horizon, tuple(rules), n_paths, lookback,
+                      None if seed is None else seed + i))
+
+    if workers is None:
+        workers = os.cpu_count() or 1
+    workers = min(workers, len(tasks))
+    if workers <= 1:
+        return dict(_task(t) for t in tasks)
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        return dict(pool.map(_task, tasks, chunksize=max(1, len(tasks) // (workers * 4))))
@@ -0,0 +1,329 @@
+"""
+整数分数值核心
+
+价格统一用整数"分"表示，指数点位用放大 10^INDEX_DECIMALS 的整数表示，
+四舍五入(ROUND_HALF_UP)与向上取整(ROUND_CEILING)全部用整数运算完成。
+
+语义与原先的 Decimal(str(value)).quantize(...) 完全一致:
+    - 先按 str(value) 的十进制字面值理解浮点数 (2.675 视为 2.675 而不是 2.67499999...)
+    - 半数远离零进位 (-2.675 -> -2.68)
+    - 无法解析的输入原样返回
+
+快速路径直接用浮点乘法判断，只有落在 .5 附近的"疑似平局"才走精确的字符串整数解析，
+因此标量与向量化版本都比 Decimal 快数倍。
+
+区间偏离 cum_deviation 不对输入取整: 按 str(value) 的十进制展开做精确有理数运算，
+最后一步再转为浮点，与原先逐步 Decimal 计算的结果一致 (tests/test_numeric.py 对照验证)。
+"""
+import math
+import re
+
+import numpy as np
+
+PRICE_DECIMALS = 2   # 价格精度: 分
+INDEX_DECIMALS = 4   # 指数点位精度
+
+# 平局判定容差 (相对值)。double 的相对误差约 1e-16，留足余量
+_TIE_TOL = 1e-9
+
+_NUM_RE = re.compile(r'\s*([+-]?)(\d*)(?:\.(\d*))?(?:[eE]([+-]?\d+))?\s*')
+
+_POW10 = [10 ** i for i in range(40)]
+_FSCALE = [float(10 ** i) for i in range(16)]
+_floor = math.floor
+
+
+def _pow10(n):
+    return _POW10[n] if n < len(_POW10) else 10 ** n
+
+
+def _parse_decimal(value):
+    """
+    把 str(value) 精确解析为 (符号, 整数尾数, 十进制指数)，即 value == sign * mant * 10^exp
+    无法解析时返回 None
+    """
+    m = _NUM_RE.fullmatch(str(value))
+    if not m:
+        return None
+    sign, int_part, frac_part, exp_part = m.groups()
+    frac_part = frac_part or ""
+    if not int_part and not frac_part:
+        return None
+    mant = int((int_part or "") + frac_part or "0")
+    exp = int(exp_part or 0) - len(frac_part)
+    return (-1 if sign == '-' else 1), mant, exp
+
+
+def _scaled_exact(value, decimals, ceiling=False):
+    """精确路径: 返回 (符号, 放大 10^decimals 后取整的绝对值)，失败返回 None"""
+    parsed = _parse_decimal(value)
+    if parsed is None:
+        return None
+    sign, mant, exp = parsed
+    shift = -decimals - exp
+    if shift <= 0:
+        return sign, mant * _pow10(-shift)
+    q, r = divmod(mant, _pow10(shift))
+    if ceiling:
+        # 向正无穷取整: 只有正数且有余数时进位
+        if r and sign > 0:
+            q += 1
+    elif 2 * r >= _pow10(shift):
+        q += 1
+    return sign, q
+
+
+def _is_plain_number(value):
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+def to_scaled(value, decimals=PRICE_DECIMALS):
+    """
+    按 ROUND_HALF_UP 转为放大 10^decimals 的整数 (价格 -> 分, 指数 -> 万分点)
+    无法转换时抛出 ValueError
+    """
+    if _is_plain_number(value):
+        if isinstance(value, int):
+            return value * _pow10(decimals)
+        if not math.isfinite(value):
+            raise ValueError(f"无法转换为整数: {value!r}")
+        y = abs(value) * _pow10(decimals)
+        f = math.floor(y)
+        frac = y - f
+        if abs(frac - 0.5) > _TIE_TOL * max(1.0, y):
+            n = int(f) + (1 if frac > 0.5 else 0)
+            return -n if value < 0 else n
+    res = _scaled_exact(value, decimals)
+    if res is None:
+        raise ValueError(f"无法转换为整数: {value!r}")
+    return res[0] * res[1]
+
+
+def to_cents(price):
+    """价格 -> 整数分 (四舍五入)"""
+    return to_scaled(price, PRICE_DECIMALS)
+
+
+def cents_to_price(cents):
+    """整数分 -> 价格 (int 真除法是正确舍入的，结果与 float('x.yz') 一致)"""
+    return cents / 100
+
+
+def round_half_up(value, decimals=2):
+    """
+    严格的四舍五入函数 (解决Python默认银行家舍入导致的0.01%偏差)
+    """
+    if isinstance(value, float):
+        if value - value != 0.0:
+            # nan / inf 原样返回
+            return value
+        scale = _FSCALE[decimals] if decimals < 16 else 10.0 ** decimals
+        y = value * scale if value >= 0 else -value * scale
+        f = _floor(y)
+        frac = y - f
+        tol = _TIE_TOL * y + _TIE_TOL
+        if frac > 0.5 + tol:
+            f += 1
+        elif frac >= 0.5 - tol:
+            f = None  # 疑似平局，走精确路径
+        if f is not None:
+            # 负数取反放在除法之后，保证 -0.001 -> -0.0 与 Decimal 一致
+            if value > 0:
+                return f / scale
+            return -(f / scale) if value < 0 else value
+    elif isinstance(value, int) and not isinstance(value, bool):
+        return float(value)
+    res = _scaled_exact(value, decimals)
+    if res is None:
+        return value
+    sign, n = res
+    out = n / _pow10(decimals)
+    return -out if sign < 0 else out
+
+
+def ceil_to(value, decimals=2):
+    """向上取整到 decimals 位 (ROUND_CEILING)，用于"价格 >= 理论值即触发"的最小报价单位"""
+    if isinstance(value, float):
+        if not math.isfinite(value):
+            return value
+        scale = _FSCALE[decimals] if decimals < 16 else 10.0 ** decimals
+        y = value * scale
+        r = round(y)
+        if abs(y - r) > _TIE_TOL * max(1.0, abs(y)):
+            return math.copysign(math.ceil(y) / scale, value)
+    elif isinstance(value, int) and not isinstance(value, bool):
+        return float(value)
+    res = _scaled_exact(value, decimals, ceiling=True)
+    if res is None:
+        return value
+    sign, n = res
+    out = n / _pow10(decimals)
+    return -out if sign < 0 else out
+
+
+def ceil_cents(price):
+    """价格向上取整到分，返回整数分"""
+    c = ceil_to(price, PRICE_DECIMALS)
+    return to_cents(c)
+
+
+def round_half_up_array(values, decimals=2):
+    """
+    round_half_up 的向量化版本，返回 float64 数组
+    非有限值 (nan/inf) 原样保留，疑似平局的元素逐个走精确路径
+    """
+    a = np.asarray(values, dtype=np.float64)
+    scale = float(_pow10(decimals))
+    with np.errstate(invalid='ignore'):
+        y = np.abs(a) * scale
+        f = np.floor(y)
+        frac = y - f
+        out = np.copysign(f + (frac >= 0.5), a) / scale
+        finite = np.isfinite(a)
+        amb = finite & (np.abs(frac - 0.5) <= _TIE_TOL * np.maximum(1.0, y))
+    out = np.where(finite, out, a)
+    if amb.any():
+        flat_out = out.reshape(-1)
+        flat_a = a.reshape(-1)
+        for i in np.flatnonzero(amb.reshape(-1)):
+            flat_out[i] = round_half_up(float(flat_a[i]), decimals)
+    return out
+
+
+def ceil_to_array(values, decimals=2):
+    """ceil_to 的向量化版本"""
+    a = np.asarray(values, dtype=np.float64)
+    scale = float(_pow10(decimals))
+    with np.errstate(invalid='ignore'):
+        y = a * scale
+        out = np.copysign(np.ceil(y) / scale, a)
+        finite = np.isfinite(a)
+        amb = finite & (np.abs(y - np.round(y)) <= _TIE_TOL * np.maximum(1.0, np.abs(y)))
+    out = np.where(finite, out, a)
+    if amb.any():
+        flat_out = out.reshape(-1)
+        flat_a = a.reshape(-1)
+        for i in np.flatnonzero(amb.reshape(-1)):
+            flat_out[i] = ceil_to(float(flat_a[i]), decimals)
+    return out
+
+
+def to_cents_array(prices):
+    """价格数组 -> int64 分数组 (调用方需保证无 nan)"""
+    return np.rint(round_half_up_array(prices, PRICE_DECIMALS) * 100).astype(np.int64)
+
+
+def to_scaled_array(values, decimals=PRICE_DECIMALS):
+    """to_scaled 的向量化版本 (调用方需保证无 nan)"""
+    return np.rint(round_half_up_array(values, decimals) * _pow10(decimals)).astype(np.int64)
+
+
+def _exact_fraction(value):
+    """str(value) 的十进制字面值 -> 精确有理数 (分子, 分母)，无法解析 (nan / inf 等) 时返回 None"""
+    parsed = _parse_decimal(value)
+    if parsed is None:
+        return None
+    sign, mant, exp = parsed
+    if exp >= 0:
+        return sign * mant * _pow10(exp), 1
+    return sign * mant, _pow10(-exp)
+
+
+def _float_cum_deviation(p_end, p_base, i_end, i_base):
+    # 与原先 Decimal 失败时的浮点回退一致 (nan 传播，零基准为 inf)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        stock_cum = (np.float64(p_end) / np.float64(p_base) - 1) * 100
+        index_cum = (np.float64(i_end) / np.float64(i_base) - 1) * 100
+    return float(stock_cum), float(index_cum), float(stock_cum - index_cum)
+
+
+def cum_deviation(p_end, p_base, i_end, i_base):
+    """
+    区间累计涨幅与偏离值 (单位: %)
+        stock_cum = (p_end / p_base - 1) * 100
+        index_cum = (i_end / i_base - 1) * 100
+        deviation = stock_cum - index_cum
+    按 str(value) 的十进制字面值做精确有理数运算 (输入不做任何取整)，最后一次除法正确舍入为 float，
+    与原先 Decimal(str(value)) 逐步计算的结果一致；nan / 零基准等按浮点公式计算
+    返回 (stock_cum, index_cum, deviation)
+    """
+    fracs = [_exact_fraction(v) for v in (p_end, p_base, i_end, i_base)]
+    if None in fracs or fracs[1][0] == 0 or fracs[3][0] == 0:
+        return _float_cum_deviation(p_end, p_base, i_end, i_base)
+    (pe, pe_d), (pb, pb_d), (ie, ie_d), (ib, ib_d) = fracs
+    # p_end / p_base - 1 = (pe * pb_d - pb * pe_d) / (pe_d * pb)
+    s_num, s_den = (pe * pb_d - pb * pe_d) * 100, pe_d * pb
+    i_num, i_den = (ie * ib_d - ib * ie_d) * 100, ie_d * ib
+    # Python 整数真除法是正确舍入的
+    return s_num / s_den, i_num / i_den, (s_num * i_den - i_num * s_den) / (s_den * i_den)
+
+
+_EXACT_LIMIT = float(2 ** 53)
+
+
+def _on_grid(values, decimals):
+    """
+    值是否恰好是 decimals 位小数 (str(value) 即该小数): 返回 (放大后的 int64, 掩码)
+    量级限制保证相邻网格点间距大于 ulp，此时最短 repr 就是这个小数
+    """
+    scale = float(_pow10(decimals))
+    with np.errstate(invalid='ignore', over='ignore'):
+        scaled = np.rint(values * scale)
+        ok = np.isfinite(scaled) & (np.abs(scaled) < 2 ** 50) & (scaled / scale == values)
+    return np.where(ok, scaled, 0).astype(np.int64), ok
+
+
+def cum_deviation_array(p_end, p_base, i_end, i_base):
+    """
+    cum_deviation 的向量化版本 (各参数可广播)，返回 (stock_cum, index_cum, deviation) 三个 float64 数组
+    价格恰为分、指数点位恰为万分点 (行情数据的常态) 时整数运算，分子分母都在 2^53 内，
+    一次 IEEE 除法即正确舍入，与标量版本逐位一致；其余有限值逐个走标量精确路径，nan 等按浮点公式计算
+    """
+    p_end, p_base, i_end, i_base = np.broadcast_arrays(*(np.asarray(v, dtype=np.float64)
+                                                         for v in (p_end, p_base, i_end, i_base)))
+    pe, ok_pe = _on_grid(p_end, PRICE_DECIMALS)
+    pb, ok_pb = _on_grid(p_base, PRICE_DECIMALS)
+    ie, ok_ie = _on_grid(i_end, INDEX_DECIMALS)
+    ib, ok_ib = _on_grid(i_base, INDEX_DECIMALS)
+    ok = ok_pe & ok_pb & ok_ie & ok_ib & (pb != 0) & (ib != 0)
+    # 乘积会超过 2^53 (int64 溢出或转 float 时再舍入一次) 的元素不走快速路径
+    ok &= (np.abs(pe.astype(np.float64) * ib) + np.abs(ie.astype(np.float64) * pb)) * 100 < _EXACT_LIMIT
+    ok &= np.abs(pb.astype(np.float64) * ib) < _EXACT_LIMIT
+    pb, ib = np.where(ok, pb, 1), np.where(ok, ib, 1)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        f_stock = (p_end / p_base - 1) * 100
+        f_index = (i_end / i_base - 1) * 100
+    stock_cum = np.where(ok, (pe - pb) * 100 / pb, f_stock)
+    index_cum = np.where(ok, (ie - ib) * 100 / ib, f_index)
+    deviation = np.where(ok, (pe * ib - ie * pb) * 100 / (pb * ib), f_stock - f_index)
+
+    # 不在网格上的有限值 (如未取整的价格) 逐个精确计算
+    finite = np.isfinite(p_end) & np.isfinite(p_base) & np.isfinite(i_end) & np.isfinite(i_base)
+    rest = np.flatnonzero((finite & ~ok).reshape(-1))
+    if len(rest):
+        outs = [a.reshape(-1) for a in (stock_cum, index_cum, deviation)]
+        ins = [a.reshape(-1) for a in (p_end, p_base, i_end, i_base)]
+        for i in rest:
+            exact = cum_deviation(*(float(a[i]) for a in ins))
+            for out, v in zip(outs, exact):
+                out[i] = v
+    return stock_cum, index_cum, deviation
+
+
+def _ratio_percent(limit_ratio):
+    # 1.10 -> 110；数组 (各股不同涨跌幅限制) 逐元素换算
+    if np.ndim(limit_ratio) == 0:
+        return int(round(float(limit_ratio) * 100))
+    return np.rint(np.asarray(limit_ratio, dtype=np.float64) * 100).astype(np.int64)
+
+
+def limit_up_cents(cents, limit_ratio):
+    """涨停价(分) = 前收(分) × limit_ratio 四舍五入到分，纯整数运算，cents 与 limit_ratio 均支持 int64 数组"""
+    r = _ratio_percent(limit_ratio)
+    return (cents * r + 50) // 100
+
+
+def limit_down_cents(cents, limit_ratio):
+    """跌停价(分) = 前收(分) × (2 - limit_ratio) 四舍五入到分"""
+    r = 200 - _ratio_percent(limit_ratio)
+    return (cents * r + 50) // 100
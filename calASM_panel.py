@@ -0,0 +1,234 @@
+"""
+横截面面板: 全部股票的收盘价按交易日历对齐为一个 (股票数 × 交易日数) 的二维数组
+
+    - close        : 原始收盘价，停牌/未上市为 nan
+    - suspended    : 已上市但当天无成交 (停牌) 的掩码
+    - listed       : 首个有效交易日及之后为 True
+    - close_ffill  : 停牌日沿用最近收盘价，用于区间计算
+    - index_close  : 每只股票对应基准指数在同一日历上的点位 (N, T)
+    - no_limit     : 每只股票上市初期不设涨跌幅限制的交易日 (由证券主表的上市日期与交易日历得出)
+
+区间偏离按"市场交易日"回溯窗口 (第 t 列对应第 t-w 列)，而不是按个股自己的行数回溯，
+停牌不会让基准日错位。偏离、触线价格等计算对全部股票一次完成，偏离与逐只分析一样按
+cum_deviation_array 精确计算 (与原 Decimal 公式逐位一致)，触线价格四舍五入到分。
+
+load_panel 按股票列表取数并组装面板，GUI 与批量脚本共用。
+"""
+import socket
+import time
+
+import numpy as np
+import pandas as pd
+
+from calASM_cache import data_store
+from calASM_limitpath import allowed_boards
+from calASM_numeric import cum_deviation_array, round_half_up_array
+from calASM_security import get_market_rules, no_limit_dates
+
+
+def _ffill_2d(a):
+    """按行向前填充 nan"""
+    n, t = a.shape
+    idx = np.where(np.isnan(a), 0, np.arange(t)[None, :])
+    np.maximum.accumulate(idx, axis=1, out=idx)
+    out = a[np.arange(n)[:, None], idx]
+    return out
+
+
+class MarketPanel:
+    def __init__(self, codes, dates, close, index_close, limit_ratio=None, names=None, index_codes=None,
+                 pct_chg=None, no_limit=None):
+        self.codes = list(codes)
+        self.dates = np.asarray(dates)
+        self.close = np.asarray(close, dtype=np.float64)
+        # 数据源给出的涨跌幅 (考虑除权的前收)，缺失时由收盘价推算
+        self.pct_chg = None if pct_chg is None else np.asarray(pct_chg, dtype=np.float64)
+        self.index_close = np.asarray(index_close, dtype=np.float64)
+        n = len(self.codes)
+        self.limit_ratio = np.full(n, 1.10) if limit_ratio is None else np.asarray(limit_ratio, dtype=np.float64)
+        self.names = list(names) if names is not None else list(self.codes)
+        self.index_codes = list(index_codes) if index_codes is not None else [""] * n
+        self.no_limit = [tuple(d) for d in no_limit] if no_limit is not None else [()] * n
+        self.row = {c: i for i, c in enumerate(self.codes)}
+
+        has_bar = ~np.isnan(self.close)
+        self.listed = np.logical_or.accumulate(has_bar, axis=1)
+        self.suspended = self.listed & ~has_bar
+        self.close_ffill = _ffill_2d(self.close)
+        self.index_close = _ffill_2d(self.index_close)
+
+    @property
+    def shape(self):
+        return self.close.shape
+
+    @classmethod
+    def from_frames(cls, stocks, index_frames, calendar=None):
+        """
+        stocks: [(code, name, stock_df[date, close], index_code, limit_ratio), ...]
+        index_frames: {index_code: index_df[date, index_close]}
+        calendar: 交易日列表 'YYYYMMDD'；为空时用所有数据日期的并集 (此时不识别新股不设涨跌幅限制的日子)
+        """
+        last = max((df['date'].iloc[-1] for _, _, df, _, _ in stocks if len(df)), default=None)
+        first = min((df['date'].iloc[0] for _, _, df, _, _ in stocks if len(df)), default=None)
+        if calendar:
+            dates = [d for d in calendar if first <= d <= last]
+            # 日历缺失的日期 (如日历未更新的当日实时行) 也要保留
+            extra = set()
+            for _, _, df, _, _ in stocks:
+                extra.update(df['date'])
+            dates = sorted(set(dates) | {d for d in extra if first <= d <= last})
+        else:
+            dates = sorted({d for _, _, df, _, _ in stocks for d in df['date']})
+        dates = np.array(dates)
+        pos = pd.Index(dates)
+
+        n, t = len(stocks), len(dates)
+        close = np.full((n, t), np.nan)
+        pct_chg = np.full((n, t), np.nan)
+        index_close = np.full((n, t), np.nan)
+        index_rows = {}
+        for code_idx, df in index_frames.items():
+            row = np.full(t, np.nan)
+            if df is not None and len(df):
+                loc = pos.get_indexer(df['date'])
+                ok = loc >= 0
+                row[loc[ok]] = df['index_close'].to_numpy(dtype=np.float64)[ok]
+                # 首日之前的最近点位，作为前向填充的起点
+                before = df[df['date'] < dates[0]]
+                if np.isnan(row[0]) and len(before):
+                    row[0] = float(before['index_close'].iloc[-1])
+            index_rows[code_idx] = row
+
+        for i, (code, _, df, index_code, _) in enumerate(stocks):
+            loc = pos.get_indexer(df['date'])
+            ok = loc >= 0
+            close[i, loc[ok]] = df['close'].to_numpy(dtype=np.float64)[ok]
+            if 'pct_chg' in df:
+                pct_chg[i, loc[ok]] = pd.to_numeric(df['pct_chg'], errors='coerce').to_numpy(dtype=np.float64)[ok]
+            if index_code in index_rows:
+                index_close[i] = index_rows[index_code]
+
+        no_limit = [no_limit_dates(s[0], calendar) for s in stocks] if calendar else None
+        return cls([s[0] for s in stocks], dates, close, index_close,
+                   limit_ratio=[s[4] for s in stocks], names=[s[1] for s in stocks],
+                   index_codes=[s[3] for s in stocks], pct_chg=pct_chg, no_limit=no_limit)
+
+    # ================= 向量化计算 =================
+
+    def window_deviation(self, days):
+        """全部股票、全部交易日的 days 日区间偏离 (N, T)，单位 %；窗口不足或未上市为 nan"""
+        p, i = self.close_ffill, self.index_close
+        out = np.full(p.shape, np.nan)
+        if p.shape[1] > days:
+            _, _, out[:, days:] = cum_deviation_array(p[:, days:], p[:, :-days], i[:, days:], i[:, :-days])
+            out[:, days:][~self.listed[:, :-days]] = np.nan
+        return out
+
+    def predict(self, days, threshold, horizon, at=None):
+        """
+        假设股价与指数不变，预测 T+1..T+horizon 的偏离、触线价格与允许涨幅，T 为第 at 列 (默认最后一列)
+        返回 dict，各数组形状 (N, horizon)；base_price / index_base 为各预测日对应的基准日收盘与指数点位
+        """
+        t = self.shape[1] - 1 if at is None else at
+        p, i = self.close_ffill, self.index_close
+        k = np.arange(1, horizon + 1)
+        base = t + k - days
+        valid = (base >= 0)[None, :] & self.listed[:, np.clip(base, 0, t)]
+        hist = base <= t
+        b = np.clip(base, 0, t)
+        p_t = p[:, t:t + 1]
+        i_t = i[:, t:t + 1]
+        p_base = np.where(hist[None, :], p[:, b], p_t)
+        i_base = np.where(hist[None, :], i[:, b], i_t)
+        # 与 period_result 的预测行同一算法: 偏离精确计算，触线价四舍五入到分，允许涨幅相对现价
+        _, index_cum, deviation = cum_deviation_array(p_t, p_base, i_t, i_base)
+        trigger = round_half_up_array(p_base * (1 + (threshold + index_cum) / 100))
+        with np.errstate(invalid='ignore', divide='ignore'):
+            room = np.where(p_t > 0, (trigger / p_t - 1) * 100, 0.0)
+            triggered = np.abs(deviation) >= threshold
+        # T+k 仍在新股不设涨跌幅限制的日子里: 没有涨停价，不推算连板
+        left = np.array([sum(d > self.dates[t] for d in dates) for dates in self.no_limit], dtype=np.int64)
+        limit = np.where(k[None, :] <= left[:, None], np.nan, self.limit_ratio[:, None])
+        boards = allowed_boards(p_t, p_base, index_cum, threshold, limit)
+        nan = ~valid
+        return {
+            "deviation": np.where(nan, np.nan, deviation),
+            "left_space": np.where(nan, np.nan, threshold - deviation),
+            "trigger_price": np.where(nan, np.nan, trigger),
+            "room_pct": np.where(nan, np.nan, np.where(triggered, 0.0, room)),
+            "boards": np.where(nan | triggered, 0, boards),
+            "triggered": triggered & valid,
+            "base_price": np.where(nan, np.nan, p_base),
+            "index_base": np.where(nan, np.nan, i_base),
+        }
+
+    # ================= 兼容逐只分析 =================
+
+    def frame(self, code):
+        """
+        单只股票按交易日历对齐的行情 DataFrame[date, close, pct_chg, index_close, index_pct_chg, suspended]
+        从上市首日开始，停牌日沿用前收盘、涨跌幅为 0，可直接交给 analyze_period_combined
+        """
+        r = self.row[code]
+        m = self.listed[r]
+        close = self.close_ffill[r, m]
+        index_close = self.index_close[r, m]
+        with np.errstate(invalid='ignore', divide='ignore'):
+            pct = np.concatenate([[0.0], (close[1:] / close[:-1] - 1) * 100])
+            i_pct = np.concatenate([[0.0], (index_close[1:] / index_close[:-1] - 1) * 100])
+        if self.pct_chg is not None:
+            src = self.pct_chg[r, m]
+            pct = np.where(np.isnan(src), pct, src)
+        # 停牌日涨跌幅为 0
+        pct = np.where(self.suspended[r, m], 0.0, pct)
+        return pd.DataFrame({
+            "date": self.dates[m],
+            "close": close,
+            "pct_chg": pct,
+            "index_close": index_close,
+            "index_pct_chg": i_pct,
+            "suspended": self.suspended[r, m],
+        })
+
+    def frames(self):
+        """{代码: (名称, frame, limit_ratio)}，与 AnalysisApp.frames 结构一致"""
+        return {c: (self.names[i], self.frame(c), float(self.limit_ratio[i])) for i, c in enumerate(self.codes)}
+
+
+def load_panel(stock_list, date, source, log=print, pause=0.5, stop=None):
+    """
+    拉取股票与所需基准指数，按交易日历组装 MarketPanel；每个指数只取一次，取不到的股票跳过
+    source: 提供 calendar() / stock_daily(code, date) / index_daily(index_code, date) 的数据源
+            (calASM_api.LocalSource 或本地分析服务的 ServiceClient)
+    pause: 联网下载过才等待的秒数 (命中共享数据仓库不限速)；stop: 返回 True 时停止取数
+    全部取不到时返回 None
+    """
+    stocks = []
+    index_frames = {}
+    for code, name in stock_list:
+        if stop is not None and stop():
+            break
+        log(f"正在获取: {code} {name} ...")
+        fetches = data_store().fetches
+        try:
+            index_code, _, limit_ratio = get_market_rules(code)
+            if index_code not in index_frames:
+                index_frames[index_code] = source.index_daily(index_code, date)
+            stock_df = source.stock_daily(code, date)
+            if stock_df is None or stock_df.empty or index_frames[index_code] is None:
+                log(f"   [跳过] 无法获取 {code} 或指数 {index_code} 数据")
+                continue
+            stocks.append((code, name, stock_df[stock_df['date'] <= date], index_code, limit_ratio))
+        except socket.timeout:
+            log("❌ 获取出错: 网络连接超时，请检查网络或重试。")
+        except Exception as e:
+            err_msg = str(e)
+            if "timed out" in err_msg.lower():
+                err_msg = "网络请求超时"
+            log(f"❌ 获取出错: {err_msg}")
+        if data_store().fetches > fetches:
+            time.sleep(pause)
+
+    if not stocks:
+        return None
+    return MarketPanel.from_frames(stocks, index_frames, source.calendar())
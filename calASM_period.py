@@ -0,0 +1,277 @@
+"""
+单只股票的区间偏离明细 (analyze_period_combined 的向量化核心)
+
+原先按 T-2..T+N 逐行循环 (每行 iloc 取数、标量计算、格式化)，汇总再逐行 iterrows 拼成
+T1_触线 / T1_空间 ... 这样的按天字典键，耗时与输出都随预测天数线性增长，GUI 只好把预测天数限制在 20 天。
+这里对全部偏移一次数组运算，结果保存为带类型的数组记录，数值与"已触发"标志原样保留，
+"12.34%" / "已触发" 这样的文字只在展示时 (日志、图片、HTML) 生成，渲染时不再把文字解析回数字:
+    - period_result  : PeriodResult，offset = -history..horizon 的偏离、触线价、允许涨幅、允许连板
+                       (预测日假设股价与指数不变)；to_frame() 得到原先的结果表
+    - period_summary : PeriodSummary，预测日 T+1..T+N 的触线 / 空间 / 板 数组
+    - overview_days / overview_columns : 预测天数较多时总览只展示的代表性日子 (T+1..T+5 及 10/20/40/60/120/250 日)
+    - PeriodResult.condensed() : 同样压缩明细表的预测行，用于出图与 HTML 报告
+
+预测一整年 (250 个交易日) 也只是数组多几百个元素。
+"""
+import numpy as np
+import pandas as pd
+
+from calASM_limitpath import allowed_boards
+from calASM_numeric import cum_deviation_array, round_half_up, round_half_up_array
+from calASM_rules import rule_hit
+
+HISTORY_ROWS = 2
+MAX_HORIZON = 250
+# 不超过这么多天时总览逐日展示，否则只展示 overview_days 选出的日子
+OVERVIEW_FULL_DAYS = 20
+OVERVIEW_MILESTONES = (10, 20, 40, 60, 120, 250)
+
+COLUMNS = ["日期", "类型", "基准日期", "实际涨幅", "区间偏离", "剩余空间", "触线价格", "允许涨幅", "允许连板"]
+KIND_LABELS = {-1: "历史", 0: "今日", 1: "预测"}
+
+
+def fmt_pct(value):
+    """数值 -> '12.34%' (四舍五入)，nan 为 '-'"""
+    value = float(value)
+    return "-" if np.isnan(value) else f"{round_half_up(value, 2):.2f}%"
+
+
+def _pct(values):
+    return [f"{v:.2f}%" for v in round_half_up_array(values).tolist()]
+
+
+class PeriodResult:
+    """
+    单只股票、单条规则的逐日结果，各字段为按 offset 升序、等长的数组:
+        offset        -history..horizon (0 为 T 日，>0 为预测日)
+        dates         日期文字 (历史为 'YYYYMMDD'，预测为 'MM-DD(T+n)')
+        base_dates    基准日期 'YYYYMMDD'
+        actual_pct / deviation / left_space / room_pct : 单位 %
+        trigger_price 触线价格 (四舍五入到分)
+        boards        允许连板 (已触发为 0)
+        triggered     是否已触发
+    """
+    __slots__ = ("days", "threshold", "offset", "dates", "base_dates", "actual_pct", "deviation", "left_space",
+                 "trigger_price", "room_pct", "boards", "triggered")
+
+    def __init__(self, days, threshold, **fields):
+        self.days = days
+        self.threshold = threshold
+        for name in self.__slots__[2:]:
+            setattr(self, name, fields[name])
+
+    def __len__(self):
+        return len(self.offset)
+
+    @property
+    def kinds(self):
+        """'历史' / '今日' / '预测'"""
+        return [KIND_LABELS[k] for k in np.sign(self.offset).tolist()]
+
+    def take(self, index):
+        """按布尔掩码或下标取子集，返回新的 PeriodResult"""
+        return PeriodResult(self.days, self.threshold,
+                            **{name: getattr(self, name)[index] for name in self.__slots__[2:]})
+
+    def row(self, offset):
+        """某个 offset 在数组中的下标，没有时为 None"""
+        hit = np.flatnonzero(self.offset == offset)
+        return int(hit[0]) if len(hit) else None
+
+    def condensed(self):
+        """出图 / 报告用: 预测天数较多时只保留 overview_days 选出的日子 (历史 / 今日行全部保留)"""
+        horizon = int(self.offset.max()) if len(self) else 0
+        if horizon <= OVERVIEW_FULL_DAYS:
+            return self
+        shown = [i + 1 for i in overview_days(horizon)]
+        return self.take((self.offset <= 0) | np.isin(self.offset, shown))
+
+    def to_frame(self, formatted=True):
+        """
+        formatted=True : 原先 analyze_period_combined 的文字结果表 (展示用)
+        formatted=False: 数值列 (另含 offset / 已触发)，供导出与程序调用
+        """
+        if not formatted:
+            return pd.DataFrame({
+                "offset": self.offset, "日期": self.dates, "类型": self.kinds, "基准日期": self.base_dates,
+                "实际涨幅": self.actual_pct, "区间偏离": self.deviation, "剩余空间": self.left_space,
+                "触线价格": self.trigger_price, "允许涨幅": self.room_pct, "允许连板": self.boards,
+                "已触发": self.triggered,
+            })
+        if not len(self):
+            return pd.DataFrame()
+        return pd.DataFrame({
+            "日期": self.dates,
+            "类型": self.kinds,
+            "基准日期": self.base_dates,
+            "实际涨幅": _pct(self.actual_pct),
+            "区间偏离": _pct(self.deviation),
+            "剩余空间": np.where(self.triggered, "已触发", _pct(self.left_space)),
+            "触线价格": self.trigger_price,
+            "允许涨幅": [f"{v:.2f}%" for v in self.room_pct.tolist()],
+            "允许连板": self.boards,
+        }, columns=COLUMNS)
+
+
+class PeriodSummary:
+    """
+    预测日 T+1..T+N 的汇总 (替代 T1_触线 / T1_空间 / T1_板 ... 按天字典键)
+        dates: ['01-12', ...]；trigger / space: float 数组 (缺失为 nan)；boards: int 数组；triggered: bool 数组
+        today_pct / today_deviation: T 日实际涨幅与区间偏离 (%)
+    """
+    __slots__ = ("name", "kind", "price", "dates", "trigger", "space", "boards", "triggered",
+                 "today_pct", "today_deviation")
+
+    def __init__(self, name, kind, price, dates, trigger, space, boards, triggered,
+                 today_pct=np.nan, today_deviation=np.nan):
+        self.name = name
+        self.kind = kind
+        self.price = float(price)
+        self.dates = dates
+        self.trigger = trigger
+        self.space = space
+        self.boards = boards
+        self.triggered = triggered
+        self.today_pct = today_pct
+        self.today_deviation = today_deviation
+
+    def renamed(self, name):
+        fields = {slot: getattr(self, slot) for slot in self.__slots__}
+        fields["name"] = name
+        return PeriodSummary(**fields)
+
+    def first_space(self):
+        """T+1 允许涨幅，缺失时视为很宽松 (9999)"""
+        return float(self.space[0]) if len(self.space) and np.isfinite(self.space[0]) else 9999.0
+
+    def has(self, i):
+        return i < len(self.trigger) and not np.isnan(self.trigger[i])
+
+    def cells(self, i):
+        """第 i 个预测日的 (触线价, 允许涨幅, 连板) 文字，缺失为 '-'"""
+        if not self.has(i):
+            return "-", "-", "-"
+        return f"{self.trigger[i]:.2f}", fmt_pct(self.space[i]), str(int(self.boards[i]))
+
+    def key(self):
+        """内容摘要 (图片缓存键用)"""
+        return (self.name, self.kind, self.price, tuple(self.dates), self.trigger.tolist(), self.space.tolist(),
+                self.boards.tolist(), self.today_deviation)
+
+    def __repr__(self):
+        return f"PeriodSummary({self.name!r}, {self.kind!r}, {self.price:.2f}, {len(self.dates)} 天)"
+
+
+def period_result(df, future_dates, days, threshold, limit_ratio, history=HISTORY_ROWS, no_limit=(), window=None):
+    """
+    df: 行情表 [date, close, pct_chg, index_close, ...]，最后一行为 T 日；future_dates: T+1..T+N 的日期
+    no_limit: 新股不设涨跌幅限制的日期 (calASM_security.no_limit_dates)，这些行不推算连板 (记为 0)
+    window: 该规则在 calASM_rules.evaluate_rules 中的结果；给出时历史行的偏离、指数涨幅与触发状态直接取自引擎，
+            这里只推算预测行 (触发按规则方向判断)
+    只含基准日存在的行
+    """
+    horizon = len(future_dates)
+    close = df['close'].to_numpy(dtype=np.float64)
+    index_close = df['index_close'].to_numpy(dtype=np.float64)
+    pct_chg = df['pct_chg'].to_numpy(dtype=np.float64) if 'pct_chg' in df else np.zeros(len(df))
+    dates = df['date'].to_numpy()
+    cur = len(df) - 1
+
+    offset = np.arange(-history, horizon + 1)
+    target = cur + np.minimum(offset, 0)
+    base = cur + offset - days
+    keep = (target >= 0) & (base >= 0)
+    offset, target, base = offset[keep], target[keep], base[keep]
+    future = offset > 0
+
+    p_end = close[target]
+    i_end = index_close[target]
+    # 历史行的前收为前一天收盘 (首行取自身)，预测行假设股价不变，前收即现价
+    p_prev = np.where(future, close[cur] if cur >= 0 else np.nan, close[np.maximum(target - 1, 0)])
+    # 预测天数超过规则天数时基准日落在 T 之后，同样假设股价与指数不变
+    p_base = close[np.minimum(base, cur)]
+    i_base = index_close[np.minimum(base, cur)]
+
+    if window is None:
+        _, index_cum, deviation = cum_deviation_array(p_end, p_base, i_end, i_base)
+        triggered = np.abs(deviation) >= threshold
+    else:
+        hist = target[~future]
+        index_cum, deviation = np.empty(len(offset)), np.empty(len(offset))
+        triggered = np.empty(len(offset), dtype=bool)
+        index_cum[~future], deviation[~future] = window["index_cum"][hist], window["deviation"][hist]
+        triggered[~future] = window["triggered"][hist]
+        _, index_cum[future], deviation[future] = cum_deviation_array(p_end[future], p_base[future],
+                                                                      i_end[future], i_base[future])
+        triggered[future] = rule_hit(deviation[future], window["rule"])
+    trigger_price = round_half_up_array(p_base * (1 + (threshold + index_cum) / 100))
+    with np.errstate(invalid='ignore', divide='ignore'):
+        room_pct = np.where(p_prev > 0, (trigger_price / p_prev - 1) * 100, 0.0)
+    row_dates = [future_dates[off - 1] if off > 0 else dates[pos]
+                 for off, pos in zip(offset.tolist(), target.tolist())]
+    if len(no_limit):
+        # 不设涨跌幅限制的日子没有涨停价，不参与连板推算
+        limit_ratio = np.where(np.isin(row_dates, list(no_limit)), np.nan, limit_ratio)
+    # 逐价位模拟: 每个涨停价按前收四舍五入到分，数到偏离触线为止
+    boards = allowed_boards(p_prev, p_base, index_cum, threshold, limit_ratio)
+
+    labels = [date_label(d, off) if off > 0 else d for off, d in zip(offset.tolist(), row_dates)]
+    base_dates = [dates[b] if b <= cur else future_dates[b - cur - 1] for b in base.tolist()]
+    return PeriodResult(
+        days, threshold,
+        offset=offset,
+        dates=np.array(labels, dtype=str),
+        base_dates=np.array(base_dates, dtype=str),
+        actual_pct=np.where(future, 0.0, pct_chg[target]),
+        deviation=deviation,
+        left_space=threshold - deviation,
+        trigger_price=trigger_price,
+        room_pct=np.where(triggered, 0.0, room_pct),
+        boards=np.where(triggered, 0, boards),
+        triggered=triggered,
+    )
+
+
+def date_label(date_str, offset=None):
+    """'20260112' -> '01-12'；offset 给出时附加 '(T+n)'"""
+    if len(date_str) == 8 and date_str.isdigit():
+        label = f"{date_str[4:6]}-{date_str[6:8]}"
+    else:
+        label = date_str
+    return label if offset is None else f"{label}(T+{offset})"
+
+
+def period_summary(res, future_dates, name, kind, current_price):
+    """PeriodResult -> PeriodSummary (预测日 T+k 放在第 k-1 个位置，缺失为 nan)"""
+    horizon = len(future_dates)
+    trigger = np.full(horizon, np.nan)
+    space = np.full(horizon, np.nan)
+    boards = np.zeros(horizon, dtype=np.int64)
+    triggered = np.zeros(horizon, dtype=bool)
+    future = res.offset > 0
+    k = res.offset[future] - 1
+    trigger[k] = res.trigger_price[future]
+    space[k] = res.room_pct[future]
+    boards[k] = res.boards[future]
+    triggered[k] = res.triggered[future]
+    t = res.row(0)
+    return PeriodSummary(name, kind, current_price, [date_label(d) for d in future_dates],
+                         trigger, space, boards, triggered,
+                         today_pct=np.nan if t is None else float(res.actual_pct[t]),
+                         today_deviation=np.nan if t is None else float(res.deviation[t]))
+
+
+def overview_days(horizon):
+    """总览展示的预测日下标 (0 起)；不超过 OVERVIEW_FULL_DAYS 天时逐日展示"""
+    if horizon <= OVERVIEW_FULL_DAYS:
+        return list(range(horizon))
+    days = set(range(1, 6)) | {d for d in OVERVIEW_MILESTONES if d <= horizon} | {horizon}
+    return [d - 1 for d in sorted(days)]
+
+
+def overview_columns(summary):
+    """总览展示的 [(预测日下标, 表头日期), ...]；压缩展示时日期后附 (T+n)"""
+    dates = summary.dates
+    days = overview_days(len(dates))
+    full = len(days) == len(dates)
+    return [(i, dates[i] if full else date_label(dates[i], i + 1)) for i in days]
@@ -0,0 +1,114 @@
+"""
+启动预取
+
+GUI 打开后在后台按顺序把第一次分析要用的数据拉进共享数据仓库 (cache/data):
+    1. 证券主表 (名称、ST 涨跌停比例、基准指数)
+    2. 交易日历
+    3. 输入框中股票涉及的基准指数日线
+    4. 输入框中股票的日线历史 (与分析时相同的键，点击"开始分析"直接命中)
+
+预取是低优先级的:
+    - 用户发起分析等前台任务时调用 pause()，预取做完手头这一项后等待，resume() 后继续
+    - 同一份数据前台与预取同时请求时经 single-flight 只下载一次
+    - 联网下载过的项目之间稍作间隔，与分析时的限速一致
+状态经 on_status 回调通知 (在预取线程中调用，GUI 需自行切回主线程)。
+"""
+import threading
+import time
+from datetime import datetime
+
+from calASM_cache import data_store
+from calASM_data import fetch_index_daily, fetch_stock_daily, fetch_trade_calendar
+from calASM_security import ensure_fresh, get_market_rules
+
+PREFETCH_DELAY = 0.5
+
+
+def _quiet(*args, **kwargs):
+    pass
+
+
+class Prefetcher:
+    def __init__(self, codes, target_date=None, on_status=None, delay=PREFETCH_DELAY):
+        self.codes = list(codes)
+        self.target_date = target_date or datetime.now().strftime("%Y%m%d")
+        self.on_status = on_status or _quiet
+        self.delay = delay
+        self._cond = threading.Condition()
+        self._paused = 0
+        self._stopped = False
+        self.done = 0
+        self.failed = 0
+        self.fetched = 0       # 实际联网下载的项目数 (其余为缓存命中)
+        self.finished = threading.Event()
+        self._thread = None
+
+    # ================= 前台让行 =================
+
+    def pause(self):
+        """前台任务开始: 预取做完当前项后暂停 (可嵌套)"""
+        with self._cond:
+            self._paused += 1
+
+    def resume(self):
+        with self._cond:
+            self._paused = max(0, self._paused - 1)
+            self._cond.notify_all()
+
+    def stop(self):
+        with self._cond:
+            self._stopped = True
+            self._cond.notify_all()
+
+    def _wait_turn(self):
+        """前台有任务时等待；返回 False 表示已停止"""
+        with self._cond:
+            if self._paused and not self._stopped:
+                self.on_status(f"预取已暂停 (前台分析中)，已完成 {self.done} 项")
+            while self._paused and not self._stopped:
+                self._cond.wait()
+            return not self._stopped
+
+    # ================= 任务 =================
+
+    def tasks(self):
+        """[(说明, 调用), ...]；指数与历史依赖证券主表，按需生成"""
+        yield "证券主表", ensure_fresh
+        yield "交易日历", fetch_trade_calendar
+        rules = {}
+        for code in self.codes:
+            try:
+                rules[code] = get_market_rules(code)[0]
+            except Exception:
+                continue
+        for index_code in sorted(set(rules.values())):
+            yield f"指数 {index_code}", lambda c=index_code: fetch_index_daily(c)
+        for code in rules:
+            yield f"日线 {code}", lambda c=code: fetch_stock_daily(c, self.target_date, log=_quiet)
+
+    def run(self):
+        start = time.time()
+        for label, fn in self.tasks():
+            if not self._wait_turn():
+                break
+            self.on_status(f"预取 {self.done + 1}: {label}")
+            fetches = data_store().fetches
+            try:
+                value = fn()
+                if value is None or (hasattr(value, "__len__") and len(value) == 0):
+                    self.failed += 1
+            except Exception:
+                self.failed += 1
+            self.done += 1
+            if data_store().fetches > fetches:
+                self.fetched += 1
+                time.sleep(self.delay)
+        if not self._stopped:
+            failed = f"，失败 {self.failed} 项" if self.failed else ""
+            self.on_status(f"预取完成: {self.done} 项 (联网 {self.fetched} 项{failed})，用时 {time.time() - start:.1f}s")
+        self.finished.set()
+
+    def start(self):
+        self._thread = threading.Thread(target=self.run, daemon=True)
+        self._thread.start()
+        return self
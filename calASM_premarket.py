@@ -0,0 +1,188 @@
+"""
+盘前触线价格表
+
+T+1 的触线价格只取决于基准日收盘与指数点位，开盘前就已确定。盘前把全部股票的
+    - 最新收盘 / 指数点位
+    - 10日、30日规则下 T+1..T+N 的基准日收盘、基准日指数点位、触线价格 (指数不变假设)
+算好存成一个紧凑的 npz 文件；盘中 GUI / 命令行启动时载入，
+"股价到 X 离触线还有多远" 纯查表计算，不再下载任何历史数据。
+盘中若给出指数实时点位，会用基准点位重新折算触线价格。
+
+用法:
+    python calASM_premarket.py build --codes 600372,002149 --horizon 5
+    python calASM_premarket.py query 600372 25.80 [--index 3350.5] [--k 1]
+"""
+import argparse
+import glob
+import os
+from datetime import datetime
+
+import numpy as np
+
+from calASM_cache import CACHE_DIR
+from calASM_numeric import cum_deviation_array, round_half_up_array
+from calASM_symbols import parse_codes
+
+DEFAULT_RULES = ((10, 100.0), (30, 200.0))
+TABLE_DIR = os.path.join(CACHE_DIR, "premarket")
+
+
+def build_table(panel, rules=DEFAULT_RULES, horizon=3, at=None):
+    """
+    由 MarketPanel 第 at 列 (默认最后一个交易日) 的收盘生成触线价格表 (dict of numpy arrays)
+    盘中面板最后一列是实时价，应传 at=-2 用昨收建表，T+1 即为今日
+    """
+    n = len(panel.codes)
+    t = panel.shape[1] - 1 if at is None else at % panel.shape[1]
+    table = {
+        "date": np.array(str(panel.dates[t])),
+        "codes": np.array(panel.codes, dtype=str),
+        "names": np.array(panel.names, dtype=str),
+        "index_codes": np.array(panel.index_codes, dtype=str),
+        "limit_ratio": panel.limit_ratio,
+        "close": panel.close_ffill[:, t],
+        "index_close": panel.index_close[:, t],
+        "rules": np.array(rules, dtype=np.float64).reshape(-1, 2),
+    }
+    shape = (len(rules), n, horizon)
+    base_price, index_base, trigger = np.full(shape, np.nan), np.full(shape, np.nan), np.full(shape, np.nan)
+    for r, (days, threshold) in enumerate(rules):
+        res = panel.predict(days, threshold, horizon, at=t)
+        base_price[r], index_base[r], trigger[r] = res["base_price"], res["index_base"], res["trigger_price"]
+    table["base_price"] = base_price
+    table["index_base"] = index_base
+    table["trigger_price"] = trigger
+    return table
+
+
+def save_table(table, path=None):
+    """保存为 cache/premarket/trigger_日期.npz，返回路径"""
+    if path is None:
+        os.makedirs(TABLE_DIR, exist_ok=True)
+        path = os.path.join(TABLE_DIR, f"trigger_{table['date']}.npz")
+    tmp = f"{path}.{os.getpid()}.tmp.npz"
+    np.savez_compressed(tmp, **table)
+    os.replace(tmp, path)
+    return path
+
+
+def latest_table_path(directory=TABLE_DIR):
+    paths = sorted(glob.glob(os.path.join(directory, "trigger_*.npz")))
+    return paths[-1] if paths else None
+
+
+class TriggerTable:
+    """载入后的触线价格表，按代码查询"""
+
+    def __init__(self, table):
+        self.date = str(table["date"])
+        self.codes = [str(c) for c in table["codes"]]
+        self.names = [str(c) for c in table["names"]]
+        self.index_codes = [str(c) for c in table["index_codes"]]
+        self.limit_ratio = np.asarray(table["limit_ratio"], dtype=np.float64)
+        self.close = np.asarray(table["close"], dtype=np.float64)
+        self.index_close = np.asarray(table["index_close"], dtype=np.float64)
+        self.rules = [(int(d), float(t)) for d, t in table["rules"]]
+        self.base_price = np.asarray(table["base_price"], dtype=np.float64)
+        self.index_base = np.asarray(table["index_base"], dtype=np.float64)
+        self.trigger_price = np.asarray(table["trigger_price"], dtype=np.float64)
+        self.horizon = self.trigger_price.shape[2]
+        self.row = {c: i for i, c in enumerate(self.codes)}
+
+    @classmethod
+    def load(cls, path=None):
+        """载入指定文件或最新的表；没有则返回 None"""
+        path = path or latest_table_path()
+        if not path or not os.path.exists(path):
+            return None
+        with np.load(path, allow_pickle=False) as data:
+            return cls({k: data[k] for k in data.files})
+
+    def __contains__(self, code):
+        return code in self.row
+
+    def evaluate(self, prices, index_levels=None, k=1, rows=None):
+        """
+        向量化: 股价 prices (与 rows 对齐，默认全部股票) 在 T+k 日收盘时的状态
+        index_levels 为对应的指数点位，缺省按指数不变 (最新收盘点位)
+        返回 {规则: dict(deviation, trigger_price, room_pct, triggered)}
+        """
+        rows = np.arange(len(self.codes)) if rows is None else np.asarray(rows)
+        prices = np.asarray(prices, dtype=np.float64)
+        levels = self.index_close[rows] if index_levels is None else np.asarray(index_levels, dtype=np.float64)
+        out = {}
+        for r, (days, threshold) in enumerate(self.rules):
+            p_base = self.base_price[r, rows, k - 1]
+            i_base = self.index_base[r, rows, k - 1]
+            _, index_cum, deviation = cum_deviation_array(prices, p_base, levels, i_base)
+            with np.errstate(invalid='ignore', divide='ignore'):
+                if index_levels is None:
+                    trigger = self.trigger_price[r, rows, k - 1]
+                else:
+                    trigger = round_half_up_array(p_base * (1 + (threshold + index_cum) / 100))
+                room = (trigger / prices - 1) * 100
+            out[(days, threshold)] = {
+                "deviation": deviation,
+                "trigger_price": trigger,
+                "room_pct": room,
+                "triggered": np.abs(deviation) >= threshold,
+            }
+        return out
+
+    def distance(self, code, price, index_level=None, k=1):
+        """单只股票: 股价为 price 时距离各规则触线的状态 {规则: dict of float}"""
+        res = self.evaluate([price], None if index_level is None else [index_level], k, rows=[self.row[code]])
+        return {rule: {key: v[0].item() for key, v in r.items()} for rule, r in res.items()}
+
+    def describe(self, code, price, index_level=None, k=1):
+        """查询结果的文字描述 (日志行列表)"""
+        i = self.row[code]
+        lines = [f"{self.names[i]}({code}) 价格 {price:.2f} @T+{k} (基于 {self.date} 收盘表)"]
+        for (days, threshold), r in self.distance(code, price, index_level, k).items():
+            if np.isnan(r["trigger_price"]):
+                lines.append(f"   {days}日({threshold:.0f}%): 数据不足")
+                continue
+            state = "已触发" if r["triggered"] else f"距触线 {r['room_pct']:.2f}%"
+            lines.append(f"   {days}日({threshold:.0f}%): 偏离 {r['deviation']:.2f}% | "
+                         f"触线价 {r['trigger_price']:.2f} | {state}")
+        return lines
+
+
+def main():
+    parser = argparse.ArgumentParser(description="盘前触线价格表")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+    b = sub.add_parser("build", help="拉取行情并生成触线价格表")
+    b.add_argument("--codes", required=True, help="股票代码，逗号分隔")
+    b.add_argument("--horizon", type=int, default=3)
+    q = sub.add_parser("query", help="查询股价到 X 时离触线多远")
+    q.add_argument("code")
+    q.add_argument("price", type=float)
+    q.add_argument("--index", type=float, default=None, help="指数实时点位，缺省按指数不变")
+    q.add_argument("--k", type=int, default=1, help="T+k，默认 T+1 (即今日)")
+    q.add_argument("--table", default=None)
+    args = parser.parse_args()
+
+    if args.cmd == "build":
+        from calASM_backtest import load_panel
+        codes = parse_codes(args.codes)
+        start = datetime.now().strftime("%Y%m%d")
+        panel = load_panel(codes, start)
+        if panel is None:
+            print("没有可用数据")
+            return
+        print(f"已保存: {save_table(build_table(panel, horizon=args.horizon))}")
+        return
+
+    table = TriggerTable.load(args.table)
+    if table is None:
+        print("没有找到触线价格表，请先运行 build")
+        return
+    if args.code not in table:
+        print(f"{args.code} 不在 {table.date} 的触线价格表中")
+        return
+    for line in table.describe(args.code, args.price, args.index, args.k):
+        print(line)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,417 @@
+"""
+盘中全市场快照记录与回溯查询
+
+交易时段内每隔 N 分钟拉一次全市场快照 (stock_zh_a_spot_em)，按天存档到 cache/intraday/日期/:
+    - universe.npz        当天出现过的代码与名称 (只追加，列下标全天不变)
+    - HHMMSS.npz          一次快照 = 一个列式分区 (现价/最高/最低/今开/昨收 为整数分，成交量/成交额为整数)
+分区分两种:
+    - 关键帧: 存完整数值，每 KEYFRAME_EVERY 次快照一个 (记录进程重启后的第一次也是关键帧)
+    - 增量帧: 只存与上一次快照的差值，绝大多数为 0 或很小，按取值范围压到 int8/int16 后再压缩
+一整天 (5 分钟一次，约 50 个分区) 通常只有几 MB。
+
+按时间回溯只读需要的分区: 从目标时刻之前最近的关键帧开始累加增量，不读整天数据。
+    - 截至 10:30 最高价为 X 的股票
+    - 某只股票在 14:00 的价格
+    - 某时间段内的逐次快照
+
+用法:
+    python calASM_recorder.py record --interval 5
+    python calASM_recorder.py high 12.34 --time 10:30 [--date 20250101]
+    python calASM_recorder.py price 600372 --time 14:00
+    python calASM_recorder.py info
+"""
+import argparse
+import glob
+import os
+import threading
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+
+from calASM_cache import CACHE_DIR, FileLock
+from calASM_data import fetch_spot_snapshot
+from calASM_numeric import to_cents_array
+
+ARCHIVE_DIR = os.path.join(CACHE_DIR, "intraday")
+DEFAULT_INTERVAL = 5      # 分钟
+KEYFRAME_EVERY = 6
+
+# (字段, 快照列名, 是否为价格)
+COLUMNS = (
+    ("price", "最新价", True),
+    ("high", "最高", True),
+    ("low", "最低", True),
+    ("open", "今开", True),
+    ("prev_close", "昨收", True),
+    ("volume", "成交量", False),
+    ("amount", "成交额", False),
+)
+
+# 记录时段 (含集合竞价后与收盘后各一次)
+SESSIONS = (("09:25", "11:31"), ("12:59", "15:01"))
+
+
+def in_session(now=None):
+    now = now or datetime.now()
+    if now.weekday() >= 5:
+        return False
+    hm = now.strftime("%H:%M")
+    return any(start <= hm <= end for start, end in SESSIONS)
+
+
+def parse_time(text):
+    """'10:30' / '1030' / '10:30:15' -> 'HHMMSS'"""
+    digits = str(text).replace(":", "").strip()
+    if not digits.isdigit() or len(digits) not in (3, 4, 5, 6):
+        raise ValueError(f"无法识别的时间: {text}")
+    digits = digits.zfill(4) if len(digits) <= 4 else digits.zfill(6)
+    return (digits + "00")[:6]
+
+
+def _compact(arr):
+    """整数数组压到能容纳取值范围的最小类型，压缩后更小"""
+    if arr.size == 0:
+        return arr.astype(np.int8)
+    lo, hi = int(arr.min()), int(arr.max())
+    for dtype in (np.int8, np.int16, np.int32):
+        info = np.iinfo(dtype)
+        if info.min <= lo and hi <= info.max:
+            return arr.astype(dtype)
+    return arr.astype(np.int64)
+
+
+def snapshot_columns(snapshot):
+    """快照 DataFrame -> (代码, 名称, {字段: int64 数组})；缺失值 (停牌 '-') 记为 0"""
+    codes = snapshot['代码'].astype(str).str.zfill(6).to_numpy()
+    names = snapshot['名称'].astype(str).to_numpy() if '名称' in snapshot else codes
+    values = {}
+    for field, col, is_price in COLUMNS:
+        if col not in snapshot:
+            values[field] = np.zeros(len(codes), dtype=np.int64)
+            continue
+        raw = pd.to_numeric(snapshot[col], errors='coerce').to_numpy(dtype=np.float64)
+        missing = np.isnan(raw)
+        raw = np.where(missing, 0.0, raw)
+        values[field] = np.where(missing, 0, to_cents_array(raw) if is_price else np.rint(raw).astype(np.int64))
+    return codes, names, values
+
+
+class SnapshotRecorder:
+    """把快照追加为当天的关键帧 / 增量帧分区；同一天同一目录只应有一个记录进程"""
+
+    def __init__(self, directory=ARCHIVE_DIR, keyframe_every=KEYFRAME_EVERY):
+        self.directory = directory
+        self.keyframe_every = keyframe_every
+        self._date = None
+        self._reset()
+
+    def _reset(self):
+        self._codes = []
+        self._names = []
+        self._index = {}
+        self._prev = None
+        self._since_key = 0
+
+    def _start_day(self, date):
+        """换日或首次记录: 沿用已有的 universe，保证列下标与之前的分区一致"""
+        self._date = date
+        self._reset()
+        path = os.path.join(self.directory, date, "universe.npz")
+        if os.path.exists(path):
+            with np.load(path) as z:
+                self._codes = [str(c) for c in z["codes"]]
+                self._names = [str(c) for c in z["names"]]
+            self._index = {c: i for i, c in enumerate(self._codes)}
+
+    def capture(self, snapshot=None, now=None):
+        """记录一次快照 (默认联网拉取)，返回分区路径；拉取失败返回 None"""
+        now = now or datetime.now()
+        if snapshot is None:
+            snapshot = fetch_spot_snapshot()
+            if snapshot is None:
+                return None
+        date = now.strftime("%Y%m%d")
+        if date != self._date:
+            self._start_day(date)
+        day_dir = os.path.join(self.directory, date)
+        os.makedirs(day_dir, exist_ok=True)
+
+        codes, names, values = snapshot_columns(snapshot)
+        grown = False
+        for code, name in zip(codes, names):
+            if code not in self._index:
+                self._index[code] = len(self._codes)
+                self._codes.append(code)
+                self._names.append(name)
+                grown = True
+        if grown:
+            self._save(os.path.join(day_dir, "universe.npz"),
+                       codes=np.array(self._codes, dtype=str), names=np.array(self._names, dtype=str))
+
+        n = len(self._codes)
+        cols = np.fromiter((self._index[c] for c in codes), dtype=np.int64, count=len(codes))
+        state = {}
+        for field, _, _ in COLUMNS:
+            full = np.zeros(n, dtype=np.int64)
+            full[cols] = values[field]
+            state[field] = full
+
+        key = self._prev is None or self._since_key + 1 >= self.keyframe_every
+        parts = {"key": np.array(key), "n": np.array(n)}
+        for field, full in state.items():
+            if key:
+                parts[field] = _compact(full)
+            else:
+                prev = np.zeros(n, dtype=np.int64)
+                prev[:len(self._prev[field])] = self._prev[field]
+                parts[field] = _compact(full - prev)
+        path = os.path.join(day_dir, f"{now.strftime('%H%M%S')}.npz")
+        self._save(path, **parts)
+        self._prev = state
+        self._since_key = 0 if key else self._since_key + 1
+        return path
+
+    def _save(self, path, **arrays):
+        tmp = f"{path}.{os.getpid()}.tmp.npz"
+        np.savez_compressed(tmp, **arrays)
+        os.replace(tmp, path)
+
+
+class RecorderThread(threading.Thread):
+    """交易时段内按整 interval 分钟对齐记录快照；on_capture(path) / on_error(e) 回调"""
+
+    def __init__(self, recorder=None, interval=DEFAULT_INTERVAL, on_capture=None, on_error=None):
+        super().__init__(daemon=True)
+        self.recorder = recorder or SnapshotRecorder()
+        self.interval = interval
+        self.on_capture = on_capture
+        self.on_error = on_error
+        self._stop_event = threading.Event()
+
+    def stop(self):
+        self._stop_event.set()
+
+    def _next_tick(self, now):
+        step = self.interval * 60
+        start = now.replace(hour=0, minute=0, second=0, microsecond=0)
+        elapsed = (now - start).total_seconds()
+        return start + timedelta(seconds=(int(elapsed // step) + 1) * step)
+
+    def run(self):
+        # 同一目录只允许一个记录进程，否则两条增量链会互相覆盖
+        lock = FileLock(os.path.join(self.recorder.directory, "recorder.lock"), timeout=0)
+        try:
+            lock.__enter__()
+        except TimeoutError as e:
+            if self.on_error:
+                self.on_error(RuntimeError(f"已有记录进程在运行: {e}"))
+            return
+        try:
+            while not self._stop_event.is_set():
+                if in_session():
+                    try:
+                        path = self.recorder.capture()
+                        if path is None:
+                            raise RuntimeError("实时快照获取失败")
+                        if self.on_capture:
+                            self.on_capture(path)
+                    except Exception as e:
+                        if self.on_error:
+                            self.on_error(e)
+                wait = (self._next_tick(datetime.now()) - datetime.now()).total_seconds()
+                self._stop_event.wait(max(1.0, wait))
+        finally:
+            lock.__exit__(None, None, None)
+
+
+class IntradayArchive:
+    """某一天的快照存档，按时间回溯"""
+
+    def __init__(self, date=None, directory=ARCHIVE_DIR):
+        self.date = date or datetime.now().strftime("%Y%m%d")
+        self.day_dir = os.path.join(directory, self.date)
+        path = os.path.join(self.day_dir, "universe.npz")
+        if os.path.exists(path):
+            with np.load(path) as z:
+                self.codes = np.array([str(c) for c in z["codes"]])
+                self.names = np.array([str(c) for c in z["names"]])
+        else:
+            self.codes = np.array([], dtype=str)
+            self.names = np.array([], dtype=str)
+        self._col = {c: i for i, c in enumerate(self.codes)}
+
+    @classmethod
+    def dates(cls, directory=ARCHIVE_DIR):
+        return sorted(os.path.basename(os.path.dirname(p))
+                      for p in glob.glob(os.path.join(directory, "*", "universe.npz")))
+
+    def times(self):
+        """已记录的快照时刻 ['HHMMSS', ...]"""
+        names = (os.path.basename(p)[:-4] for p in glob.glob(os.path.join(self.day_dir, "*.npz")))
+        return sorted(t for t in names if t.isdigit() and len(t) == 6)
+
+    def __len__(self):
+        return len(self.times())
+
+    def _read(self, t):
+        with np.load(os.path.join(self.day_dir, f"{t}.npz")) as z:
+            return {k: z[k] for k in z.files}
+
+    def _is_key(self, t):
+        # npz 按成员延迟读取，这里只解压 key 标记
+        with np.load(os.path.join(self.day_dir, f"{t}.npz")) as z:
+            return bool(z["key"])
+
+    def frames(self, start=None, end=None):
+        """
+        逐次产出 (时刻, {字段: int64 数组})，只含 [start, end] 内的快照
+        从 start 之前最近的关键帧开始读，之前的分区不读
+        """
+        times = self.times()
+        start = parse_time(start) if start is not None else None
+        end = parse_time(end) if end is not None else None
+        if end is not None:
+            times = [t for t in times if t <= end]
+        if not times:
+            return
+        first = 0
+        if start is not None:
+            before = [i for i, t in enumerate(times) if t <= start]
+            first = before[-1] if before else 0
+        # 向前找最近的关键帧
+        begin = first
+        while begin > 0 and not self._is_key(times[begin]):
+            begin -= 1
+        n = len(self.codes)
+        state = None
+        for t in times[begin:]:
+            part = self._read(t)
+            if bool(part["key"]) or state is None:
+                state = {}
+                for field, _, _ in COLUMNS:
+                    state[field] = np.zeros(n, dtype=np.int64)
+                    state[field][:int(part["n"])] = part[field]
+            else:
+                for field, _, _ in COLUMNS:
+                    state[field][:int(part["n"])] += part[field]
+            if start is None or t >= start or t == times[first]:
+                yield t, {k: v.copy() for k, v in state.items()}
+
+    def load(self, start=None, end=None):
+        """时间段内的快照堆叠为 (时刻列表, {字段: (快照数, 股票数) 数组})"""
+        times, stacks = [], {field: [] for field, _, _ in COLUMNS}
+        for t, state in self.frames(start, end):
+            times.append(t)
+            for field, values in state.items():
+                stacks[field].append(values)
+        n = len(self.codes)
+        return times, {f: np.vstack(v) if v else np.zeros((0, n), dtype=np.int64) for f, v in stacks.items()}
+
+    def state_at(self, t):
+        """t 时刻 (含) 之前最后一次快照: (时刻, {字段: 数组})，没有返回 (None, None)"""
+        last = (None, None)
+        end = parse_time(t)
+        for item in self.frames(end, end):
+            last = item
+        return last
+
+    def as_of(self, t):
+        """t 时刻之前最后一次快照，还原为与 stock_zh_a_spot_em 同名列的 DataFrame；没有返回 None"""
+        at, state = self.state_at(t)
+        if state is None:
+            return None
+        quoted = state["price"] > 0
+        data = {"代码": self.codes, "名称": self.names}
+        for field, col, is_price in COLUMNS:
+            values = state[field].astype(np.float64)
+            data[col] = np.where(state[field] > 0, values / 100, np.nan) if is_price else values
+        df = pd.DataFrame(data)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            pct = (state["price"] - state["prev_close"]) * 100 / state["prev_close"]
+        df['涨跌幅'] = np.where(quoted & (state["prev_close"] > 0), np.round(pct, 2), np.nan)
+        df.attrs["time"] = f"{at[:2]}:{at[2:4]}:{at[4:]}"
+        return df
+
+    def price_at(self, code, t, field="price"):
+        """某只股票 t 时刻的价格 (元)；没有记录返回 None"""
+        j = self._col.get(code)
+        _, state = self.state_at(t)
+        if j is None or state is None or state[field][j] <= 0:
+            return None
+        return state[field][j] / 100
+
+    def series(self, code, start=None, end=None):
+        """某只股票在时间段内的逐次快照 DataFrame[时间, 最新价, 最高, ...]"""
+        j = self._col.get(code)
+        times, stacks = self.load(start, end)
+        if j is None or not times:
+            return pd.DataFrame(columns=["时间"] + [col for _, col, _ in COLUMNS])
+        data = {"时间": [f"{t[:2]}:{t[2:4]}:{t[4:]}" for t in times]}
+        for field, col, is_price in COLUMNS:
+            v = stacks[field][:, j].astype(np.float64)
+            data[col] = np.where(v > 0, v / 100, np.nan) if is_price else v
+        return pd.DataFrame(data)
+
+    def size_bytes(self):
+        return sum(os.path.getsize(p) for p in glob.glob(os.path.join(self.day_dir, "*.npz")))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="盘中全市场快照记录与回溯查询")
+    parser.add_argument("--date", default=None, help="查询日期 YYYYMMDD，默认今天")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+    r = sub.add_parser("record", help="交易时段内定时记录快照")
+    r.add_argument("--interval", type=int, default=DEFAULT_INTERVAL, help="记录间隔(分钟)")
+    h = sub.add_parser("high", help="截至某时刻最高价为 X 的股票")
+    h.add_argument("price", type=float)
+    h.add_argument("--time", required=True)
+    p = sub.add_parser("price", help="某只股票某时刻的价格")
+    p.add_argument("code")
+    p.add_argument("--time", required=True)
+    sub.add_parser("info", help="存档概况")
+    args = parser.parse_args()
+
+    if args.cmd == "record":
+        thread = RecorderThread(interval=args.interval,
+                                on_capture=lambda path: print(f"[{datetime.now():%H:%M:%S}] 已记录 {path}"),
+                                on_error=lambda e: print(f"[{datetime.now():%H:%M:%S}] 记录失败: {e}"))
+        print(f"每 {args.interval} 分钟记录一次全市场快照，存档目录 {ARCHIVE_DIR}")
+        thread.start()
+        try:
+            while thread.is_alive():
+                thread.join(1.0)
+        except KeyboardInterrupt:
+            thread.stop()
+        return
+
+    from calASM_data import filter_by_high
+    from calASM_symbols import normalize_code
+
+    if args.cmd == "info":
+        for date in IntradayArchive.dates():
+            archive = IntradayArchive(date)
+            times = archive.times()
+            span = f"{times[0]}-{times[-1]}" if times else "-"
+            print(f"{date}: {len(times)} 次快照 ({span})，{len(archive.codes)} 支股票，"
+                  f"{archive.size_bytes() / 1024 / 1024:.1f} MB")
+        return
+
+    archive = IntradayArchive(args.date)
+    if args.cmd == "high":
+        df = archive.as_of(args.time)
+        if df is None:
+            print(f"{archive.date} {args.time} 之前没有快照记录")
+            return
+        result = filter_by_high(df, args.price)
+        print(f"截至 {df.attrs['time']} 最高价为 {args.price} 的股票共 {len(result)} 支")
+        for _, row in result.iterrows():
+            print(f"  {row['代码']} {row['名称']} 现价 {row['最新价']:.2f} 最高 {row['最高']:.2f}")
+    else:
+        code = normalize_code(args.code) or args.code
+        price = archive.price_at(code, args.time)
+        print(f"{code} {archive.date} {args.time}: " + (f"{price:.2f}" if price is not None else "无记录"))
+
+
+if __name__ == "__main__":
+    main()
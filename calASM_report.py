@@ -0,0 +1,161 @@
+"""
+单文件 HTML 报告: 替代逐只股票的 300dpi PNG，用于分享分析结果
+
+    - 总览表 (10日 / 30日 / 综合) 与 plot_summary_overview 的列结构一致
+    - 每只股票的明细表放在可折叠的 <details> 中
+    - 配色规则与图片一致: 已触发红底、允许涨幅 <10% 红 / <20% 橙 / <30% 蓝、连板数 >0 蓝
+
+输入就是 period_summary 生成的 PeriodSummary 和 period_result 生成的 PeriodResult，
+文字在这里格式化，配色直接取数值与触发标志；不依赖 matplotlib，样式内联，生成的文件可以直接发给别人打开。
+"""
+import html
+import os
+from datetime import datetime
+
+from calASM_period import overview_columns
+
+REPORT_DIR = "reports"
+
+_CSS = """
+body { font-family: "Microsoft YaHei", "PingFang SC", sans-serif; margin: 24px; color: #222; }
+h1 { font-size: 22px; }
+h2 { font-size: 18px; margin-top: 28px; }
+table { border-collapse: collapse; margin: 8px 0 16px; font-size: 14px; }
+th, td { border: 1px solid #ddd; padding: 4px 10px; text-align: center; white-space: nowrap; }
+thead th { background: #2c3e50; color: #fff; }
+table.detail thead th { background: #40466e; }
+tbody tr:nth-child(even) td { background-color: #f4f4f4; }
+td.day-odd { background-color: #d4e6f1; }
+tbody tr:nth-child(even) td.day-odd { background-color: #c2dfee; }
+td.name { font-weight: bold; }
+td.hit, tbody tr:nth-child(even) td.hit { background-color: #c0392b; color: #fff; font-weight: bold; }
+td.hit-text, tbody tr:nth-child(even) td.hit-text { background-color: #ffeeee; color: red; font-weight: bold; }
+.lt10 { color: red; font-weight: bold; }
+.lt20 { color: #e67e22; font-weight: bold; }
+.lt30 { color: #2980b9; font-weight: bold; }
+.board { color: #2980b9; font-weight: bold; }
+.t-pred { color: #d62728; font-weight: bold; }
+.t-today { color: #2ca02c; font-weight: bold; }
+.t-hist { color: #7f7f7f; }
+details { margin: 6px 0; }
+summary { cursor: pointer; font-weight: bold; }
+.note { color: #555; font-size: 13px; }
+"""
+
+NOTE = "备注: 未来允许最大涨幅基于 [假设当日股价不变(0%)且指数不变(0%)] 推算得出，仅供参考。"
+
+
+def _space_class(val, triggered=False):
+    """允许涨幅单元格的样式类"""
+    if triggered:
+        return "hit"
+    if val < 10.0:
+        return "lt10"
+    if val < 20.0:
+        return "lt20"
+    if val < 30.0:
+        return "lt30"
+    return ""
+
+
+def _board_class(val):
+    return "board" if val > 0 else ""
+
+
+def _cell(value, cls="", tag="td"):
+    attr = f' class="{cls}"' if cls else ""
+    return f"<{tag}{attr}>{html.escape(str(value))}</{tag}>"
+
+
+def overview_table(title, summary_data, show_boards=True):
+    """PeriodSummary 列表 -> 总览表 HTML 片段"""
+    if not summary_data:
+        return ""
+    # 预测天数较多时只列代表性的日子 (与图片、日志一致)，逐日数据在个股明细中
+    columns = overview_columns(summary_data[0])
+
+    head = [_cell("名称", tag="th"), _cell("现价", tag="th")]
+    for _, d in columns:
+        head.append(_cell(f"{d} 触线价", tag="th"))
+        head.append(_cell(f"{d} 允许涨幅", tag="th"))
+        if show_boards:
+            head.append(_cell(f"{d} 连板", tag="th"))
+
+    body = []
+    for item in summary_data:
+        cells = [_cell(item.name, "name"), _cell(f"{item.price:.2f}")]
+        for n, (i, _) in enumerate(columns, 1):
+            day_cls = "day-odd" if n % 2 == 1 else ""
+            trigger, space, board = item.cells(i)
+            space_cls = _space_class(item.space[i], item.triggered[i]) if item.has(i) else ""
+            board_cls = _board_class(item.boards[i]) if item.has(i) else ""
+            cells.append(_cell(trigger, day_cls))
+            cells.append(_cell(space, " ".join(c for c in (day_cls, space_cls) if c)))
+            if show_boards:
+                cells.append(_cell(board, " ".join(c for c in (day_cls, board_cls) if c)))
+        body.append("<tr>" + "".join(cells) + "</tr>")
+
+    return (f"<h2>{html.escape(title)}</h2>\n"
+            '<table class="overview">'
+            f"<thead><tr>{''.join(head)}</tr></thead>"
+            f"<tbody>{''.join(body)}</tbody></table>\n")
+
+
+def detail_table(res):
+    """PeriodResult -> 明细表 HTML 片段"""
+    if res is None or not len(res):
+        return ""
+    df = res.to_frame()
+    columns = list(df.columns)
+    head = "".join(_cell(c, tag="th") for c in columns)
+    kind_cls = {"预测": "t-pred", "今日": "t-today", "历史": "t-hist"}
+    body = []
+    for r, (values, kind) in enumerate(zip(df.itertuples(index=False), res.kinds)):
+        classes = {
+            "类型": kind_cls[kind],
+            "剩余空间": "hit-text" if res.triggered[r] else "",
+            "允许涨幅": _space_class(res.room_pct[r]),
+            "允许连板": _board_class(res.boards[r]),
+        }
+        cells = [_cell(value, classes.get(col, "")) for col, value in zip(columns, values)]
+        body.append("<tr>" + "".join(cells) + "</tr>")
+    return f'<table class="detail"><thead><tr>{head}</tr></thead><tbody>{"".join(body)}</tbody></table>\n'
+
+
+def render_report(title, overviews, details=(), note=NOTE):
+    """
+    overviews: [(标题, summary_data, show_boards), ...]
+    details: [(名称, 代码, 最后K线日期, res_10, res_30), ...] (PeriodResult)
+    返回完整 HTML 文本
+    """
+    parts = [
+        "<!DOCTYPE html>\n<html lang=\"zh-CN\"><head><meta charset=\"utf-8\">",
+        f"<title>{html.escape(title)}</title><style>{_CSS}</style></head><body>\n",
+        f"<h1>{html.escape(title)}</h1>\n",
+        f'<p class="note">生成时间: {datetime.now().strftime("%Y-%m-%d %H:%M:%S")}</p>\n',
+    ]
+    for ov_title, summary_data, show_boards in overviews:
+        parts.append(overview_table(ov_title, summary_data, show_boards))
+    parts.append(f'<p class="note">{html.escape(note)}</p>\n')
+
+    if details:
+        parts.append("<h2>个股明细</h2>\n")
+        for name, code, last_date, res_10, res_30 in details:
+            parts.append(f"<details><summary>{html.escape(f'{name}({code}) 异动分析({last_date})')}</summary>\n")
+            # 预测天数较多时只列代表性的日子，报告大小不随预测天数增长
+            parts.append("<h3>10日(100%)</h3>\n" + detail_table(res_10.condensed()))
+            parts.append("<h3>30日(200%)</h3>\n" + detail_table(res_30.condensed()))
+            parts.append("</details>\n")
+
+    parts.append("</body></html>\n")
+    return "".join(parts)
+
+
+def write_report(title, overviews, details=(), path=None):
+    """写出 HTML 报告，返回文件路径；path 为空时写到 reports/异动分析_日期_时分.html"""
+    if path is None:
+        os.makedirs(REPORT_DIR, exist_ok=True)
+        path = os.path.join(REPORT_DIR, f"异动分析_{datetime.now().strftime('%Y%m%d_%H%M')}.html")
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(render_report(title, overviews, details))
+    return path
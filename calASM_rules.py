@@ -0,0 +1,193 @@
+"""
+异动规则注册表与单遍滚动引擎
+
+每条规则声明: 窗口天数、阈值、方向、计算口径、适用板块。
+    method = "cum" : 区间累计涨幅偏离 = (P_t / P_{t-w} - 1) - (I_t / I_{t-w} - 1)   (10日100%、30日200% 等)
+    method = "sum" : 日收盘涨跌幅偏离值累计 = Σ (个股日涨幅 - 指数日涨幅)          (3日20% 等)
+    direction      : "up" (偏离 >= 阈值)、"down" (偏离 <= 阈值，阈值为负)、"both" (|偏离| >= 阈值)
+
+引擎对同一只股票只计算一次日涨幅偏离前缀和与各窗口的涨幅比，所有规则共享，
+新增规则几乎不增加开销。区间偏离用与逐日明细相同的精确运算 (calASM_numeric.cum_deviation_array)，
+10日/30日明细表 (calASM_period.period_result) 的历史行直接取引擎结果，两边不会出现分歧。
+"""
+from collections import namedtuple
+
+import numpy as np
+
+from calASM_numeric import cum_deviation, cum_deviation_array, round_half_up
+
+BOARD_SH_MAIN = "沪主板"
+BOARD_SZ_MAIN = "深主板"
+BOARD_CHINEXT = "创业板"
+BOARD_STAR = "科创板"
+BOARD_BSE = "北交所"
+ALL_BOARDS = (BOARD_SH_MAIN, BOARD_SZ_MAIN, BOARD_CHINEXT, BOARD_STAR, BOARD_BSE)
+MAIN_BOARDS = (BOARD_SH_MAIN, BOARD_SZ_MAIN)
+
+AnomalyRule = namedtuple("AnomalyRule", "name days threshold direction method boards")
+
+RULES = []
+
+
+def register_rule(name, days, threshold, direction="up", method="cum", boards=ALL_BOARDS):
+    """注册一条异动规则，返回规则对象；同名规则会被替换"""
+    if direction not in ("up", "down", "both"):
+        raise ValueError(f"未知方向: {direction}")
+    if method not in ("cum", "sum"):
+        raise ValueError(f"未知口径: {method}")
+    rule = AnomalyRule(name, int(days), float(threshold), direction, method, tuple(boards))
+    RULES[:] = [r for r in RULES if r.name != name]
+    RULES.append(rule)
+    return rule
+
+
+def get_board(stock_code):
+    """按代码前缀判断板块"""
+    if stock_code.startswith(("688", "689")):
+        return BOARD_STAR
+    if stock_code.startswith("60"):
+        return BOARD_SH_MAIN
+    if stock_code.startswith("30"):
+        return BOARD_CHINEXT
+    if stock_code.startswith("00"):
+        return BOARD_SZ_MAIN
+    if stock_code.startswith(("8", "92", "4")):
+        return BOARD_BSE
+    return BOARD_SH_MAIN
+
+
+# 各板块的基准指数与涨跌幅限制 (非 ST)
+BOARD_INDEX = {
+    # 上证A股: akshare 使用 sh000002
+    BOARD_SH_MAIN: ("sh000002", "上证A股"),
+    BOARD_SZ_MAIN: ("sz399107", "深证A股"),
+    BOARD_CHINEXT: ("sz399102", "创业板综"),
+    BOARD_STAR: ("sh000688", "科创50"),
+    # 北证50: akshare 部分接口支持 sz899050，如接口报错需要后续维护
+    BOARD_BSE: ("sz899050", "北证50"),
+}
+BOARD_LIMIT = {
+    BOARD_SH_MAIN: 1.10,
+    BOARD_SZ_MAIN: 1.10,
+    BOARD_CHINEXT: 1.20,
+    BOARD_STAR: 1.20,
+    BOARD_BSE: 1.30,
+}
+# 新股上市初期不设涨跌幅限制的交易日数 (注册制: 主板、创业板、科创板前 5 日，北交所仅首日)
+NO_LIMIT_DAYS = {
+    BOARD_SH_MAIN: 5,
+    BOARD_SZ_MAIN: 5,
+    BOARD_CHINEXT: 5,
+    BOARD_STAR: 5,
+    BOARD_BSE: 1,
+}
+
+
+def get_market_rules(stock_code):
+    """仅按代码前缀推断 (基准指数代码, 指数名称, 涨跌停比例)；不识别 ST，完整信息见 calASM_security"""
+    board = get_board(stock_code)
+    index_code, index_name = BOARD_INDEX[board]
+    return index_code, index_name, BOARD_LIMIT[board]
+
+
+def get_rules(board=None, rules=None):
+    """取适用于某板块的规则 (board 为 None 时返回全部)"""
+    rules = RULES if rules is None else rules
+    return [r for r in rules if board is None or board in r.boards]
+
+
+# ================= 默认规则 =================
+register_rule("10日严重异动", 10, 100.0, "up")
+register_rule("30日严重异动", 30, 200.0, "up")
+register_rule("10日严重下跌", 10, -50.0, "down")
+register_rule("30日严重下跌", 30, -70.0, "down")
+register_rule("3日异常波动", 3, 20.0, "both", "sum", boards=MAIN_BOARDS)
+register_rule("3日异常波动(20cm)", 3, 30.0, "both", "sum", boards=(BOARD_CHINEXT, BOARD_STAR))
+register_rule("3日异常波动(30cm)", 3, 40.0, "both", "sum", boards=(BOARD_BSE,))
+
+
+def rule_hit(values, rule):
+    """偏离 values 是否触发 rule (按方向)"""
+    with np.errstate(invalid='ignore'):
+        if rule.direction == "up":
+            return values >= rule.threshold
+        if rule.direction == "down":
+            return values <= rule.threshold
+        return np.abs(values) >= abs(rule.threshold)
+
+
+def evaluate_rules(closes, index_closes, rules=None):
+    """
+    对单只股票一次性评估全部规则
+    closes / index_closes: 按交易日对齐的收盘价序列，最后一个为 T 日
+    返回 [{rule, deviation(L,), index_cum(L,), triggered(L,), today: {...}}]，today 为 T 日的偏离、剩余空间与
+    次日(T+1, 假设指数不变)的触线价格；index_cum 为 "cum" 规则窗口内的指数累计涨幅 (其他规则为 nan)
+    """
+    rules = RULES if rules is None else rules
+    p = np.asarray(closes, dtype=np.float64)
+    idx = np.asarray(index_closes, dtype=np.float64)
+    n = len(p)
+
+    # 共享量: 日涨幅偏离前缀和，各窗口涨幅比 (按窗口缓存)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        daily_dev = np.zeros(n)
+        daily_dev[1:] = (p[1:] / p[:-1] - idx[1:] / idx[:-1]) * 100
+    prefix = np.concatenate([[0.0], np.cumsum(np.nan_to_num(daily_dev))])
+    ratio_cache = {}
+
+    def window_ratio(w):
+        if w not in ratio_cache:
+            i = np.full(n, np.nan)
+            dev = np.full(n, np.nan)
+            if n > w:
+                _, i[w:], dev[w:] = cum_deviation_array(p[w:], p[:-w], idx[w:], idx[:-w])
+            ratio_cache[w] = (i, dev)
+        return ratio_cache[w]
+
+    results = []
+    for rule in rules:
+        w = rule.days
+        today = {"deviation": np.nan, "left_space": np.nan, "trigger_price": np.nan}
+        if rule.method == "cum":
+            i_cum, dev = window_ratio(w)
+            if n > w:
+                # T+1 的基准为 T+1-w 日，指数假设不变 (同逐日明细 T+1 行)
+                base = n - w
+                i_next = cum_deviation(p[-1], p[base], idx[-1], idx[base])[1]
+                today["trigger_price"] = p[base] * (1 + (rule.threshold + i_next) / 100)
+        else:
+            i_cum = np.full(n, np.nan)
+            dev = np.full(n, np.nan)
+            if n > w:
+                dev[w:] = prefix[w + 1:] - prefix[1:n - w + 1]
+            if n >= w:
+                # T+1 当日偏离需补足: 阈值 - 最近 w-1 日已累计的偏离
+                carried = prefix[n] - prefix[n - w + 1] if w > 1 else 0.0
+                today["trigger_price"] = p[-1] * (1 + (rule.threshold - carried) / 100)
+        hit = rule_hit(dev, rule)
+        today["deviation"] = dev[-1]
+        if rule.direction == "up":
+            today["left_space"] = rule.threshold - dev[-1]
+        elif rule.direction == "down":
+            today["left_space"] = dev[-1] - rule.threshold
+        else:
+            today["left_space"] = abs(rule.threshold) - abs(dev[-1])
+        today["triggered"] = bool(hit[-1])
+        if np.isfinite(today["trigger_price"]):
+            today["trigger_price"] = round_half_up(float(today["trigger_price"]), 2)
+        results.append({"rule": rule, "deviation": dev, "index_cum": i_cum, "triggered": hit, "today": today})
+    return results
+
+
+def format_rule_status(results):
+    """把 evaluate_rules 的 T 日结果整理为日志文本行"""
+    lines = []
+    for res in results:
+        rule, t = res["rule"], res["today"]
+        if not np.isfinite(t["deviation"]):
+            lines.append(f"   {rule.name}: 数据不足")
+            continue
+        state = "已触发" if t["triggered"] else f"剩余 {t['left_space']:.2f}%"
+        price = f"，次日触线价 {t['trigger_price']:.2f}" if np.isfinite(t["trigger_price"]) else ""
+        lines.append(f"   {rule.name}({rule.threshold:+.0f}%): 偏离 {t['deviation']:.2f}%，{state}{price}")
+    return lines
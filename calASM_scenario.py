@@ -0,0 +1,125 @@
+"""
+情景网格引擎
+
+原有预测假设 T+1..T+N 股价与指数都不变。这里对一组 "指数日涨跌 × 个股日涨跌" 的假设，
+一次性用数组广播计算所有股票、所有情景、所有预测日的:
+    区间偏离 / 剩余空间 / 触线价格 / 允许涨幅 / 允许连板
+
+结果数组形状统一为 (股票数, 指数情景数, 个股情景数, 预测天数)。
+"""
+import numpy as np
+
+from calASM_limitpath import allowed_boards
+from calASM_numeric import round_half_up_array
+
+DEFAULT_MOVES = "-3:3:0.5"
+
+
+def parse_moves(spec):
+    """
+    解析涨跌幅情景 (单位 %)
+        "-3:3:0.5"   -> 起点:终点:步长 (含终点)
+        "-2,0,1.5"   -> 逗号/空格分隔的列表
+    """
+    spec = str(spec).strip()
+    if ':' in spec:
+        parts = [float(x) for x in spec.split(':')]
+        if len(parts) != 3 or parts[2] <= 0:
+            raise ValueError(f"情景格式错误: {spec}")
+        start, stop, step = parts
+        n = int(np.floor((stop - start) / step + 1e-9)) + 1
+        return np.round(start + step * np.arange(max(n, 0)), 6)
+    vals = [float(x) for x in spec.replace(',', ' ').split()]
+    if not vals:
+        raise ValueError(f"情景格式错误: {spec}")
+    return np.array(vals, dtype=np.float64)
+
+
+def stack_tails(series_list, length):
+    """把若干长度不一的序列右对齐截取最后 length 个值，不足的左侧补 nan，返回 (N, length)"""
+    out = np.full((len(series_list), length), np.nan)
+    for i, s in enumerate(series_list):
+        a = np.asarray(s, dtype=np.float64)[-length:]
+        if len(a):
+            out[i, length - len(a):] = a
+    return out
+
+
+def scenario_grid(closes, index_closes, days, threshold, limit_ratio, horizon,
+                  index_moves, stock_moves):
+    """
+    closes / index_closes: (N, L) 个股与其基准指数的收盘价，最后一列为 T 日，L 至少为 days
+    limit_ratio: 标量或 (N,) 各股涨停倍数 (如 1.10)
+    index_moves / stock_moves: 每日涨跌幅情景 (单位 %)
+    返回 dict，各数组形状为 (N, M, S, K)，K = horizon
+    """
+    closes = np.atleast_2d(np.asarray(closes, dtype=np.float64))
+    index_closes = np.atleast_2d(np.asarray(index_closes, dtype=np.float64))
+    n, length = closes.shape
+    cur = length - 1
+    m_r = 1 + np.asarray(index_moves, dtype=np.float64) / 100   # (M,)
+    s_r = 1 + np.asarray(stock_moves, dtype=np.float64) / 100   # (S,)
+    limit = np.broadcast_to(np.asarray(limit_ratio, dtype=np.float64), (n,))
+    k = np.arange(1, horizon + 1)
+
+    # 个股路径: 每日按情景涨跌后四舍五入到分，(N, S, K+1)，第 0 列为 T 日
+    path = np.empty((n, len(s_r), horizon + 1))
+    path[:, :, 0] = closes[:, cur:cur + 1]
+    for step in range(1, horizon + 1):
+        path[:, :, step] = round_half_up_array(path[:, :, step - 1] * s_r)
+    # 指数路径: (N, M, K+1)
+    i_path = index_closes[:, cur, None, None] * m_r[None, :, None] ** np.arange(horizon + 1)
+
+    # 基准日相对 T 的偏移: j = k - days；j <= 0 取历史，j > 0 取情景路径
+    j = k - days
+    hist_pos = np.clip(cur + j, 0, cur)
+    valid = (cur + j) >= 0
+    fut_pos = np.clip(j, 0, horizon)
+    future = j > 0
+
+    p_base = np.where(future[None, None, :], path[:, :, fut_pos],
+                      closes[:, hist_pos][:, None, :])                        # (N, S, K)
+    i_base = np.where(future[None, None, :], i_path[:, :, fut_pos],
+                      index_closes[:, hist_pos][:, None, :])                  # (N, M, K)
+    p_base = np.where(valid, p_base, np.nan)[:, None, :, :]                   # (N, 1, S, K)
+    i_base = np.where(valid, i_base, np.nan)[:, :, None, :]                   # (N, M, 1, K)
+
+    p_end = path[:, None, :, 1:]                                              # (N, 1, S, K)
+    p_prev = path[:, None, :, :-1]
+    i_end = i_path[:, :, None, 1:]                                            # (N, M, 1, K)
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        stock_cum = (p_end / p_base - 1) * 100
+        index_cum = (i_end / i_base - 1) * 100
+        deviation = stock_cum - index_cum                                     # (N, M, S, K)
+        triggered = np.abs(deviation) >= threshold
+        left_space = threshold - deviation
+        trigger_price = round_half_up_array(p_base * (1 + (threshold + index_cum) / 100))
+        room_pct = np.where(p_prev > 0, (trigger_price / p_prev - 1) * 100, 0.0)
+    boards = allowed_boards(p_prev, p_base, index_cum, threshold, limit[:, None, None, None])
+
+    room_pct = np.where(triggered, 0.0, room_pct)
+    boards = np.where(triggered, 0, boards)
+
+    return {
+        "index_moves": np.asarray(index_moves, dtype=np.float64),
+        "stock_moves": np.asarray(stock_moves, dtype=np.float64),
+        "deviation": deviation,
+        "left_space": left_space,
+        "trigger_price": trigger_price,
+        "room_pct": room_pct,
+        "boards": boards,
+        "triggered": triggered,
+    }
+
+
+def scenario_grid_from_frames(frames, days, threshold, horizon, index_moves, stock_moves):
+    """
+    frames: [(merged_df, limit_ratio), ...]，merged_df 含 close / index_close 列 (同 analyze_period_combined)
+    """
+    length = max(days, 1) + 1
+    closes = stack_tails([f['close'].to_numpy() for f, _ in frames], length)
+    index_closes = stack_tails([f['index_close'].to_numpy() for f, _ in frames], length)
+    limits = np.array([lr for _, lr in frames], dtype=np.float64)
+    return scenario_grid(closes, index_closes, days, threshold, limits, horizon,
+                         index_moves, stock_moves)
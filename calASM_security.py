@@ -0,0 +1,149 @@
+"""
+本地证券主表: 代码、名称、板块、ST 标记、上市日期、基准指数、涨跌停比例
+
+每天一次按交易所列表批量取全部 A 股代码、简称与上市日期 (calASM_data.fetch_security_list)，存入共享数据仓库
+(cache/data/security/日期)；启动时从磁盘载入为按代码索引的表，
+之后的板块、涨跌停比例、基准指数和名称查询都是 O(1) 的字典查找，不再逐只联网。
+
+主表没有的代码 (如当天新股、主表尚未下载) 回退到按代码前缀推断。
+风险警示 (ST / *ST) 的主板股票涨跌停比例为 5%，创业板、科创板、北交所不变。
+上市日期结合交易日历给出新股上市初期不设涨跌幅限制的日子 (no_limit_dates)，这些日子不参与连板推算。
+"""
+import threading
+from bisect import bisect_left
+from collections import namedtuple
+from datetime import datetime
+
+import pandas as pd
+
+from calASM_cache import data_store
+from calASM_rules import BOARD_INDEX, BOARD_LIMIT, MAIN_BOARDS, NO_LIMIT_DAYS, get_board
+
+ST_LIMIT = 1.05
+
+Security = namedtuple("Security", "code name board st list_date index_code index_name limit_ratio")
+
+
+def is_st(name):
+    """简称带 ST 即为风险警示 (ST、*ST、S*ST)"""
+    return "ST" in str(name).upper()
+
+
+def make_security(code, name="", list_date=""):
+    board = get_board(code)
+    st = is_st(name)
+    index_code, index_name = BOARD_INDEX[board]
+    limit_ratio = ST_LIMIT if st and board in MAIN_BOARDS else BOARD_LIMIT[board]
+    return Security(code, name or code, board, st, list_date or "", index_code, index_name, limit_ratio)
+
+
+class SecurityMaster:
+    """按代码索引的证券主表"""
+
+    def __init__(self, df, date=""):
+        self.date = date
+        self._rows = {}
+        for code, name, list_date in zip(df['code'], df['name'], df['list_date']):
+            code = str(code).zfill(6)
+            self._rows[code] = make_security(code, str(name), "" if pd.isna(list_date) else str(list_date))
+
+    def __len__(self):
+        return len(self._rows)
+
+    def __contains__(self, code):
+        return code in self._rows
+
+    def get(self, code):
+        """主表记录；主表没有时按代码前缀推断"""
+        sec = self._rows.get(code)
+        return sec if sec is not None else make_security(code)
+
+    def name(self, code, default=None):
+        sec = self._rows.get(code)
+        return sec.name if sec is not None else (default if default is not None else code)
+
+    def frame(self):
+        return pd.DataFrame(list(self._rows.values()), columns=Security._fields).set_index("code")
+
+    @classmethod
+    def load(cls, store=None):
+        """载入数据仓库中最新的主表，没有则返回 None"""
+        date, df = _latest_table(store or data_store())
+        return None if df is None else cls(df, date)
+
+    def is_stale(self, today=None):
+        return self.date < (today or datetime.now().strftime("%Y%m%d"))
+
+
+def _latest_table(store):
+    """数据仓库中最新的主表 (日期, DataFrame)，没有则为 ("", None)"""
+    for date in reversed(store.keys("security")):
+        df = store.get("security", date)
+        if df is not None:
+            return date, df
+    return "", None
+
+
+def refresh_master(store=None):
+    """取今天的主表 (其他进程已下载则直接读取)，失败返回 None；某个交易所列表取不到时沿用上一份主表的该板块"""
+    from calASM_data import fetch_security_list
+
+    store = store or data_store()
+    today = datetime.now().strftime("%Y%m%d")
+    df = store.get_or_fetch("security", today, lambda: fetch_security_list(_latest_table(store)[1]))
+    return None if df is None else SecurityMaster(df, today)
+
+
+_master = None
+_master_lock = threading.Lock()
+
+
+def get_master():
+    """进程内共享的主表 (只读磁盘，不联网)；磁盘上没有时为空表，查询全部走前缀推断"""
+    global _master
+    with _master_lock:
+        if _master is None:
+            _master = SecurityMaster.load() or SecurityMaster(pd.DataFrame(columns=["code", "name", "list_date"]))
+        return _master
+
+
+def ensure_fresh():
+    """主表不是今天的则联网刷新一次 (失败时继续使用旧表)，返回当前主表"""
+    global _master
+    master = get_master()
+    if not master.is_stale():
+        return master
+    fresh = refresh_master()
+    if fresh is not None:
+        with _master_lock:
+            _master = fresh
+        return fresh
+    return master
+
+
+def lookup(code):
+    return get_master().get(code)
+
+
+def stock_name(code, default=None):
+    return get_master().name(code, default)
+
+
+def no_limit_dates(code, calendar, list_date=None):
+    """
+    新股上市初期不设涨跌幅限制的交易日: 上市首日起 NO_LIMIT_DAYS 个交易日 (有序的 'YYYYMMDD' 元组)
+    list_date 缺省取主表；没有上市日期、或上市早于日历首日时返回空元组
+    """
+    if list_date is None:
+        list_date = lookup(code).list_date
+    calendar = list(calendar)
+    if not list_date or not calendar or list_date < calendar[0]:
+        return ()
+    i = bisect_left(calendar, list_date)
+    return tuple(calendar[i:i + NO_LIMIT_DAYS[get_board(code)]])
+
+
+def get_market_rules(stock_code):
+    """(基准指数代码, 指数名称, 涨跌停比例)，识别 ST"""
+    sec = lookup(stock_code)
+    return sec.index_code, sec.index_name, sec.limit_ratio
@@ -0,0 +1,371 @@
+"""
+本地分析服务: 一个常驻进程持有热缓存，供多个 GUI / 命令行共享
+
+同一台机器 (或同一局域网) 上的多个 calASM_gui / findStoke_gui 不再各自下载
+同样的指数、交易日历和个股历史，而是作为瘦客户端向服务请求:
+
+    GET /health
+    GET /calendar                               交易日历
+    GET /index?code=sh000001[&date=...]         指数日线 (盘中含实时点位)
+    GET /daily?code=600372&date=20250620        个股日线 (含盘中实时补全)
+    GET /analyse?codes=600372,002149&horizon=3  10日/30日 触线价格、允许涨幅、连板与规则状态
+    GET /screen?near=20&horizon=3[&codes=...]   T+1 允许涨幅低于 near% 的股票 (默认为服务已缓存的全部股票)
+    GET /find?price=24.58                       当日最高价反查
+
+服务基于 asyncio，阻塞的 akshare 请求放到线程池执行；同一时刻对同一数据的重复请求
+(如两个客户端同时分析同一只股票) 只会发起一次下载，结果共享；相同的 /analyse、/screen 请求也只计算一次。
+horizon 须在 1~MAX_HORIZON 之间，near 须在 0~MAX_NEAR 之间，否则返回 400。
+收盘后的日线永久有效，盘中日线与全市场快照按较短的 TTL 刷新。
+全部通信走 JSON over HTTP，可以完全在 localhost 上测试。
+
+用法:
+    python calASM_service.py [--host 127.0.0.1] [--port 8765]
+"""
+import argparse
+import asyncio
+import json
+import math
+import os
+import time
+import urllib.parse
+import urllib.request
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from calASM_cache import session_closed
+from calASM_data import (clear_memo, fetch_index_live, fetch_stock_daily, fetch_trade_calendar, filter_by_high,
+                         load_spot_snapshot)
+from calASM_panel import MarketPanel
+from calASM_period import MAX_HORIZON
+from calASM_rules import evaluate_rules, format_rule_status, get_board, get_rules
+from calASM_security import ensure_fresh, get_market_rules, stock_name
+from calASM_symbols import normalize_code, parse_codes
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+# 可通过环境变量指定服务地址，如 CALASM_SERVICE=192.168.1.10:8765
+SERVICE_ENV = "CALASM_SERVICE"
+
+DEFAULT_RULES = ((10, 100.0), (30, 200.0))
+INTRADAY_TTL = 60.0      # 盘中个股日线 (含实时价) 的有效期 (秒)
+SNAPSHOT_TTL = 10.0      # 全市场快照的有效期 (秒)
+FETCH_CONCURRENCY = 4    # 同时向数据源发起的请求数上限
+MAX_NEAR = 1000.0        # /screen 的 near (允许涨幅 %) 上限
+
+
+class InFlight:
+    """asyncio 版请求合并: 同一 key 正在执行时，后来者等待同一个结果"""
+
+    def __init__(self):
+        self._tasks = {}
+
+    async def do(self, key, factory):
+        task = self._tasks.get(key)
+        if task is None:
+            task = asyncio.ensure_future(factory())
+            self._tasks[key] = task
+            task.add_done_callback(lambda _: self._tasks.pop(key, None))
+        return await asyncio.shield(task)
+
+    def __len__(self):
+        return len(self._tasks)
+
+
+def _frame_to_json(df):
+    if df is None:
+        return None
+    return {"columns": list(df.columns), "data": df.astype(object).where(df.notna(), None).values.tolist()}
+
+
+def _frame_from_json(obj):
+    if obj is None:
+        return None
+    return pd.DataFrame(obj["data"], columns=obj["columns"])
+
+
+def _clean(value):
+    """numpy 数组 / 标量 -> JSON 可序列化对象，nan 变为 null"""
+    if isinstance(value, np.ndarray):
+        return [_clean(v) for v in value.tolist()]
+    if isinstance(value, (list, tuple)):
+        return [_clean(v) for v in value]
+    if isinstance(value, dict):
+        return {k: _clean(v) for k, v in value.items()}
+    if isinstance(value, (np.floating, float)):
+        return None if math.isnan(value) else float(value)
+    if isinstance(value, np.integer):
+        return int(value)
+    if isinstance(value, np.bool_):
+        return bool(value)
+    return value
+
+
+class AnalysisService:
+    """持有热缓存的分析服务 (与传输层无关，可直接在事件循环中调用)"""
+
+    def __init__(self, rules=DEFAULT_RULES):
+        self.rules = tuple(rules)
+        self.inflight = InFlight()
+        self._stocks = {}       # (code, date) -> (取数时间, df)
+        self._snapshot = None   # (取数时间, df)
+        self._sem = None
+        self._day = None
+        self.stats = {"requests": 0, "fetches": 0}
+
+    async def _run_blocking(self, func, *args):
+        if self._sem is None:
+            self._sem = asyncio.Semaphore(FETCH_CONCURRENCY)
+        async with self._sem:
+            self.stats["fetches"] += 1
+            return await asyncio.get_running_loop().run_in_executor(None, func, *args)
+
+    # ================= 数据 =================
+
+    async def calendar(self):
+        return await self.inflight.do(("calendar",), lambda: self._run_blocking(fetch_trade_calendar))
+
+    async def index_daily(self, index_code, date=None):
+        """指数日线；盘中补上实时点位 (实时点位本身有短时缓存，全部指数共用一次请求)"""
+        date = date or datetime.now().strftime("%Y%m%d")
+        return await self.inflight.do(("index", index_code, date),
+                                      lambda: self._run_blocking(fetch_index_live, index_code, date))
+
+    async def stock_daily(self, code, date):
+        hit = self._stocks.get((code, date))
+        if hit is not None and (session_closed(date) or time.time() - hit[0] < INTRADAY_TTL):
+            return hit[1]
+
+        async def load():
+            df = await self._run_blocking(lambda: fetch_stock_daily(code, date, log=lambda msg: None))
+            if df is not None:
+                self._stocks[(code, date)] = (time.time(), df)
+            return df
+        return await self.inflight.do(("stock", code, date), load)
+
+    async def snapshot(self):
+        if self._snapshot is not None and time.time() - self._snapshot[0] < SNAPSHOT_TTL:
+            return self._snapshot[1]
+
+        async def load():
+            # 经共享数据仓库，与 findStoke 等进程共用同一份快照
+            df = await self._run_blocking(lambda: load_spot_snapshot(max_age=SNAPSHOT_TTL))
+            if df is not None:
+                self._snapshot = (time.time(), df)
+            return df
+        return await self.inflight.do(("snapshot",), load)
+
+    def roll_day(self):
+        """跨日后清空指数、日历与个股缓存，并在后台刷新证券主表"""
+        today = datetime.now().strftime("%Y%m%d")
+        if today != self._day:
+            self._day = today
+            clear_memo()
+            self._stocks.clear()
+            asyncio.get_running_loop().run_in_executor(None, ensure_fresh)
+
+    def warm_codes(self):
+        return sorted({code for code, _ in self._stocks})
+
+    async def panel(self, codes, date):
+        """并发拉取 (或命中缓存) 全部股票与指数，组装 MarketPanel"""
+        markets = [(code,) + get_market_rules(code) for code in codes]
+        frames = await asyncio.gather(*(self.stock_daily(code, date) for code in codes))
+        index_codes = sorted({m[1] for m in markets})
+        index_frames = dict(zip(index_codes, await asyncio.gather(*(self.index_daily(c, date) for c in index_codes))))
+        stocks = [(code, stock_name(code), df, index_code, limit_ratio)
+                  for (code, index_code, _, limit_ratio), df in zip(markets, frames)
+                  if df is not None and not df.empty and index_frames.get(index_code) is not None]
+        if not stocks:
+            return None
+        return MarketPanel.from_frames(stocks, index_frames, await self.calendar())
+
+    # ================= 接口 =================
+
+    async def analyse(self, codes, horizon=3, date=None):
+        """同一时刻相同的请求 (股票、天数、日期) 只计算一次，结果共享"""
+        date = date or datetime.now().strftime("%Y%m%d")
+        return await self.inflight.do(("analyse", tuple(codes), horizon, date),
+                                      lambda: self._analyse(codes, horizon, date))
+
+    async def _analyse(self, codes, horizon, date):
+        panel = await self.panel(codes, date)
+        if panel is None:
+            return {"date": date, "stocks": {}}
+        preds = {rule: panel.predict(rule[0], rule[1], horizon) for rule in self.rules}
+        stocks = {}
+        for i, code in enumerate(panel.codes):
+            m = panel.listed[i]
+            closes, index_closes = panel.close_ffill[i, m], panel.index_close[i, m]
+            stocks[code] = {
+                "name": panel.names[i],
+                "date": str(panel.dates[-1]),
+                "close": panel.close_ffill[i, -1],
+                "index_code": panel.index_codes[i],
+                "limit_ratio": panel.limit_ratio[i],
+                "rules": {f"{d}日({t:.0f}%)": {k: v[i] for k, v in p.items()} for (d, t), p in preds.items()},
+                "status": format_rule_status(evaluate_rules(closes, index_closes, get_rules(get_board(code)))),
+            }
+        return _clean({"date": date, "horizon": horizon, "stocks": stocks})
+
+    async def screen(self, codes=None, horizon=3, near=20.0, date=None):
+        codes = codes or self.warm_codes()
+        result = await self.analyse(codes, horizon, date)
+        hits = []
+        for code, s in result["stocks"].items():
+            for name, r in s["rules"].items():
+                room = r["room_pct"][0]
+                if r["triggered"][0] or (room is not None and room < near):
+                    hits.append({"code": code, "rule": name, "close": s["close"],
+                                 "trigger_price": r["trigger_price"][0], "room_pct": room,
+                                 "triggered": r["triggered"][0]})
+        hits.sort(key=lambda h: (h["room_pct"] if h["room_pct"] is not None else 0.0))
+        return {"date": result["date"], "near": near, "hits": hits}
+
+    async def find_by_price(self, price):
+        df = await self.snapshot()
+        if df is None:
+            raise RuntimeError("实时快照获取失败")
+        cols = [c for c in ('代码', '名称', '最新价', '最高', '涨跌幅') if c in df.columns]
+        return {"time": datetime.fromtimestamp(self._snapshot[0]).strftime("%H:%M:%S"),
+                "result": _frame_to_json(filter_by_high(df, price)[cols])}
+
+    async def handle(self, path, params):
+        """路由: 返回 (状态码, JSON 对象)"""
+        self.stats["requests"] += 1
+        self.roll_day()
+        codes = parse_codes(params.get("codes", ""))
+        horizon = int(params.get("horizon", 3))
+        if not 1 <= horizon <= MAX_HORIZON:
+            return 400, {"error": f"参数错误: horizon 须在 1~{MAX_HORIZON} 之间"}
+        near = float(params.get("near", 20.0))
+        if not 0 <= near <= MAX_NEAR:
+            return 400, {"error": f"参数错误: near 须在 0~{MAX_NEAR:.0f} 之间"}
+        date = params.get("date") or None
+        if path == "/health":
+            return 200, {"ok": True, "warm": len(self._stocks), "inflight": len(self.inflight), **self.stats}
+        if path == "/calendar":
+            return 200, {"dates": await self.calendar()}
+        if path == "/index":
+            return 200, {"frame": _frame_to_json(await self.index_daily(params["code"], params.get("date")))}
+        if path == "/daily":
+            date = date or datetime.now().strftime("%Y%m%d")
+            code = normalize_code(params["code"])
+            if code is None:
+                raise ValueError(f"无法识别的代码 {params['code']}")
+            return 200, {"frame": _frame_to_json(await self.stock_daily(code, date))}
+        if path == "/analyse":
+            return 200, await self.analyse(codes, horizon, date)
+        if path == "/screen":
+            return 200, await self.screen(codes, horizon, near, date)
+        if path == "/find":
+            return 200, await self.find_by_price(float(params["price"]))
+        return 404, {"error": f"未知接口 {path}"}
+
+
+# ================= HTTP 传输 =================
+
+async def _serve_connection(service, reader, writer):
+    try:
+        request_line = (await reader.readline()).decode("latin-1").strip()
+        # 丢弃请求头
+        while (await reader.readline()) not in (b"\r\n", b"\n", b""):
+            pass
+        try:
+            method, target, _ = request_line.split(" ", 2)
+            url = urllib.parse.urlsplit(target)
+            params = dict(urllib.parse.parse_qsl(url.query))
+            if method != "GET":
+                status, body = 405, {"error": "只支持 GET"}
+            else:
+                status, body = await service.handle(url.path, params)
+        except (KeyError, ValueError) as e:
+            status, body = 400, {"error": f"参数错误: {e}"}
+        except Exception as e:
+            status, body = 500, {"error": str(e)}
+        payload = json.dumps(body, ensure_ascii=False).encode("utf-8")
+        writer.write(f"HTTP/1.1 {status} {'OK' if status == 200 else 'ERROR'}\r\n"
+                     f"Content-Type: application/json; charset=utf-8\r\n"
+                     f"Content-Length: {len(payload)}\r\nConnection: close\r\n\r\n".encode("latin-1") + payload)
+        await writer.drain()
+    finally:
+        writer.close()
+
+
+async def start_server(service=None, host=DEFAULT_HOST, port=DEFAULT_PORT):
+    """启动服务，返回 (asyncio.Server, service)；port=0 时由系统分配端口"""
+    service = service or AnalysisService()
+    server = await asyncio.start_server(lambda r, w: _serve_connection(service, r, w), host, port)
+    return server, service
+
+
+# ================= 客户端 =================
+
+class ServiceClient:
+    """同步瘦客户端 (供 Tk GUI / 命令行使用)"""
+
+    def __init__(self, address=None, timeout=60):
+        address = address or os.environ.get(SERVICE_ENV) or f"{DEFAULT_HOST}:{DEFAULT_PORT}"
+        self.base = address if address.startswith("http") else f"http://{address}"
+        self.timeout = timeout
+
+    def _get(self, path, timeout=None, **params):
+        query = urllib.parse.urlencode({k: v for k, v in params.items() if v is not None})
+        url = f"{self.base}{path}" + (f"?{query}" if query else "")
+        with urllib.request.urlopen(url, timeout=timeout or self.timeout) as resp:
+            return json.loads(resp.read().decode("utf-8"))
+
+    def available(self):
+        """服务是否在线 (快速探测，不在线时不会阻塞界面)"""
+        try:
+            return bool(self._get("/health", timeout=0.5).get("ok"))
+        except Exception:
+            return False
+
+    def calendar(self):
+        return self._get("/calendar")["dates"]
+
+    def index_daily(self, index_code, date=None):
+        return _frame_from_json(self._get("/index", code=index_code, date=date)["frame"])
+
+    def stock_daily(self, code, date):
+        return _frame_from_json(self._get("/daily", code=code, date=date)["frame"])
+
+    def analyse(self, codes, horizon=3, date=None):
+        return self._get("/analyse", codes=",".join(codes), horizon=horizon, date=date)
+
+    def screen(self, codes=None, horizon=3, near=20.0):
+        return self._get("/screen", codes=",".join(codes) if codes else None, horizon=horizon, near=near)
+
+    def find_by_price(self, price):
+        res = self._get("/find", price=price)
+        return _frame_from_json(res["result"]), res["time"]
+
+
+def connect():
+    """服务在线则返回 ServiceClient，否则返回 None (调用方回退到本地下载)"""
+    client = ServiceClient()
+    return client if client.available() else None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="异动分析本地服务")
+    parser.add_argument("--host", default=DEFAULT_HOST)
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    args = parser.parse_args()
+
+    async def run():
+        server, _ = await start_server(host=args.host, port=args.port)
+        print(f"分析服务已启动: http://{args.host}:{args.port}")
+        async with server:
+            await server.serve_forever()
+
+    try:
+        asyncio.run(run())
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,54 @@
+"""
+股票代码规范化与自选列表去重
+
+粘贴进来的列表常混有多种写法 (600372 / sh600372 / SH.600372 / 600372.SH / 600372.SS)，
+还经常有重复行。这里统一规范为 6 位纯数字代码，并按首次出现的顺序去重，
+避免同一只股票被重复下载、重复分析。
+"""
+import re
+
+_CODE_RE = re.compile(r'^(?:(SH|SZ|BJ|SS)[.\-_]?)?(\d{6})(?:\.(SH|SZ|BJ|SS))?$')
+
+
+def normalize_code(raw):
+    """各种写法 -> 6 位代码；无法识别返回 None"""
+    m = _CODE_RE.match(str(raw).strip().upper())
+    if not m or (m.group(1) and m.group(3)):
+        return None
+    return m.group(2)
+
+
+def dedupe_stocks(stocks):
+    """
+    [(代码, 名称), ...] 规范化并去重 (保留首次出现的名称)
+    返回 (去重后的列表, 重复的原始代码列表, 无法识别的原始代码列表)
+    """
+    seen = {}
+    duplicates, invalid = [], []
+    for raw, name in stocks:
+        code = normalize_code(raw)
+        if code is None:
+            invalid.append(raw)
+            continue
+        if code in seen:
+            duplicates.append(raw)
+            continue
+        seen[code] = name if name and name != raw else code
+    return list(seen.items()), duplicates, invalid
+
+
+def parse_stock_list(text):
+    """
+    多行文本 (每行 '代码 名称' 或仅 '代码'，逗号/空白分隔) -> dedupe_stocks 的结果
+    """
+    stocks = []
+    for line in text.splitlines():
+        parts = line.replace(',', ' ').replace('，', ' ').split()
+        if parts:
+            stocks.append((parts[0], parts[1] if len(parts) > 1 else parts[0]))
+    return dedupe_stocks(stocks)
+
+
+def parse_codes(text):
+    """命令行 '600372,sh002149,...' -> 规范化且去重的代码列表"""
+    return [code for code, _ in dedupe_stocks((c, c) for c in text.replace('，', ',').split(',') if c.strip())[0]]
@@ -1,10 +1,12 @@
 import tkinter as tk
 from tkinter import ttk, messagebox, scrolledtext
-import akshare as ak
-import pandas as pd
 import threading
 from datetime import datetime
-import os
+
+from calASM_cache import data_store, evict
+from calASM_data import filter_by_high, load_spot_snapshot
+from calASM_recorder import IntradayArchive, parse_time
+from calASM_service import connect as connect_service
 
 class FindStockApp:
     def __init__(self, root):
@@ -15,6 +17,8 @@ class FindStockApp:
         # 缓存设置
         self.cached_df = None
         self.cache_time_str = None
+        # 快照按容量与保留天数淘汰 (取代原来只删非当天文件的做法)
+        threading.Thread(target=evict, args=(("snapshot",),), daemon=True).start()
         
         # 输入区域
         input_frame = tk.Frame(root, pady=10)
@@ -24,6 +28,12 @@ class FindStockApp:
         self.price_entry = tk.Entry(input_frame, width=15)
         self.price_entry.pack(side=tk.LEFT, padx=5)
         self.price_entry.bind('<Return>', lambda event: self.start_search())
+
+        # 截至时间 (可选): 填写后从盘中快照存档回溯，如 10:30
+        tk.Label(input_frame, text="截至:").pack(side=tk.LEFT)
+        self.time_entry = tk.Entry(input_frame, width=7)
+        self.time_entry.pack(side=tk.LEFT, padx=2)
+        self.time_entry.bind('<Return>', lambda event: self.start_search())
         
         self.search_btn = tk.Button(input_frame, text="查找股票", command=self.start_search, bg="#007acc", fg="white")
         self.search_btn.pack(side=tk.LEFT, padx=10)
@@ -61,12 +71,9 @@ class FindStockApp:
         self.cached_df = None
         self.cache_time_str = None
         
-        # 删除今天的文件缓存
+        # 删除今天的共享快照缓存
         try:
-            today_str = datetime.now().strftime("%Y-%m-%d")
-            cache_file = f"market_data_{today_str}.pkl"
-            if os.path.exists(cache_file):
-                os.remove(cache_file)
+            data_store().invalidate("snapshot", datetime.now().strftime("%Y%m%d"))
         except Exception as e:
             print(f"清理缓存失败: {e}")
             
@@ -84,6 +91,14 @@ class FindStockApp:
         except ValueError:
             messagebox.showerror("错误", "请输入有效的数字")
             return
+
+        as_of = self.time_entry.get().strip() or None
+        if as_of:
+            try:
+                parse_time(as_of)
+            except ValueError:
+                messagebox.showerror("错误", "时间格式应为 10:30")
+                return
             
         self.search_btn.config(state='disabled')
         self.refresh_btn.config(state='disabled')
@@ -93,77 +108,49 @@ class FindStockApp:
         for item in self.tree.get_children():
             self.tree.delete(item)
             
-        threading.Thread(target=self.run_search, args=(target_price,), daemon=True).start()
+        threading.Thread(target=self.run_search, args=(target_price, as_of), daemon=True).start()
 
-    def cleanup_old_cache(self, current_date_str):
-        """清理非今日的缓存文件"""
+    def run_search(self, target_price, as_of=None):
         try:
-            for fname in os.listdir('.'):
-                if fname.startswith("market_data_") and fname.endswith(".pkl"):
-                    # 如果文件名不包含今天的日期，则删除
-                    if f"market_data_{current_date_str}.pkl" != fname:
-                        try:
-                            os.remove(fname)
-                        except:
-                            pass
-        except:
-            pass
+            # 指定了截至时间: 从盘中快照存档回溯 (calASM_recorder.py record 记录)
+            if as_of:
+                df = IntradayArchive().as_of(as_of)
+                if df is None:
+                    raise RuntimeError(f"今天 {as_of} 之前没有快照存档，请先运行 calASM_recorder.py record")
+                self.cache_time_str = df.attrs["time"]
+                self.root.after(0, self.show_results, filter_by_high(df, target_price), "盘中存档")
+                return
+
+            # 策略: 本地分析服务 -> 内存 -> 共享数据仓库 (当天快照) -> 联网下载
+
+            # 0. 分析服务在线时由服务筛选 (服务端持有全市场快照)
+            service = connect_service()
+            if service:
+                result_df, self.cache_time_str = service.find_by_price(target_price)
+                self.root.after(0, self.show_results, result_df, "分析服务")
+                return
 
-    def run_search(self, target_price):
-        try:
-            now_str = datetime.now().strftime("%H:%M:%S")
-            today_date = datetime.now().strftime("%Y-%m-%d")
-            cache_file = f"market_data_{today_date}.pkl"
-            
-            # 策略: 内存 -> 本地文件 -> 联网下载
-            
             # 1. 优先使用内存缓存
             if self.cached_df is not None and not self.cached_df.empty:
                df = self.cached_df
                source_msg = "内存缓存"
-            
-            # 2. 其次尝试读取本地文件缓存
-            elif os.path.exists(cache_file):
-                try:
-                    df = pd.read_pickle(cache_file)
-                    self.cached_df = df
-                    # 获取文件修改时间作为数据时间
-                    mtime = os.path.getmtime(cache_file)
-                    self.cache_time_str = datetime.fromtimestamp(mtime).strftime("%H:%M:%S")
-                    source_msg = "本地文件"
-                except Exception:
-                    # 文件可能损坏，降级到下载
-                    df = ak.stock_zh_a_spot_em()
-                    df.to_pickle(cache_file)
-                    self.cached_df = df
-                    self.cache_time_str = now_str
-                    source_msg = "实时(文件修复)"
-            
-            # 3. 最后联网下载
+
+            # 2. 共享数据仓库: 当天任一工具下载过的快照直接读取，否则加锁联网下载
             else:
-               df = ak.stock_zh_a_spot_em()
-               # 保存到本地文件
-               try:
-                   df.to_pickle(cache_file)
-                   self.cleanup_old_cache(today_date) # 顺便清理旧文件
-               except Exception as e:
-                   print(f"写入缓存文件失败: {e}")
-                   
+               store = data_store()
+               fetches = store.fetches
+               df = load_spot_snapshot()
+               if df is None:
+                   raise RuntimeError("实时快照获取失败")
                self.cached_df = df
-               self.cache_time_str = now_str
-               source_msg = "实时下载"
+               mtime = store.mtime("snapshot", datetime.now().strftime("%Y%m%d"))
+               self.cache_time_str = datetime.fromtimestamp(mtime).strftime("%H:%M:%S") if mtime else datetime.now().strftime("%H:%M:%S")
+               source_msg = "实时下载" if store.fetches > fetches else "本地文件"
             
             # 筛选最高价匹配的股票 (允许 0.01 的误差)
             # 确保 '最高' 列也是数字类型
             # 注意：部分停牌股票最高价可能为 '-' 或 null
-            def check_price(x):
-                try:
-                    return abs(float(x) - target_price) < 0.01
-                except:
-                    return False
-
-            mask = df['最高'].apply(check_price)
-            result_df = df[mask]
+            result_df = filter_by_high(df, target_price)
             
             # 回到主线程更新 UI
             self.root.after(0, self.show_results, result_df, source_msg)
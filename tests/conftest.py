@@ -0,0 +1,24 @@
+"""
+测试公共设置: 仓库根目录加入 sys.path；每个测试在临时目录里运行，
+cache/、images/ 等都写到临时目录，证券主表与数据仓库的进程内单例也不跨测试复用
+"""
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture(autouse=True)
+def isolated_cache(tmp_path, monkeypatch):
+    import calASM_cache
+    import calASM_data
+    import calASM_security
+
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(calASM_cache, "_store", None)
+    monkeypatch.setattr(calASM_security, "_master", None)
+    calASM_data.clear_memo()
+    yield tmp_path
+    calASM_data.clear_memo()
@@ -0,0 +1,61 @@
+"""
+calASM_alert 盘中触线预警: 只在级别升级时预警，回落后再次升级重新预警
+"""
+import numpy as np
+import pandas as pd
+
+from calASM_alert import LEVEL_HIT, LEVEL_NEAR, AlertEngine, format_alert
+from calASM_panel import MarketPanel
+from calASM_premarket import TriggerTable, build_table
+
+DATES = [d.strftime("%Y%m%d") for d in pd.bdate_range("2026-01-05", periods=40)]
+
+
+def make_table():
+    """两只平盘股票 (10 元、20 元)，指数 3000 点不变: 10日触线价为现价的两倍"""
+    stocks = [(code, f"股{code}", pd.DataFrame({"date": DATES, "close": np.full(len(DATES), price)}), "sh000001", 1.10)
+              for code, price in (("600001", 10.0), ("600002", 20.0))]
+    index = pd.DataFrame({"date": DATES, "index_close": np.full(len(DATES), 3000.0)})
+    return TriggerTable(build_table(MarketPanel.from_frames(stocks, {"sh000001": index}, DATES)))
+
+
+def test_alerts_only_on_level_upgrade():
+    engine = AlertEngine(make_table(), near_pct=5.0, log_path="alerts/a.log")
+    assert engine.check(pd.Series({"600001": 10.0, "600002": 20.0})) == []
+    # 600001 距触线 20.00 不足 5%
+    alerts = engine.check(pd.Series({"600001": 19.5, "600002": 20.0, "000001": 9.9}))
+    assert [(a["code"], a["rule"], a["level"]) for a in alerts] == [("600001", (10, 100.0), LEVEL_NEAR)]
+    assert engine.check(pd.Series({"600001": 19.6, "600002": 20.0})) == []
+    alerts = engine.check(pd.Series({"600001": 20.01, "600002": 20.0}))
+    assert [(a["code"], a["level"]) for a in alerts] == [("600001", LEVEL_HIT)]
+    # 回落后再次升级重新预警
+    engine.check(pd.Series({"600001": 10.0, "600002": 20.0}))
+    assert len(engine.check(pd.Series({"600001": 20.01, "600002": 20.0}))) == 1
+    with open("alerts/a.log", encoding="utf-8") as f:
+        lines = f.read().splitlines()
+    assert len(lines) == 3 and "已触线 股600001(600001) 10日(100%)" in lines[-1]
+
+
+def test_missing_quote_keeps_level():
+    engine = AlertEngine(make_table(), codes=["600001", "600009"], log_path="a.log")
+    assert engine.codes == ["600001"]
+    engine.check(pd.Series({"600001": 20.01}))
+    assert (engine.level[0] == LEVEL_HIT).all()
+    assert engine.check(pd.Series({"600002": 20.0})) == [] and (engine.level[0] == LEVEL_HIT).all()
+
+
+def test_index_spot_moves_trigger_price():
+    engine = AlertEngine(make_table(), codes=["600001"], near_pct=0.0, log_path="a.log")
+    # 指数涨 10% 时 20.01 仍未触线
+    assert engine.check(pd.Series({"600001": 20.01}), pd.Series({"sh000001": 3300.0})) == []
+    np.testing.assert_array_equal(engine.index_levels(pd.Series({"sz000001": 3300.0})), [3300.0])
+    # 取不到的指数按最新收盘
+    np.testing.assert_array_equal(engine.index_levels(pd.Series({"sh000300": 4000.0})), [3000.0])
+    assert engine.index_levels(None) is None
+
+
+def test_format_alert():
+    a = {"time": "10:00:00", "code": "600001", "name": "甲", "rule": (30, 200.0), "level": LEVEL_NEAR,
+         "price": 29.5, "trigger_price": 30.0, "room_pct": 1.6949, "deviation": 195.0}
+    assert format_alert(a) == ("[10:00:00] 临近触线 甲(600001) 30日(200%) 现价 29.50 | 触线价 30.00 | "
+                               "距触线 1.69% | 偏离 195.00%")
@@ -0,0 +1,99 @@
+"""
+calASM_api 库接口: 注入内存数据源，不联网、不写缓存
+"""
+import numpy as np
+import pandas as pd
+import pytest
+
+import calASM_api as api
+from calASM_period import date_label
+
+DATES = [d.strftime("%Y%m%d") for d in pd.bdate_range("2026-01-05", periods=80)]
+HISTORY = DATES[:60]
+
+
+class MemorySource:
+    """内存数据源: failing 中的代码取数时抛异常，short 中的代码只有 10 天行情"""
+
+    def __init__(self, failing=(), short=()):
+        self.failing = set(failing)
+        self.short = set(short)
+        self.index_calls = 0
+
+    def calendar(self):
+        return DATES
+
+    def stock_daily(self, code, date):
+        if code in self.failing:
+            raise ConnectionError(f"{code} 下载失败")
+        dates = HISTORY[-10:] if code in self.short else HISTORY
+        close = np.round(np.linspace(10, 15, len(dates)) + int(code[-1]) * 0.1, 2)
+        return pd.DataFrame({"date": dates, "close": close, "pct_chg": 0.0})
+
+    def index_daily(self, index_code, date):
+        self.index_calls += 1
+        return pd.DataFrame({"date": HISTORY, "index_close": np.full(len(HISTORY), 3000.0), "index_pct_chg": 0.0})
+
+    def market_rules(self, code):
+        return "idx", "指数", 1.10
+
+    def stock_name(self, code):
+        return "名称" + code
+
+
+def test_analyze_stock_good_code():
+    a = api.analyze_stock("600001", source=MemorySource(), horizon=4, date=HISTORY[-1])
+    assert a.ok and a.name == "名称600001" and a.date == HISTORY[-1]
+    assert a.price == pytest.approx(15.1)
+    assert len(a.summary(10).space) == 4
+    assert a.summary(10).dates[0] == date_label(DATES[60])
+    assert a.tightest() is not None
+    assert set(a.summary_frame()['rule']) == {"10日", "30日"}
+
+
+def test_analyze_stocks_yields_errors_in_input_order():
+    source = MemorySource(failing={"600002"}, short={"600003"})
+    out = list(api.analyze_stocks(["600001", "bogus", "sh600002", ("600003", "短"), "sz000004"],
+                                  source=source, date=HISTORY[-1]))
+    assert [a.code for a in out] == ["600001", "bogus", "600002", "600003", "000004"]
+    assert [a.ok for a in out] == [True, False, False, False, True]
+    assert isinstance(out[1].error, ValueError)          # 无法识别的代码
+    assert isinstance(out[2].error, ConnectionError)     # 取数失败 (非规范写法 sh600002)
+    assert isinstance(out[3].error, ValueError) and out[3].name == "短"   # 数据不足，分析失败
+    # 出错的股票不进汇总表
+    assert set(api.summary_frame(out)['code']) == {"600001", "000004"}
+
+
+def test_analyze_stock_raises_on_error():
+    with pytest.raises(ConnectionError):
+        api.analyze_stock("600002", source=MemorySource(failing={"600002"}), date=HISTORY[-1])
+    with pytest.raises(ValueError):
+        api.analyze_stock("bogus", source=MemorySource())
+
+
+def test_index_fetched_once_per_batch():
+    source = MemorySource()
+    codes = [f"60000{i}" for i in range(1, 7)]
+    out = list(api.analyze_stocks(codes, source=source, date=HISTORY[-1], batch_size=3))
+    assert all(a.ok for a in out)
+    assert source.index_calls == 2
+
+
+def test_date_cuts_history():
+    a = api.analyze_stock("600001", source=MemorySource(), horizon=2, date=HISTORY[45])
+    assert a.date == HISTORY[45]
+    assert a.summary(10).dates == [date_label(d) for d in DATES[46:48]]
+
+
+def test_horizon_bounds():
+    with pytest.raises(ValueError):
+        list(api.analyze_stocks(["600001"], source=MemorySource(), horizon=0))
+    with pytest.raises(ValueError):
+        list(api.analyze_stocks(["600001"], source=MemorySource(), horizon=api.MAX_HORIZON + 1))
+
+
+def test_detail_frame_schema():
+    a = api.analyze_stock("600001", source=MemorySource(), horizon=3, date=HISTORY[-1])
+    frame = a.detail_frame()
+    assert (frame['offset'].max(), frame['offset'].min()) == (3, -2)
+    assert list(frame.columns)[:3] == ["code", "name", "rule"]
@@ -0,0 +1,92 @@
+"""
+calASM_backtest 历史重放: 每个 as-of 日的预测与当时的时点分析一致，命中按实际收盘判断
+"""
+import numpy as np
+import pandas as pd
+import pytest
+
+import calASM_backtest
+import calASM_panel
+from calASM_backtest import as_of, backtest, summarize
+from calASM_panel import MarketPanel
+
+DATES = [d.strftime("%Y%m%d") for d in pd.bdate_range("2026-01-05", periods=80)]
+
+
+def make_panel(seed=0):
+    """第 1 只股票前 40 天走平、之后每天涨 8%；第 2 只随机游走，中途停牌 3 天"""
+    rng = np.random.default_rng(seed)
+    up = np.round(10 * 1.08 ** np.maximum(np.arange(len(DATES)) - 40, 0), 2)
+    walk = np.round(20 * np.cumprod(1 + rng.normal(0, 0.02, len(DATES))), 2)
+    stocks = [("600001", "甲", pd.DataFrame({"date": DATES, "close": up}), "idx", 1.10),
+              ("600002", "乙", pd.DataFrame({"date": DATES, "close": walk}).drop(index=[60, 61, 62]), "idx", 1.10)]
+    index = pd.DataFrame({"date": DATES, "index_close": np.round(3000 * np.cumprod(1 + rng.normal(0, 0.005, 80)), 2)})
+    return MarketPanel.from_frames(stocks, {"idx": index}, DATES)
+
+
+def test_each_as_of_day_matches_point_in_time_prediction():
+    panel = make_panel()
+    result = backtest(panel, horizon=3, start=DATES[40], end=DATES[70])
+    for (days, threshold), r in result.items():
+        assert r["dates"].tolist() == DATES[40:71]
+        for a, date in enumerate(r["dates"].tolist()):
+            pred, used = as_of(panel, date, horizon=3)
+            assert used == date
+            got, want = r["trigger_price"][:, a], pred[(days, threshold)]["trigger_price"]
+            # t+k 停牌的格子回测里不计 (nan)，其余与时点预测逐位一致
+            tgt = np.minimum(40 + a + np.arange(1, 4), len(DATES) - 1)
+            np.testing.assert_array_equal(np.isnan(got), np.isnan(want) | panel.suspended[:, tgt])
+            np.testing.assert_array_equal(got[~np.isnan(got)], want[~np.isnan(got)])
+
+
+def test_hits_follow_actual_closes():
+    panel = make_panel()
+    r = backtest(panel, horizon=2)[(10, 100.0)]
+    tgt = np.arange(len(DATES))[:, None] + np.arange(1, 3)[None, :]
+    known = r["known"]
+    # 最后两天的 T+k 还没有真实数据
+    assert not known[:, -1].any() and not known[:, -2, 1].any()
+    s, a, k = np.nonzero(known)
+    close = panel.close_ffill[s, tgt[a, k]]
+    np.testing.assert_array_equal(r["price_hit"][s, a, k], close >= r["trigger_price"][s, a, k])
+    actual = panel.window_deviation(10)[s, tgt[a, k]]
+    np.testing.assert_array_equal(r["actual_hit"][s, a, k], actual >= 100.0)
+    # 连续上涨的股票: 实际触发时，收盘也一定不低于前一天预测的触线价
+    assert (r["price_hit"][0] >= r["actual_hit"][0]).all() and r["actual_hit"][0].any()
+    # 停牌日作为 t+k 不计入
+    assert not known[1, 59, 0] and not known[1, 60, 0]
+
+
+def test_summarize():
+    panel = make_panel()
+    table = summarize(panel, backtest(panel, horizon=2, start=DATES[50]))
+    assert list(table['代码']) == ["600001", "600002", "600001", "600002"]
+    assert {"T+1命中", "T+1命中率", "T+2实际触发", "临近天数"} <= set(table.columns)
+    assert table.loc[0, "T+1命中"] > 0
+
+
+def test_as_of_before_first_day():
+    with pytest.raises(ValueError):
+        as_of(make_panel(), "20250101")
+
+
+def test_load_panel_uses_history_source(monkeypatch):
+    calls = []
+
+    class Source(calASM_backtest.HistorySource):
+        def calendar(self):
+            return DATES
+
+        def stock_daily(self, code, date):
+            calls.append((code, self.lookback))
+            return pd.DataFrame({"date": DATES, "close": np.full(len(DATES), 10.0)})
+
+        def index_daily(self, index_code, date):
+            return pd.DataFrame({"date": DATES, "index_close": np.full(len(DATES), 3000.0)})
+
+    monkeypatch.setattr(calASM_backtest, "HistorySource", Source)
+    monkeypatch.setattr(calASM_backtest, "ensure_fresh", lambda: None)
+    monkeypatch.setattr(calASM_panel, "get_market_rules", lambda code: ("idx", "指数", 1.10))
+    panel = calASM_backtest.load_panel(["600001", "600002"], "20260105", log=lambda msg: None)
+    assert panel.codes == ["600001", "600002"] and panel.shape == (2, len(DATES))
+    assert [c for c, _ in calls] == ["600001", "600002"] and calls[0][1] > 90
@@ -0,0 +1,184 @@
+"""
+calASM_cache: 共享数据仓库、图片索引 (多进程)、容量淘汰，全部在临时目录中进行
+"""
+import glob
+import multiprocessing
+import os
+import threading
+import time
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import calASM_cache
+from calASM_cache import DataStore, ResultCache, analysis_key, cached_image, record_image, session_closed
+
+
+def _record_many(directory, worker, count):
+    os.chdir(directory)
+    for i in range(count):
+        path = os.path.join("images", f"{worker}_{i}.png")
+        with open(path, "wb") as f:
+            f.write(b"png")
+        record_image(f"{worker}-{i}", path)
+
+
+def test_analysis_key_follows_inputs():
+    key = analysis_key("600001", "20260105", 10.0, 3000.0, 5, [(10, 100.0)])
+    assert key == analysis_key("600001", "20260105", 10.00001, 3000.0, 5, ((10, 100.0),))
+    for other in (analysis_key("600001", "20260105", 10.01, 3000.0, 5, [(10, 100.0)]),
+                  analysis_key("600001", "20260105", 10.0, 3000.01, 5, [(10, 100.0)]),
+                  analysis_key("600001", "20260106", 10.0, 3000.0, 5, [(10, 100.0)]),
+                  analysis_key("600001", "20260105", 10.0, 3000.0, 6, [(10, 100.0)]),
+                  analysis_key("600001", "20260105", 10.0, 3000.0, 5, [(30, 200.0)])):
+        assert other != key
+
+
+def test_session_closed():
+    monday = datetime(2026, 1, 5, 14, 0)
+    assert session_closed("20260102", now=monday) and not session_closed("20260105", now=monday)
+    assert session_closed("20260105", now=datetime(2026, 1, 5, 15, 5))
+    assert session_closed("20260110", now=datetime(2026, 1, 10, 10, 0))
+
+
+def test_result_cache_memory_and_disk():
+    cache = ResultCache("results")
+    assert cache.get("k") is None
+    cache.put("k", {"rows": [1, 2]})
+    assert cache.get("k") == {"rows": [1, 2]}
+    # 另一个进程 (新的缓存对象) 从磁盘读出
+    other = ResultCache("results")
+    assert other.get("k") == {"rows": [1, 2]}
+    with open(os.path.join("results", "bad.pkl"), "wb") as f:
+        f.write(b"not a pickle")
+    assert other.get("bad") is None
+    cache.clear_memory()
+    os.remove(os.path.join("results", "k.pkl"))
+    assert cache.get("k") is None
+
+
+def test_image_index_shared_between_processes(tmp_path):
+    os.makedirs("images")
+    ctx = multiprocessing.get_context("spawn")
+    procs = [ctx.Process(target=_record_many, args=(str(tmp_path), w, 30)) for w in range(4)]
+    for p in procs:
+        p.start()
+    for p in procs:
+        p.join(60)
+        assert p.exitcode == 0
+    # 各进程的记录都在，没有互相覆盖
+    for w in range(4):
+        for i in range(30):
+            assert cached_image(f"{w}-{i}") == os.path.join("images", f"{w}_{i}.png")
+
+
+def test_image_index_sees_other_writers():
+    os.makedirs("images")
+    open(os.path.join("images", "a.png"), "wb").close()
+    assert cached_image("a") is None
+    record_image("a", os.path.join("images", "a.png"))
+    # 另一个进程改写了索引文件: 本进程读到的是磁盘上的新内容
+    time.sleep(0.01)
+    with open(calASM_cache.IMAGE_INDEX_FILE, "w", encoding="utf-8") as f:
+        f.write('{"b": "images/a.png"}')
+    assert cached_image("b") == "images/a.png"
+    assert cached_image("a") is None
+
+
+def test_get_or_fetch_downloads_once():
+    store = DataStore()
+    calls = []
+
+    def fetch():
+        calls.append(1)
+        time.sleep(0.05)
+        return pd.DataFrame({"date": ["20260105", "20260106"], "close": [10.0, 10.5], "名称": ["甲", "乙"]})
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(store.get_or_fetch("history", "20260106/600001", fetch)))
+               for _ in range(6)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert len(calls) == 1 and store.fetches == 1
+    assert all(list(r['close']) == [10.0, 10.5] and list(r['名称']) == ["甲", "乙"] for r in results)
+    # 新的仓库对象 (如另一个进程) 直接读盘
+    again = DataStore().get_or_fetch("history", "20260106/600001", lambda: None)
+    assert list(again['date']) == ["20260105", "20260106"]
+
+
+def test_get_or_fetch_failure_and_max_age():
+    store = DataStore()
+    assert store.get_or_fetch("calendar", "20260106", lambda: None) is None
+    assert store.get("calendar", "20260106") is None
+    store.put("calendar", "20260106", np.array(["20260105", "20260106"]))
+    assert list(store.get("calendar", "20260106")) == ["20260105", "20260106"]
+    # 过期后重新下载
+    old = time.time() - 100
+    path = store.path("calendar", "20260106") + ".npy"
+    os.utime(path, (old, old))
+    assert list(store.get_or_fetch("calendar", "20260106", lambda: np.array(["x"]), max_age=10)) == ["x"]
+    assert store.keys("calendar") == ["20260106"]
+
+
+def data_files(directory):
+    return sorted(os.path.basename(os.path.dirname(p)) for p in glob.glob(os.path.join(directory, "*", "*.npy")))
+
+
+def test_evict_by_age_and_size():
+    store = DataStore()
+    now = time.time()
+    for i in range(5):
+        store.put("history", f"2026010{i}/600001", pd.DataFrame({"close": np.arange(1000.0)}))
+        path = store.path("history", f"2026010{i}/600001") + ".frame.npy"
+        os.utime(path, (now - i * 86400, now - i * 86400))
+    directory = os.path.join("cache", "data", "history")
+    limits = {"history": (directory, 1000, 2)}
+    removed, _ = calASM_cache.evict(limits=limits, now=now)["history"]
+    assert removed == 2
+    assert data_files(directory) == ["20260100", "20260101", "20260102"]
+    # 容量上限: 只留最近使用的
+    removed, _ = calASM_cache.evict(limits={"history": (directory, 0.009, 30)}, now=now)["history"]
+    assert removed == 2 and data_files(directory) == ["20260100"]
+
+
+def test_evict_keeps_held_lock_files():
+    store = DataStore()
+    store.put("index", "sh000002", np.arange(3.0))
+    lock_path = store.path("index", "sh000002") + ".lock"
+    old = time.time() - 3 * 86400
+    os.utime(lock_path, (old, old))
+    limits = {"index": (os.path.join("cache", "data", "index"), 50, 7)}
+    with calASM_cache.FileLock(lock_path):
+        calASM_cache.evict(limits=limits)
+        # 持锁期间锁文件不能被删，其他进程也就拿不到同一路径上的新锁
+        assert os.path.exists(lock_path)
+        with pytest.raises(TimeoutError):
+            calASM_cache.FileLock(lock_path, timeout=0).__enter__()
+    calASM_cache.evict(limits=limits)
+    assert not os.path.exists(lock_path)
+    assert list(store.get("index", "sh000002")) == [0.0, 1.0, 2.0]
+
+
+@pytest.mark.skipif(os.name == "nt", reason="Windows 下不删除锁文件")
+def test_file_lock_reopens_removed_lock_file(tmp_path, monkeypatch):
+    import fcntl
+
+    path = str(tmp_path / "x.lock")
+    real_flock = fcntl.flock
+    first = [True]
+
+    def flock(fd, op):
+        if first[0] and op & fcntl.LOCK_EX:
+            # 打开之后、加锁之前锁文件被 evict 删除
+            first[0] = False
+            os.remove(path)
+        return real_flock(fd, op)
+
+    monkeypatch.setattr(fcntl, "flock", flock)
+    with calASM_cache.FileLock(path) as lock:
+        assert not first[0]
+        assert lock._current() and os.path.exists(path)
@@ -0,0 +1,59 @@
+"""
+calASM_data 盘中指数: 实时点位按代码匹配，指数日线缺今天时用实时点位补一行
+"""
+from datetime import datetime, timedelta
+
+import pandas as pd
+
+import calASM_data
+from calASM_data import append_index_spot, fetch_index_live, fetch_index_spot, index_spot_level
+
+TODAY = datetime.now().strftime("%Y%m%d")
+YESTERDAY = (datetime.now() - timedelta(days=1)).strftime("%Y%m%d")
+
+
+def index_df(last=YESTERDAY):
+    return pd.DataFrame({"date": ["20260102", last], "index_close": [3000.0, 3010.0], "index_pct_chg": [0.0, 0.33]})
+
+
+def test_index_spot_level():
+    spot = pd.Series({"sh000001": 3050.5, "bj899050": 1200.0, "sz399006": 0.0})
+    assert index_spot_level(spot, "sh000001") == 3050.5
+    # 交易所前缀不一致时按 6 位数字匹配
+    assert index_spot_level(spot, "sz899050") == 1200.0
+    assert index_spot_level(spot, "sz399006") is None and index_spot_level(spot, "sh000300") is None
+    assert index_spot_level(None, "sh000001") is None
+
+
+def test_append_index_spot(monkeypatch):
+    monkeypatch.setattr(calASM_data, "fetch_trade_calendar", lambda: [YESTERDAY, TODAY])
+    spot = pd.Series({"sh000001": 3040.1})
+    out = append_index_spot(index_df(), "sh000001", TODAY, spot)
+    assert out['date'].tolist() == ["20260102", YESTERDAY, TODAY] and out['index_close'].iloc[-1] == 3040.1
+    assert abs(out['index_pct_chg'].iloc[-1] - (3040.1 / 3010.0 - 1) * 100) < 1e-12
+    # 已有今天、分析历史日期、取不到点位时原样返回
+    for df, date, s in ((index_df(TODAY), TODAY, spot), (index_df(), YESTERDAY, spot), (index_df(), TODAY, None)):
+        assert append_index_spot(df, "sh000001", date, s) is df
+    # 今天不是交易日
+    monkeypatch.setattr(calASM_data, "fetch_trade_calendar", lambda: [YESTERDAY])
+    assert len(append_index_spot(index_df(), "sh000001", TODAY, spot)) == 2
+
+
+def test_index_spot_is_fetched_once(monkeypatch):
+    calls = []
+
+    def spot_sina():
+        calls.append(1)
+        return pd.DataFrame({"代码": ["sh000001", "sz399006", "sh000300"], "最新价": ["3040.1", "2100", "-"]})
+
+    monkeypatch.setattr(calASM_data.ak, "stock_zh_index_spot_sina", spot_sina)
+    monkeypatch.setattr(calASM_data, "fetch_trade_calendar", lambda: [YESTERDAY, TODAY])
+    monkeypatch.setattr(calASM_data, "fetch_index_daily", lambda code: index_df())
+    spot = fetch_index_spot()
+    assert spot.to_dict() == {"sh000001": 3040.1, "sz399006": 2100.0}
+    # 同一次刷新的多个指数共用一份实时点位
+    for code in ("sh000001", "sz399006"):
+        assert fetch_index_live(code, TODAY)['date'].iloc[-1] == TODAY
+    assert len(calls) == 1
+    # 历史日期不请求实时点位
+    assert len(fetch_index_live("sh000001", YESTERDAY)) == 2 and len(calls) == 1
@@ -0,0 +1,86 @@
+"""
+calASM_export 流式写出: 每只股票写完即可读回，列结构固定
+"""
+import json
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import calASM_export
+from calASM_export import ROW_SCHEMA, SUMMARY_SCHEMA, ResultWriter, open_writer
+from calASM_period import period_result, period_summary
+
+DATES = [d.strftime("%Y%m%d") for d in pd.bdate_range("2026-01-05", periods=60)]
+FUTURE = [d.strftime("%Y%m%d") for d in pd.bdate_range("2026-03-30", periods=3)]
+
+
+def results(seed=0):
+    rng = np.random.default_rng(seed)
+    df = pd.DataFrame({"date": DATES, "close": np.round(10 * np.cumprod(1 + rng.normal(0.01, 0.03, 60)), 2),
+                       "pct_chg": 0.0, "index_close": 3000.0})
+    out = []
+    for days, threshold, kind in ((10, 100.0, "10日"), (30, 200.0, "30日")):
+        res = period_result(df, FUTURE, days, threshold, 1.10)
+        out.append((res, period_summary(res, FUTURE, "股", kind, float(df['close'].iloc[-1]))))
+    return out
+
+
+def write_stocks(writer, n):
+    for k in range(n):
+        writer.write(f"60000{k}", f"股{k}", DATES[-1], results(k))
+
+
+@pytest.mark.parametrize("fmt", ["csv", "jsonl"])
+def test_text_writers_readable_after_each_stock(fmt):
+    writer = open_writer(fmt, base=os.path.join("out", "x"))
+    rows_path, summary_path = writer.paths()
+    write_stocks(writer, 1)
+    # 未关闭时已写出的股票就能读回
+    read = pd.read_csv if fmt == "csv" else (lambda p: pd.read_json(p, lines=True, dtype=False))
+    first = read(rows_path)
+    assert len(first) == writer.rows == 2 * 6
+    write_stocks(writer, 3)
+    writer.close()
+    rows, summary = read(rows_path), read(summary_path)
+    assert list(rows.columns) == [name for name, _ in ROW_SCHEMA]
+    assert list(summary.columns) == [name for name, _ in SUMMARY_SCHEMA]
+    assert len(rows) == writer.rows == 4 * 12 and len(summary) == writer.summaries == 8
+    assert set(summary['rule']) == {"10日", "30日"}
+    assert (summary['horizon'] == 3).all() and summary['min_space_day'].between(0, 3).all()
+
+
+def test_jsonl_writes_nan_as_null():
+    with open_writer("jsonl", base="y") as writer:
+        write_stocks(writer, 1)
+        writer._write("summary", pd.DataFrame({"code": ["600009"], "min_space": [np.nan]}))
+    with open("y_summary.jsonl", encoding="utf-8") as f:
+        # 标准 JSON 没有 NaN，下游按严格 JSON 解析
+        records = [json.loads(line, parse_constant=lambda c: pytest.fail(c)) for line in f]
+    assert len(records) == 3 and records[-1]["min_space"] is None
+
+
+def test_writer_base_class_is_abstract():
+    with pytest.raises(TypeError):
+        ResultWriter("z")
+
+
+def test_open_writer_formats():
+    assert open_writer(None) is None and open_writer("") is None
+    with pytest.raises(ValueError):
+        open_writer("xlsx")
+
+
+def test_parquet_flushes_by_rows_and_stocks():
+    pytest.importorskip("pyarrow")
+    writer = calASM_export.ParquetWriter("p", part_rows=30, part_stocks=4)
+    rows_dir, summary_dir = writer.paths()
+    write_stocks(writer, 3)
+    # 3 只股票 36 行明细已写出一个分片，汇总 6 行还在缓冲
+    assert len(os.listdir(rows_dir)) == 1 and not os.listdir(summary_dir)
+    write_stocks(writer, 1)
+    assert len(os.listdir(summary_dir)) == 1
+    writer.close()
+    assert len(pd.read_parquet(rows_dir)) == writer.rows == 48
+    assert len(pd.read_parquet(summary_dir)) == writer.summaries == 8
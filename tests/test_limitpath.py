@@ -0,0 +1,97 @@
+"""
+calASM_limitpath 逐价位涨停路径: 与逐日 Decimal 四舍五入的参考实现对照
+"""
+from decimal import Decimal, ROUND_HALF_UP
+
+import numpy as np
+import pandas as pd
+
+from calASM_limitpath import allowed_boards, limit_path_lines, limit_up_ladder, simulate_limit_paths
+
+
+def ref_limit_up(price, ratio):
+    return float((Decimal(str(price)) * Decimal(str(ratio))).quantize(Decimal("0.01"), rounding=ROUND_HALF_UP))
+
+
+def ref_ladder(price, ratio, steps):
+    out = []
+    for _ in range(steps):
+        price = ref_limit_up(price, ratio)
+        out.append(price)
+    return out
+
+
+def ref_boards(p_prev, p_base, index_cum, threshold, ratio):
+    boards, price = 0, p_prev
+    while True:
+        price = ref_limit_up(price, ratio)
+        if (price / p_base - 1) * 100 - index_cum >= threshold:
+            return boards
+        boards += 1
+
+
+def test_ladder_rounds_each_day_to_cents():
+    rng = np.random.default_rng(0)
+    for price, ratio in zip(np.round(rng.uniform(1, 200, 300), 2).tolist(), rng.choice([1.05, 1.10, 1.20, 1.30], 300)):
+        ladder = limit_up_ladder(int(round(price * 100)), float(ratio), 12) / 100
+        assert ladder.tolist() == ref_ladder(price, float(ratio), 12), (price, ratio)
+
+
+def test_ladder_broadcasts():
+    ladder = limit_up_ladder(np.array([[1000], [1999]]), np.array([[1.10], [1.05]]), 3)
+    assert ladder.shape == (2, 1, 3)
+    assert ladder[0, 0].tolist() == [1100, 1210, 1331] and ladder[1, 0].tolist() == [2099, 2204, 2314]
+
+
+def test_allowed_boards_matches_reference():
+    rng = np.random.default_rng(1)
+    n = 300
+    p_prev = np.round(rng.uniform(2, 100, n), 2)
+    p_base = np.round(p_prev * rng.uniform(0.5, 1.5, n), 2)
+    index_cum = np.round(rng.uniform(-10, 10, n), 4)
+    ratio = rng.choice([1.05, 1.10, 1.20, 1.30], n)
+    for threshold in (100.0, 200.0):
+        got = allowed_boards(p_prev, p_base, index_cum, threshold, ratio)
+        want = [ref_boards(*row, threshold, r) for *row, r in zip(p_prev.tolist(), p_base.tolist(),
+                                                                   index_cum.tolist(), ratio.tolist())]
+        assert got.tolist() == want
+
+
+def test_allowed_boards_missing_inputs():
+    got = allowed_boards([10.0, np.nan, 10.0, 10.0, 0.0], [10.0, 10.0, np.nan, 10.0, 10.0], 0.0, 100.0,
+                         [1.10, 1.10, 1.10, np.nan, 1.10])
+    # 不设涨跌幅限制 (nan) 的日子与缺失输入都为 0
+    assert got.tolist() == [7, 0, 0, 0, 0]
+    assert allowed_boards([], [], [], 100.0, []).shape == (0,)
+
+
+def test_simulated_path_moves_base_into_the_future():
+    closes = np.array([[10.0] * 5, [20.0] * 5])
+    index = np.full((2, 5), 3000.0)
+    res = simulate_limit_paths(closes, index, days=3, threshold=30.0, limit_ratio=[1.10, 1.20], horizon=6)
+    assert res["path"][0].tolist() == ref_ladder(10.0, 1.10, 6)
+    # T+4 起基准日在 T 之后，基准价为路径上第 k-3 天的涨停价
+    assert res["base_price"][0, :3].tolist() == [10.0, 10.0, 10.0]
+    assert res["base_price"][0, 3:].tolist() == res["path"][0, :3].tolist()
+    # 10%: 11.00、12.10、13.31 (33.1% 触线)；20%: 24.00、28.80 (44% 触线)
+    assert res["first_trigger"].tolist() == [3, 2]
+    assert res["triggered"][0].tolist() == [False, False, True, True, True, True]
+    assert res["boards"][0].tolist() == [2] * 6
+
+
+def test_short_history_and_bad_price():
+    closes = np.array([[10.0, 10.5], [np.nan, np.nan]])
+    res = simulate_limit_paths(closes, np.full((2, 2), 3000.0), days=5, threshold=100.0, limit_ratio=1.10,
+                               horizon=4)
+    # 基准日早于数据首日的预测日没有偏离
+    assert np.isnan(res["deviation"][0, :3]).all() and np.isfinite(res["deviation"][0, 3])
+    assert np.isnan(res["path"][1]).all() and res["first_trigger"][1] == 0
+
+
+def test_limit_path_lines():
+    merged = pd.DataFrame({"close": np.full(40, 10.0), "index_close": np.full(40, 3000.0)})
+    lines = limit_path_lines(merged, 1.10, horizon=5)
+    assert len(lines) == 2
+    assert "T+1..T+5 连续涨停也不触线" in lines[0]
+    lines = limit_path_lines(merged, 1.10, horizon=100)
+    assert "第 8 个涨停 (T+8) 触线" in lines[0] and "收盘 21.43" in lines[0]
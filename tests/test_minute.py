@@ -0,0 +1,89 @@
+"""
+calASM_minute 分钟线增量缓存: 只请求最后一根缓存分钟之后的数据，拼接结果与整天下载一致
+"""
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+import calASM_minute
+from calASM_minute import MinuteBarCache, parse_since, to_bars
+
+DATE = "20260105"
+
+
+def day_frame(date, end, seed=0):
+    """date 当天 09:30 到 end 的 1 分钟线 (akshare 列名)"""
+    times = pd.date_range(f"{date} 09:30", f"{date} {end}", freq="min")
+    rng = np.random.default_rng(seed)
+    close = np.round(10 + np.cumsum(rng.normal(0, 0.02, len(times))), 2)
+    return pd.DataFrame({"时间": times.strftime("%Y-%m-%d %H:%M:%S"), "开盘": close, "收盘": close,
+                         "最高": close + 0.01, "最低": close - 0.01, "成交量": np.arange(len(times)) * 100})
+
+
+class FakeFeed:
+    """按当前时刻 end 提供分钟线；最后一根未走完时收盘价与走完后不同"""
+
+    def __init__(self):
+        self.end = "10:00"
+        self.starts = []
+
+    def __call__(self, code, start, kind="stock"):
+        start = pd.Timestamp(start)
+        self.starts.append(start.strftime("%H:%M"))
+        bars = to_bars(day_frame(start.strftime("%Y%m%d"), self.end))
+        bars[-1]["close"] += 7
+        return bars[bars["time"] >= np.datetime64(start, "m")]
+
+
+def test_to_bars():
+    df = pd.DataFrame({"时间": ["2026-01-05 09:32:00", "2026-01-05 09:31:00", "2026-01-05 09:33:00"],
+                       "开盘": [10.0, np.nan, 10.2], "收盘": [10.015, 10.1, 0.0], "成交量": [100, 200, 300]})
+    bars = to_bars(df)
+    # 按时间排序，收盘为 0 的分钟丢弃，缺失的开盘与缺失的最高/最低列按收盘补
+    assert bars["time"].astype(str).tolist() == ["2026-01-05T09:31", "2026-01-05T09:32"]
+    assert bars["close"].tolist() == [1010, 1002] and bars["open"].tolist() == [1010, 1000]
+    assert bars["high"].tolist() == [1010, 1002] and bars["volume"].tolist() == [200, 100]
+    assert len(to_bars(None)) == 0 and to_bars(None).dtype == calASM_minute.BAR_DTYPE
+
+
+def test_incremental_refresh_matches_full_day(monkeypatch):
+    feed = FakeFeed()
+    monkeypatch.setattr(calASM_minute, "download_bars", feed)
+    cache = MinuteBarCache()
+    first = cache.refresh("600001", date=DATE)
+    assert feed.starts == ["09:15"] and len(first) == 31
+    feed.end = "10:10"
+    bars = cache.refresh("600001", date=DATE, force=True)
+    # 第二次只从最后一根缓存分钟 (10:00，尚未走完) 开始请求，并用新数据覆盖它
+    assert feed.starts == ["09:15", "10:00"] and cache.transferred == 31 + 11
+    full = to_bars(day_frame(DATE, "10:10"))
+    np.testing.assert_array_equal(bars[:-1], full[:-1])
+    assert bars["close"][30] == full["close"][30] and bars["close"][-1] == full["close"][-1] + 7
+
+
+def test_settled_day_is_read_from_store(monkeypatch):
+    feed = FakeFeed()
+    monkeypatch.setattr(calASM_minute, "download_bars", feed)
+    MinuteBarCache().refresh("600001", date=DATE)
+    # 另一个进程 (新的缓存对象) 直接读盘，不再下载
+    bars = MinuteBarCache().refresh("600001", date=DATE)
+    assert feed.starts == ["09:15"] and len(bars) == 31
+    assert MinuteBarCache().refresh("000300", kind="index", date=DATE) is not None
+    assert feed.starts == ["09:15", "09:15"]
+
+
+def test_bars_since_and_latest(monkeypatch):
+    monkeypatch.setattr(calASM_minute, "download_bars", FakeFeed())
+    cache = MinuteBarCache()
+    since = cache.bars("600001", since="09:55", date=DATE)
+    assert pd.Timestamp(since["time"][0]).strftime("%H:%M") == "09:56" and len(since) == 5
+    latest = cache.latest("600001")
+    today = datetime.now().strftime("%Y-%m-%d")
+    assert latest["time"] == f"{today} 10:00:00" and latest["price"] == int(cache.refresh("600001")["close"][-1]) / 100
+
+
+def test_parse_since():
+    assert parse_since("10:30", DATE) == np.datetime64("2026-01-05T10:30")
+    assert parse_since(datetime(2026, 1, 5, 13, 1, 30), DATE) == np.datetime64("2026-01-05T13:01")
+    assert parse_since(None, DATE) is None
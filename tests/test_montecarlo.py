@@ -0,0 +1,56 @@
+"""
+calASM_montecarlo 触线概率: 合成行情上的确定性检查 (固定种子)
+"""
+import numpy as np
+import pandas as pd
+
+from calASM_montecarlo import estimate_many, simulate_paths, trigger_probability
+
+DATES = [d.strftime("%Y%m%d") for d in pd.bdate_range("2026-01-05", periods=60)]
+
+
+def frame(seed=0, n=len(DATES), drift=0.005):
+    rng = np.random.default_rng(seed)
+    close = np.round(10 * np.cumprod(1 + rng.normal(drift, 0.02, n)), 2)
+    index = np.round(3000 * np.cumprod(1 + rng.normal(0, 0.01, n)), 2)
+    return pd.DataFrame({"date": DATES[:n], "close": close, "index_close": index})
+
+
+def test_monte_carlo_is_deterministic_for_constant_returns():
+    # 个股每天约 +8%、指数不变: 抽到的收益几乎相同，每条路径的结果一致
+    closes = np.round(10 * 1.08 ** np.arange(40), 2)
+    index = np.full(40, 3000.0)
+    res = trigger_probability(closes, index, 1.10, 10, rules=((10, 100.0),), n_paths=200, seed=1)
+    daily = res[(10, 100.0)]["daily"]
+    assert set(np.unique(daily)) <= {0.0, 1.0}
+    cumulative = res[(10, 100.0)]["cumulative"]
+    assert (np.diff(cumulative) >= 0).all()
+    # 连续涨 8%: 10 日累计约 116%，已在触线之上
+    assert daily[0] == 1.0
+
+
+def test_monte_carlo_clips_to_limit_and_is_seeded():
+    closes = np.round(10 * 1.15 ** np.arange(20), 2)     # 每天 +15%，模拟时被 10% 涨停截断
+    index = np.full(20, 3000.0)
+    paths, i_paths = simulate_paths(closes, index, 1.10, 3, n_paths=5, seed=0)
+    start = int(round(closes[-1] * 100))
+    first = (start * 110 + 50) // 100
+    assert (np.rint(paths[:, 0] * 100) == first).all()
+    assert (np.rint(paths[:, 1] * 100) == (first * 110 + 50) // 100).all()
+    assert (i_paths == 3000.0).all()
+
+    df = frame(3)
+    a = trigger_probability(df['close'], df['index_close'], 1.10, 5, n_paths=500, seed=7)
+    b = trigger_probability(df['close'], df['index_close'], 1.10, 5, n_paths=500, seed=7)
+    for key in a:
+        np.testing.assert_array_equal(a[key]["cumulative"], b[key]["cumulative"])
+
+
+def test_estimate_many_same_in_process_and_pool():
+    frames = {f"60000{k}": (frame(k, drift=0.03), 1.10) for k in range(3)}
+    serial = estimate_many(frames, 5, n_paths=300, seed=11, workers=1)
+    pooled = estimate_many(frames, 5, n_paths=300, seed=11, workers=2)
+    assert list(serial) == list(frames)
+    for code in frames:
+        for key in serial[code]:
+            np.testing.assert_array_equal(serial[code][key]["daily"], pooled[code][key]["daily"])
@@ -0,0 +1,150 @@
+"""
+calASM_numeric 与原先 Decimal 语义的对照测试
+
+参考实现就是原脚本的写法: Decimal(str(value)).quantize(..., ROUND_HALF_UP / ROUND_CEILING)，
+以及逐步 Decimal 运算的区间偏离公式。样本为固定种子的随机值，覆盖 x.xx5 平局、负数、nan / inf 与大数。
+"""
+import math
+import os
+import sys
+from decimal import Decimal, ROUND_CEILING, ROUND_HALF_UP
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from calASM_numeric import (ceil_to, ceil_to_array, cum_deviation, cum_deviation_array, round_half_up,
+                            round_half_up_array)
+
+DECIMALS = (0, 1, 2, 3, 4)
+
+
+def ref_round_half_up(value, decimals=2):
+    try:
+        d = Decimal(str(value))
+        fmt = "0." + "0" * decimals if decimals else "0"
+        return float(d.quantize(Decimal(fmt), rounding=ROUND_HALF_UP))
+    except Exception:
+        return value
+
+
+def ref_ceil_to(value, decimals=2):
+    try:
+        d = Decimal(str(value))
+        fmt = "0." + "0" * decimals if decimals else "0"
+        return float(d.quantize(Decimal(fmt), rounding=ROUND_CEILING))
+    except Exception:
+        return value
+
+
+def ref_cum_deviation(p_end, p_base, i_end, i_base):
+    try:
+        d_p_end, d_p_base = Decimal(str(p_end)), Decimal(str(p_base))
+        d_i_end, d_i_base = Decimal(str(i_end)), Decimal(str(i_base))
+        stock_cum_d = ((d_p_end / d_p_base) - 1) * 100
+        index_cum_d = ((d_i_end / d_i_base) - 1) * 100
+        return float(stock_cum_d), float(index_cum_d), float(stock_cum_d - index_cum_d)
+    except Exception:
+        with np.errstate(invalid='ignore', divide='ignore'):
+            stock_cum = (np.float64(p_end) / np.float64(p_base) - 1) * 100
+            index_cum = (np.float64(i_end) / np.float64(i_base) - 1) * 100
+        return float(stock_cum), float(index_cum), float(stock_cum - index_cum)
+
+
+def same(a, b):
+    """数值相同且符号相同 (区分 -0.0)，nan 视为相等"""
+    if isinstance(a, float) and isinstance(b, float) and math.isnan(a) and math.isnan(b):
+        return True
+    return a == b and math.copysign(1.0, a) == math.copysign(1.0, b)
+
+
+def samples(decimals, n=4000, seed=0):
+    """随机值 + 恰在平局上的值 (x.xx5) + 平局附近一个 ulp 的值 + 负数 + 大数 + 特殊值"""
+    rng = np.random.default_rng(seed + decimals)
+    scale = 10 ** decimals
+    plain = rng.uniform(-1000, 1000, n)
+    ties = (rng.integers(-10 ** 6, 10 ** 6, n) + 0.5) / scale
+    near = np.concatenate([np.nextafter(ties, np.inf), np.nextafter(ties, -np.inf)])
+    literal_ties = [float(f"{k}.{'0' * max(decimals, 0)}5") for k in rng.integers(-5000, 5000, 200)]
+    large = np.concatenate([rng.uniform(-1e12, 1e12, 200), rng.uniform(-1e17, 1e17, 50), [1e300, -1e300]])
+    tiny = rng.uniform(-1e-3, 1e-3, 200)
+    special = [0.0, -0.0, 0.5, -0.5, 2.675, -2.675, 1.005, -1.005, 1e-10, -1e-10, 0.125, -0.125,
+               float("nan"), float("inf"), float("-inf")]
+    return [float(v) for v in np.concatenate([plain, ties, near, literal_ties, large, tiny])] + special
+
+
+@pytest.mark.parametrize("decimals", DECIMALS)
+def test_round_half_up_matches_decimal(decimals):
+    for v in samples(decimals):
+        assert same(round_half_up(v, decimals), ref_round_half_up(v, decimals)), (v, decimals)
+
+
+@pytest.mark.parametrize("decimals", DECIMALS)
+def test_ceil_to_matches_decimal(decimals):
+    for v in samples(decimals, seed=100):
+        assert same(ceil_to(v, decimals), ref_ceil_to(v, decimals)), (v, decimals)
+
+
+@pytest.mark.parametrize("decimals", DECIMALS)
+def test_array_versions_match_scalar(decimals):
+    values = samples(decimals, seed=200)
+    rounded = round_half_up_array(values, decimals)
+    ceiled = ceil_to_array(values, decimals)
+    for v, r, c in zip(values, rounded.tolist(), ceiled.tolist()):
+        assert same(r, ref_round_half_up(v, decimals)), (v, decimals)
+        assert same(c, ref_ceil_to(v, decimals)), (v, decimals)
+
+
+def test_round_half_up_non_numeric_passthrough():
+    assert round_half_up("abc") == "abc"
+    assert round_half_up(None) is None
+    assert round_half_up("2.675") == 2.68
+    assert round_half_up(3) == 3.0
+
+
+def deviation_samples(n=3000, seed=7):
+    """行情样本 (分、万分点网格上) 与未取整的任意小数，含相同基准、下跌、极端涨幅"""
+    rng = np.random.default_rng(seed)
+    grid = [(round(a, 2), round(b, 2), round(c, 4), round(d, 4)) for a, b, c, d in zip(
+        rng.uniform(1, 500, n), rng.uniform(1, 500, n), rng.uniform(500, 15000, n), rng.uniform(500, 15000, n))]
+    raw = [tuple(float(x) for x in row) for row in zip(
+        rng.uniform(0.01, 500, n), rng.uniform(0.01, 500, n), rng.uniform(1, 15000, n), rng.uniform(1, 15000, n))]
+    edge = [
+        (12.345, 10.01, 3123.45678, 3001.234),
+        (10.0, 10.0, 3000.0, 3000.0),
+        (5.0, 10.0, 3000.0, 3100.0),
+        (1e6, 0.01, 1e5, 1.0),
+        (12.34, 0.0, 3000.0, 3000.0),
+        (float("nan"), 10.0, 3000.0, 3000.0),
+        (12.34, 10.0, float("nan"), 3000.0),
+        (12.34, 10.0, 3000.0, float("inf")),
+    ]
+    return grid + raw + edge
+
+
+def test_cum_deviation_matches_decimal_formula():
+    for row in deviation_samples():
+        got, want = cum_deviation(*row), ref_cum_deviation(*row)
+        assert all(same(g, w) for g, w in zip(got, want)), (row, got, want)
+
+
+def test_cum_deviation_does_not_quantize_inputs():
+    # 价格 12.345 不能先取整为 12.35、指数 3123.45678 不能先取整为 3123.4568
+    _, _, deviation = cum_deviation(12.345, 10.01, 3123.45678, 3001.234)
+    assert deviation == ref_cum_deviation(12.345, 10.01, 3123.45678, 3001.234)[2]
+    assert round(deviation, 4) == 19.2543
+
+
+def test_cum_deviation_array_matches_scalar():
+    rows = np.array(deviation_samples(seed=11), dtype=np.float64)
+    stock, index, deviation = cum_deviation_array(rows[:, 0], rows[:, 1], rows[:, 2], rows[:, 3])
+    for row, s, i, d in zip(rows.tolist(), stock.tolist(), index.tolist(), deviation.tolist()):
+        want = ref_cum_deviation(*row)
+        assert all(same(g, w) for g, w in zip((s, i, d), want)), (row, (s, i, d), want)
+
+
+def test_cum_deviation_array_broadcasts():
+    stock, index, deviation = cum_deviation_array([[12.34], [13.0]], 10.0, [3100.0, 3200.0], 3000.0)
+    assert deviation.shape == (2, 2)
+    assert same(float(deviation[1, 0]), ref_cum_deviation(13.0, 10.0, 3100.0, 3000.0)[2])
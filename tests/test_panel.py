@@ -0,0 +1,103 @@
+"""
+MarketPanel 横截面计算与逐只分析 (period_result / 规则引擎) 逐位一致
+"""
+import numpy as np
+import pandas as pd
+
+import calASM_panel
+from calASM_panel import MarketPanel, load_panel
+from calASM_period import period_result
+from calASM_rules import AnomalyRule, ALL_BOARDS, evaluate_rules
+
+DATES = [d.strftime("%Y%m%d") for d in pd.bdate_range("2026-01-05", periods=80)]
+FUTURE = [d.strftime("%Y%m%d") for d in pd.bdate_range("2026-04-27", periods=40)]
+
+
+def make_panel(n=6, seed=0):
+    """n 只股票的随机行情；第 2 只中途停牌 5 天，第 3 只晚 20 天上市"""
+    rng = np.random.default_rng(seed)
+    stocks = []
+    for k in range(n):
+        close = np.round(10 * np.cumprod(1 + rng.normal(0.01, 0.03, len(DATES))), 2)
+        df = pd.DataFrame({"date": DATES, "close": close})
+        if k == 1:
+            df = df.drop(index=range(50, 55))
+        if k == 2:
+            df = df.iloc[20:]
+        stocks.append((f"60000{k}", f"股{k}", df.reset_index(drop=True), "idx", 1.10))
+    index = np.round(3000 * np.cumprod(1 + rng.normal(0, 0.01, len(DATES))), 2)
+    return MarketPanel.from_frames(stocks, {"idx": pd.DataFrame({"date": DATES, "index_close": index})}, DATES)
+
+
+def test_predict_matches_period_result():
+    panel = make_panel()
+    for days, threshold in ((10, 100.0), (30, 200.0)):
+        pred = panel.predict(days, threshold, horizon=35)
+        for r, code in enumerate(panel.codes):
+            res = period_result(panel.frame(code), FUTURE[:35], days, threshold, 1.10)
+            fut = res.offset > 0
+            k = res.offset[fut] - 1
+            for key in ("deviation", "trigger_price", "room_pct", "boards", "triggered"):
+                np.testing.assert_array_equal(pred[key][r, k], getattr(res, key)[fut], err_msg=f"{code} {key}")
+
+
+def test_window_deviation_matches_engine():
+    panel = make_panel(seed=1)
+    rule = AnomalyRule("10日", 10, 100.0, "up", "cum", ALL_BOARDS)
+    dev = panel.window_deviation(10)
+    for r, code in enumerate(panel.codes):
+        frame = panel.frame(code)
+        res, = evaluate_rules(frame['close'].to_numpy(), frame['index_close'].to_numpy(), [rule])
+        cols = np.flatnonzero(panel.listed[r])
+        np.testing.assert_array_equal(dev[r, cols[10:]], res["deviation"][10:])
+        # 上市不足 10 个交易日的列没有偏离
+        assert np.isnan(dev[r, cols[:10]]).all()
+
+
+def test_suspension_keeps_market_calendar():
+    panel = make_panel()
+    r = panel.row["600001"]
+    assert panel.suspended[r].sum() == 5
+    assert panel.close_ffill[r, 52] == panel.close_ffill[r, 49]
+    assert not panel.listed[panel.row["600002"], :20].any()
+
+
+class MemorySource:
+    """内存数据源: missing 中的代码取不到行情，failing 中的代码取数抛异常"""
+
+    def __init__(self, missing=(), failing=()):
+        self.missing, self.failing = set(missing), set(failing)
+        self.index_calls = 0
+
+    def calendar(self):
+        return DATES
+
+    def stock_daily(self, code, date):
+        if code in self.failing:
+            raise ConnectionError("timed out")
+        if code in self.missing:
+            return None
+        return pd.DataFrame({"date": DATES, "close": np.linspace(10, 12, len(DATES))})
+
+    def index_daily(self, index_code, date):
+        self.index_calls += 1
+        return pd.DataFrame({"date": DATES, "index_close": np.full(len(DATES), 3000.0)})
+
+
+def test_load_panel_skips_failures(monkeypatch):
+    monkeypatch.setattr(calASM_panel, "get_market_rules", lambda code: ("idx", "指数", 1.10))
+    source, lines = MemorySource(missing={"600002"}, failing={"600003"}), []
+    stock_list = [(f"60000{k}", f"股{k}") for k in range(1, 5)]
+    panel = load_panel(stock_list, DATES[40], source, log=lines.append, pause=0)
+    assert panel.codes == ["600001", "600004"] and panel.names == ["股1", "股4"]
+    # 截到分析日，指数只取一次
+    assert panel.dates[-1] == DATES[40] and source.index_calls == 1
+    assert any("[跳过]" in line and "600002" in line for line in lines)
+    assert any("网络请求超时" in line for line in lines)
+
+
+def test_load_panel_stop_and_empty(monkeypatch):
+    monkeypatch.setattr(calASM_panel, "get_market_rules", lambda code: ("idx", "指数", 1.10))
+    stock_list = [("600001", "股1"), ("600002", "股2")]
+    assert load_panel(stock_list, DATES[-1], MemorySource(), log=lambda msg: None, stop=lambda: True) is None
+    assert load_panel(stock_list, DATES[-1], MemorySource(missing={"600001", "600002"}), log=lambda msg: None) is None
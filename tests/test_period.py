@@ -0,0 +1,118 @@
+"""
+calASM_period 区间偏离明细: 偏移范围、预测日基准、压缩展示、汇总
+"""
+import numpy as np
+import pandas as pd
+import pytest
+
+from calASM_data import future_trading_dates
+from calASM_numeric import cum_deviation, round_half_up
+from calASM_period import (MAX_HORIZON, OVERVIEW_FULL_DAYS, date_label, overview_columns, overview_days,
+                           period_result, period_summary)
+
+DATES = [d.strftime("%Y%m%d") for d in pd.bdate_range("2026-01-05", periods=40)]
+CALENDAR = [d.strftime("%Y%m%d") for d in pd.bdate_range("2026-01-05", periods=60)]
+
+
+def frame(seed=0, n=len(DATES)):
+    rng = np.random.default_rng(seed)
+    close = np.round(10 * np.cumprod(1 + rng.normal(0.005, 0.02, n)), 2)
+    index = np.round(3000 * np.cumprod(1 + rng.normal(0, 0.01, n)), 2)
+    pct = np.r_[0.0, np.round((close[1:] / close[:-1] - 1) * 100, 2)]
+    return pd.DataFrame({"date": DATES[:n], "close": close, "pct_chg": pct, "index_close": index})
+
+
+def test_offsets_and_history_rows():
+    df = frame()
+    future = future_trading_dates(DATES[-1], 3, CALENDAR)
+    res = period_result(df, future, 10, 100.0, 1.10)
+    assert res.offset.tolist() == [-2, -1, 0, 1, 2, 3]
+    assert res.kinds == ["历史", "历史", "今日", "预测", "预测", "预测"]
+    assert res.dates.tolist()[:3] == DATES[-3:]
+    assert res.dates.tolist()[3] == date_label(CALENDAR[40], 1)
+    # 历史行: 精确公式，基准为 10 个交易日前
+    close, index = df['close'].to_numpy(), df['index_close'].to_numpy()
+    for row, t in zip(range(3), range(len(df) - 3, len(df))):
+        assert res.base_dates[row] == DATES[t - 10]
+        assert res.deviation[row] == cum_deviation(close[t], close[t - 10], index[t], index[t - 10])[2]
+    # 预测行: 股价不变，实际涨幅为 0，触线价四舍五入到分
+    assert (res.actual_pct[3:] == 0).all()
+    k = 1
+    base = len(df) - 1 + k - 10
+    _, i_cum, _ = cum_deviation(close[-1], close[base], index[-1], index[base])
+    assert res.trigger_price[3] == round_half_up(close[base] * (1 + (100.0 + i_cum) / 100))
+
+
+def test_horizon_beyond_rule_days_and_calendar():
+    df = frame(1)
+    future = future_trading_dates(DATES[-1], 30, CALENDAR)
+    # 日历只剩 20 天，其余按工作日顺延
+    assert len(future) == 30 and future[:20] == CALENDAR[40:] and future[20] > CALENDAR[-1]
+    res = period_result(df, future, 10, 100.0, 1.10)
+    fut = res.offset > 0
+    assert len(res) == 33 and res.offset[fut].tolist() == list(range(1, 31))
+    # T+11 起基准日落在 T 之后 (假设股价与指数不变): 偏离为 0，触线价为现价上浮阈值
+    late = res.offset > 10
+    price = float(df['close'].iloc[-1])
+    assert (res.deviation[late] == 0).all()
+    assert (res.trigger_price[late] == round_half_up(price * 2)).all()
+    assert res.base_dates[res.row(11)] == future[0] and res.base_dates[res.row(30)] == future[19]
+    # 连板: 从现价起 7 个 10% 涨停仍未翻倍，第 8 个触线
+    assert (res.boards[late] == 7).all()
+
+
+def test_short_history_drops_rows_without_base():
+    df = frame(2, n=12)
+    res = period_result(df, DATES[12:15], 10, 100.0, 1.10)
+    # 只有 T-1、T 两行有 10 日前的基准
+    assert res.offset.tolist() == [-1, 0, 1, 2, 3]
+    # 不足 30 日时连预测行也没有基准
+    assert len(period_result(df, DATES[12:15], 30, 200.0, 1.10)) == 0
+
+
+def test_condensed_keeps_history_and_milestones():
+    df = frame(3)
+    future = future_trading_dates(DATES[-1], MAX_HORIZON, CALENDAR)
+    res = period_result(df, future, 30, 200.0, 1.10)
+    small = res.condensed()
+    shown = [i + 1 for i in overview_days(MAX_HORIZON)]
+    assert small.offset.tolist() == [-2, -1, 0] + shown
+    assert shown == [1, 2, 3, 4, 5, 10, 20, 40, 60, 120, 250]
+    for off in shown:
+        assert small.trigger_price[small.row(off)] == res.trigger_price[res.row(off)]
+    # 不超过 OVERVIEW_FULL_DAYS 天时原样返回
+    short = period_result(df, future[:OVERVIEW_FULL_DAYS], 30, 200.0, 1.10)
+    assert short.condensed() is short
+    assert len(small.to_frame()) == len(small)
+
+
+def test_overview_days():
+    assert overview_days(3) == [0, 1, 2]
+    assert overview_days(OVERVIEW_FULL_DAYS) == list(range(OVERVIEW_FULL_DAYS))
+    assert overview_days(33) == [0, 1, 2, 3, 4, 9, 19, 32]
+
+
+def test_summary_and_overview_columns():
+    df = frame(4)
+    future = future_trading_dates(DATES[-1], 25, CALENDAR)
+    res = period_result(df, future, 10, 100.0, 1.10)
+    summary = period_summary(res, future, "股", "10日", float(df['close'].iloc[-1]))
+    assert len(summary.dates) == 25 and summary.dates[0] == date_label(future[0])
+    assert summary.trigger[0] == res.trigger_price[res.row(1)]
+    assert summary.today_deviation == res.deviation[res.row(0)]
+    assert summary.today_pct == df['pct_chg'].iloc[-1]
+    assert summary.first_space() == pytest.approx(res.room_pct[res.row(1)])
+    cols = overview_columns(summary)
+    assert [i for i, _ in cols] == overview_days(25)
+    assert cols[-1][1] == date_label(future[24], 25)
+    assert summary.cells(0)[0] == f"{summary.trigger[0]:.2f}"
+
+
+def test_formatted_frame():
+    res = period_result(frame(5), DATES[:3], 10, 100.0, 1.10)
+    table = res.to_frame()
+    assert list(table.columns) == ["日期", "类型", "基准日期", "实际涨幅", "区间偏离", "剩余空间", "触线价格",
+                                   "允许涨幅", "允许连板"]
+    assert table['区间偏离'].str.endswith("%").all()
+    raw = res.to_frame(formatted=False)
+    assert raw['offset'].tolist() == res.offset.tolist() and raw['已触发'].dtype == bool
@@ -0,0 +1,72 @@
+"""
+calASM_prefetch 启动预取: 任务顺序、失败与联网计数、前台分析时让行
+"""
+import pytest
+
+import calASM_prefetch
+from calASM_cache import data_store
+from calASM_prefetch import Prefetcher
+
+INDEX = {"600001": "sh000001", "600002": "sh000001", "300001": "sz399006"}
+
+
+@pytest.fixture
+def calls(monkeypatch):
+    """各数据函数经共享数据仓库 "下载"，记录调用顺序"""
+    calls = []
+
+    def fetch(label, value=1):
+        calls.append(label)
+        return data_store().get_or_fetch("test", label, lambda: value)
+
+    def market_rules(code):
+        if code not in INDEX:
+            raise ValueError(code)
+        return INDEX[code], "指数", 1.10
+
+    monkeypatch.setattr(calASM_prefetch, "ensure_fresh", lambda: fetch("主表"))
+    monkeypatch.setattr(calASM_prefetch, "fetch_trade_calendar", lambda: fetch("日历", ["20260105"]))
+    monkeypatch.setattr(calASM_prefetch, "get_market_rules", market_rules)
+    monkeypatch.setattr(calASM_prefetch, "fetch_index_daily", lambda c: fetch(c))
+    monkeypatch.setattr(calASM_prefetch, "fetch_stock_daily",
+                        lambda c, date, log=None: fetch(c, None if c == "600002" else 1))
+    return calls
+
+
+def test_tasks_in_order_and_counts(calls):
+    status = []
+    p = Prefetcher(["600001", "bad", "300001", "600002"], target_date="20260105", on_status=status.append, delay=0)
+    assert [label for label, _ in p.tasks()] == ["证券主表", "交易日历", "指数 sh000001", "指数 sz399006",
+                                                 "日线 600001", "日线 300001", "日线 600002"]
+    calls.clear()
+    p.run()
+    assert calls == ["主表", "日历", "sh000001", "sz399006", "600001", "300001", "600002"]
+    # 600002 的日线取不到 (None): 计为失败，也不写入仓库
+    assert (p.done, p.failed, p.fetched) == (7, 1, 7) and p.finished.is_set()
+    assert status[-1].startswith("预取完成: 7 项 (联网 7 项，失败 1 项)")
+    # 再次预取全部命中缓存，只有取不到的那一项重新联网
+    again = Prefetcher(["600001", "300001", "600002"], delay=0)
+    again.run()
+    assert (again.done, again.fetched) == (7, 1)
+
+
+def test_pause_waits_for_foreground(calls):
+    status = []
+    p = Prefetcher(["600001"], on_status=status.append, delay=0)
+    p.pause()
+    p.start()
+    assert not p.finished.wait(0.2) and calls == []
+    assert status == ["预取已暂停 (前台分析中)，已完成 0 项"]
+    p.resume()
+    assert p.finished.wait(5) and p.done == 4
+
+
+def test_stop_while_paused(calls):
+    status = []
+    p = Prefetcher(["600001"], on_status=status.append, delay=0)
+    p.pause()
+    p.start()
+    assert not p.finished.wait(0.1)
+    p.stop()
+    assert p.finished.wait(5) and p.done == 0 and calls == []
+    assert not any(s.startswith("预取完成") for s in status)
@@ -0,0 +1,79 @@
+"""
+calASM_premarket 盘前触线价格表: 存取、查表结果与面板预测一致
+"""
+import os
+
+import numpy as np
+import pandas as pd
+
+from calASM_panel import MarketPanel
+from calASM_premarket import TriggerTable, build_table, latest_table_path, save_table
+
+DATES = [d.strftime("%Y%m%d") for d in pd.bdate_range("2026-01-05", periods=60)]
+
+
+def make_panel(seed=0):
+    """三只股票；第 3 只上市不足 10 天"""
+    rng = np.random.default_rng(seed)
+    stocks = []
+    for k in range(3):
+        close = np.round(10 * np.cumprod(1 + rng.normal(0.01, 0.03, len(DATES))), 2)
+        df = pd.DataFrame({"date": DATES, "close": close})
+        stocks.append((f"60000{k}", f"股{k}", df.iloc[-8:] if k == 2 else df, "idx", 1.10))
+    index = np.round(3000 * np.cumprod(1 + rng.normal(0, 0.01, len(DATES))), 2)
+    return MarketPanel.from_frames(stocks, {"idx": pd.DataFrame({"date": DATES, "index_close": index})}, DATES)
+
+
+def test_save_and_load_round_trip():
+    panel = make_panel()
+    path = save_table(build_table(panel, horizon=4), path="t1.npz")
+    table = TriggerTable.load(path)
+    assert table.date == DATES[-1] and table.codes == panel.codes and table.names == panel.names
+    assert table.rules == [(10, 100.0), (30, 200.0)] and table.horizon == 4
+    np.testing.assert_array_equal(table.trigger_price[0], panel.predict(10, 100.0, 4)["trigger_price"])
+    assert "600001" in table and "600009" not in table
+    assert TriggerTable.load("missing.npz") is None
+
+
+def test_latest_table_path():
+    os.makedirs("tables")
+    panel = make_panel()
+    for at in (-3, -1, -2):
+        table = build_table(panel, at=at)
+        save_table(table, path=os.path.join("tables", f"trigger_{table['date']}.npz"))
+    assert latest_table_path("tables").endswith(f"trigger_{DATES[-1]}.npz")
+    assert latest_table_path("nowhere") is None
+
+
+def test_lookup_matches_panel_prediction():
+    panel = make_panel()
+    table = TriggerTable(build_table(panel, horizon=3, at=-2))
+    assert table.date == DATES[-2]
+    for k in (1, 2, 3):
+        res = table.evaluate(table.close, k=k)
+        for days, threshold in table.rules:
+            pred = panel.predict(days, threshold, 3, at=len(DATES) - 2)
+            np.testing.assert_array_equal(res[(days, threshold)]["deviation"], pred["deviation"][:, k - 1])
+            np.testing.assert_array_equal(res[(days, threshold)]["trigger_price"], pred["trigger_price"][:, k - 1])
+    # 给出与收盘相同的指数点位时，重新折算的触线价与表中一致
+    same = table.evaluate(table.close, index_levels=table.index_close)
+    np.testing.assert_array_equal(same[(10, 100.0)]["trigger_price"], table.trigger_price[0, :, 0])
+
+
+def test_distance_around_trigger_price():
+    table = TriggerTable(build_table(make_panel(1)))
+    trigger = table.trigger_price[0, 0, 0]
+    above = table.distance("600000", round(trigger + 0.01, 2))[(10, 100.0)]
+    below = table.distance("600000", round(trigger - 0.01, 2))[(10, 100.0)]
+    assert above["triggered"] and not below["triggered"] and below["room_pct"] > 0
+    # 指数上涨时触线价随之上调
+    higher = table.distance("600000", trigger, index_level=table.index_close[0] * 1.02)[(10, 100.0)]
+    assert higher["trigger_price"] > trigger
+
+
+def test_describe():
+    table = TriggerTable(build_table(make_panel(2)))
+    lines = table.describe("600000", 12.34)
+    assert lines[0].startswith("股0(600000) 价格 12.34 @T+1") and len(lines) == 3
+    short = table.describe("600002", 12.34)
+    assert all("数据不足" in line for line in short[1:])
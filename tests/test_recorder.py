@@ -0,0 +1,135 @@
+"""
+calASM_recorder 关键帧 / 增量帧存档: 记录后按任意时刻回读与原快照一致
+"""
+import os
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import calASM_data
+from calASM_recorder import IntradayArchive, SnapshotRecorder, parse_time, snapshot_columns
+
+DATE = "20260105"
+
+
+def snapshots(count=9, seed=0):
+    """count 次快照 [(时刻, DataFrame)]；第 4 次起多一只新股，第 2 只股票有时停牌 ('-')"""
+    rng = np.random.default_rng(seed)
+    codes = ["600001", "000002", "300003"]
+    price = np.array([10.0, 20.0, 30.0])
+    out = []
+    for i in range(count):
+        if i == 3:
+            codes, price = codes + ["920004"], np.r_[price, 5.0]
+        price = np.round(price * (1 + rng.normal(0, 0.01, len(price))), 2)
+        df = pd.DataFrame({
+            "代码": codes, "名称": [f"股{c}" for c in codes], "最新价": price, "最高": np.round(price * 1.02, 2),
+            "最低": np.round(price * 0.98, 2), "今开": price, "昨收": np.round(price / 1.01, 2),
+            "成交量": rng.integers(0, 10 ** 7, len(codes)), "成交额": rng.uniform(0, 1e9, len(codes)).round(),
+        })
+        if i % 4 == 1:
+            cols = ["最新价", "最高", "最低"]
+            df[cols] = df[cols].astype(object)
+            df.loc[1, cols] = "-"
+        minute = 9 * 60 + 30 + i * 5
+        out.append((f"{minute // 60:02d}{minute % 60:02d}00", df))
+    return out
+
+
+def record(directory, snaps, keyframe_every=4):
+    recorder = SnapshotRecorder(directory, keyframe_every=keyframe_every)
+    for t, df in snaps:
+        recorder.capture(df, now=datetime.strptime(DATE + t, "%Y%m%d%H%M%S"))
+    return recorder
+
+
+def expected(df, codes):
+    """快照在存档列下标上的整数状态 (不在快照里的股票为 0)"""
+    snap_codes, _, values = snapshot_columns(df)
+    col = {c: i for i, c in enumerate(codes)}
+    out = {}
+    for field, v in values.items():
+        full = np.zeros(len(codes), dtype=np.int64)
+        full[[col[c] for c in snap_codes]] = v
+        out[field] = full
+    return out
+
+
+def test_round_trip_every_snapshot():
+    snaps = snapshots()
+    record("arch", snaps)
+    archive = IntradayArchive(DATE, directory="arch")
+    assert archive.codes.tolist() == ["600001", "000002", "300003", "920004"]
+    assert archive.times() == [t for t, _ in snaps]
+    # 第 0、4、8 次为关键帧，其余为增量帧
+    assert [archive._is_key(t) for t in archive.times()] == [i % 4 == 0 for i in range(len(snaps))]
+    for (t, df), (got_t, state) in zip(snaps, archive.frames()):
+        assert got_t == t
+        want = expected(df, archive.codes.tolist())
+        for field in want:
+            np.testing.assert_array_equal(state[field], want[field], err_msg=f"{t} {field}")
+
+
+def test_query_from_the_middle_reads_from_keyframe(monkeypatch):
+    snaps = snapshots()
+    record("arch", snaps)
+    archive = IntradayArchive(DATE, directory="arch")
+    read = []
+    real_read = archive._read
+    monkeypatch.setattr(archive, "_read", lambda t: read.append(t) or real_read(t))
+    t, state = archive.state_at("09:52")
+    # 09:50 之前最近的关键帧是 09:50 本身
+    assert t == "095000" and read == ["095000"]
+    read.clear()
+    t, state = archive.state_at("10:05")
+    assert t == "100500" and read == ["095000", "095500", "100000", "100500"]
+    np.testing.assert_array_equal(state["price"], expected(snaps[7][1], archive.codes.tolist())["price"])
+
+
+def test_as_of_and_price_at():
+    snaps = snapshots()
+    record("arch", snaps)
+    archive = IntradayArchive(DATE, directory="arch")
+    df = archive.as_of("0945")
+    src = snaps[3][1]
+    assert df.attrs["time"] == "09:45:00"
+    assert df['最新价'].tolist() == src['最新价'].tolist()
+    assert archive.price_at("920004", "09:40") is None           # 09:45 才出现
+    assert archive.price_at("920004", "09:45") == src['最新价'].iloc[3]
+    assert archive.price_at("000002", "09:35") is None           # 停牌
+    assert archive.as_of("09:00") is None
+    series = archive.series("600001", "09:40", "09:50")
+    assert series['时间'].tolist() == ["09:40:00", "09:45:00", "09:50:00"]
+    assert series['最新价'].tolist() == [s['最新价'].iloc[0] for _, s in snaps[2:5]]
+    # 按最高价筛选与实时快照同一函数
+    assert calASM_data.filter_by_high(df, float(src['最高'].iloc[0]))['代码'].tolist() == ["600001"]
+
+
+def test_restarted_recorder_keeps_columns_and_starts_with_keyframe():
+    snaps = snapshots()
+    record("arch", snaps[:5])
+    record("arch", snaps[5:])
+    archive = IntradayArchive(DATE, directory="arch")
+    assert archive.codes.tolist() == ["600001", "000002", "300003", "920004"]
+    assert archive._is_key("095500")
+    _, state = archive.state_at("10:10")
+    np.testing.assert_array_equal(state["volume"], expected(snaps[8][1], archive.codes.tolist())["volume"])
+
+
+def test_deltas_are_compact():
+    record("arch", snapshots(count=2))
+    with np.load(os.path.join("arch", DATE, "093500.npz")) as z:
+        assert not bool(z["key"]) and z["price"].dtype in (np.int8, np.int16, np.int32)
+
+
+@pytest.mark.parametrize("text, want", [("10:30", "103000"), ("1030", "103000"), ("930", "093000"),
+                                        ("10:30:15", "103015"), ("14:00", "140000")])
+def test_parse_time(text, want):
+    assert parse_time(text) == want
+
+
+def test_parse_time_rejects():
+    with pytest.raises(ValueError):
+        parse_time("ab:cd")
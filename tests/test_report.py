@@ -0,0 +1,74 @@
+"""
+calASM_report 单文件 HTML 报告: 总览表列结构、配色类、文字转义、明细压缩
+"""
+import os
+import re
+
+import numpy as np
+import pandas as pd
+
+from calASM_data import future_trading_dates
+from calASM_period import PeriodSummary, overview_columns, period_result, period_summary
+from calASM_report import detail_table, overview_table, render_report, write_report
+
+DATES = [d.strftime("%Y%m%d") for d in pd.bdate_range("2026-01-05", periods=40)]
+CALENDAR = [d.strftime("%Y%m%d") for d in pd.bdate_range("2026-01-05", periods=80)]
+
+
+def frame(seed=0):
+    rng = np.random.default_rng(seed)
+    close = np.round(10 * np.cumprod(1 + rng.normal(0.005, 0.02, len(DATES))), 2)
+    index = np.round(3000 * np.cumprod(1 + rng.normal(0, 0.01, len(DATES))), 2)
+    return pd.DataFrame({"date": DATES, "close": close, "index_close": index})
+
+
+def rows(fragment, section="tbody"):
+    body = re.search(f"<{section}>(.*?)</{section}>", fragment).group(1)
+    return re.findall(r"<tr>(.*?)</tr>", body)
+
+
+def test_overview_columns_and_classes():
+    dates = ["01-12", "01-13", "01-14"]
+    items = [PeriodSummary("甲<b>", "10日", 10.0, dates, np.array([20.0, 20.5, np.nan]), np.array([5.0, 25.0, np.nan]),
+                           np.array([1, 0, 0]), np.array([False, False, False])),
+             PeriodSummary("乙", "10日", 10.0, dates, np.array([9.0, 9.0, 9.0]), np.array([0.0, 0.0, 0.0]),
+                           np.array([0, 0, 0]), np.array([True, True, True]))]
+    out = overview_table("10日(100%)", items)
+    head = rows(out, "thead")[0]
+    assert head.count("<th") == 2 + 3 * 3 and "01-12 触线价" in head
+    body = rows(out)
+    assert len(body) == 2 and "甲&lt;b&gt;" in body[0]
+    assert '<td class="day-odd lt10">5.00%</td>' in body[0] and '<td class="lt30">25.00%</td>' in body[0]
+    # 缺失的预测日三格都是 '-'，已触发的允许涨幅为红底
+    assert '<td class="day-odd board">1</td>' in body[0] and body[0].endswith('<td class="day-odd">-</td>' * 3)
+    assert len(re.findall(r'<td class="(?:day-odd )?hit">', body[1])) == 3
+    assert "连板" not in overview_table("综合", items, show_boards=False) and overview_table("空", []) == ""
+
+
+def test_detail_table_matches_frame():
+    future = future_trading_dates(DATES[-1], 30, CALENDAR)
+    res = period_result(frame(), future, 10, 100.0, 1.10)
+    out = detail_table(res)
+    df = res.to_frame()
+    body = rows(out)
+    assert len(body) == len(df) and rows(out, "thead")[0].count("<th") == len(df.columns)
+    assert body[0].count('class="t-hist"') == 1 and 't-today' in body[res.kinds.index("今日")]
+    # 报告里的明细按总览的日子压缩
+    assert len(rows(detail_table(res.condensed()))) < len(df)
+    assert detail_table(None) == ""
+
+
+def test_render_and_write_report():
+    future = future_trading_dates(DATES[-1], 5, CALENDAR)
+    res_10 = period_result(frame(1), future, 10, 100.0, 1.10)
+    res_30 = period_result(frame(1), future, 30, 200.0, 1.10)
+    summary = period_summary(res_10, future, "甲", "10日", 10.0)
+    assert len(overview_columns(summary)) == 5
+    details = [("甲", "600001", DATES[-1], res_10, res_30)]
+    text = render_report("异动 & 分析", [("10日(100%)", [summary], True)], details)
+    assert text.startswith("<!DOCTYPE html>") and "<title>异动 &amp; 分析</title>" in text
+    assert text.count("<details>") == 1 and f"甲(600001) 异动分析({DATES[-1]})" in text
+    path = write_report("异动分析", [("10日(100%)", [summary], True)], details)
+    assert os.path.dirname(path) == "reports" and path.endswith(".html")
+    with open(path, encoding="utf-8") as f:
+        assert f.read().count('<table class="detail">') == 2
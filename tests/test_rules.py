@@ -0,0 +1,128 @@
+"""
+calASM_rules 规则注册表与单遍引擎；10日/30日明细表取自引擎结果
+"""
+from decimal import Decimal
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import calASM_rules as rules
+from calASM_api import analyze_frame
+from calASM_period import period_result
+from calASM_rules import evaluate_rules, get_rules, register_rule
+
+DATES = [d.strftime("%Y%m%d") for d in pd.bdate_range("2026-01-05", periods=90)]
+
+
+def market(seed=0, n=70):
+    rng = np.random.default_rng(seed)
+    close = np.round(10 * np.cumprod(1 + rng.normal(0.01, 0.03, n)), 2)
+    index = np.round(3000 * np.cumprod(1 + rng.normal(0, 0.01, n)), 2)
+    return close, index
+
+
+def frame(close, index):
+    n = len(close)
+    pct = np.r_[0.0, (close[1:] / close[:-1] - 1) * 100]
+    return pd.DataFrame({"date": DATES[:n], "close": close, "pct_chg": pct, "index_close": index})
+
+
+def rule(name, days, threshold, direction="up", method="cum"):
+    return rules.AnomalyRule(name, days, threshold, direction, method, rules.ALL_BOARDS)
+
+
+def test_cum_rule_matches_decimal_formula():
+    close, index = market()
+    res, = evaluate_rules(close, index, [rule("10日", 10, 100.0)])
+    assert np.isnan(res["deviation"][:10]).all()
+    for t in range(10, len(close)):
+        s = (Decimal(str(close[t])) / Decimal(str(close[t - 10])) - 1) * 100
+        i = (Decimal(str(index[t])) / Decimal(str(index[t - 10])) - 1) * 100
+        assert res["deviation"][t] == float(s - i)
+        assert res["index_cum"][t] == float(i)
+
+
+def test_sum_rule_is_rolling_sum_of_daily_deviation():
+    close, index = market(1)
+    res, = evaluate_rules(close, index, [rule("3日", 3, 20.0, "both", "sum")])
+    daily = (close[1:] / close[:-1] - index[1:] / index[:-1]) * 100
+    expected = np.convolve(daily, np.ones(3), "valid")     # 第 t 个为 t+1..t+3 日之和
+    np.testing.assert_allclose(res["deviation"][3:], expected[:len(close) - 3], rtol=1e-12)
+    assert np.isnan(res["index_cum"]).all()
+
+
+def test_directions():
+    close = np.array([10.0] * 11 + [30.0, 3.0])
+    index = np.full(13, 3000.0)
+    up, down, both = evaluate_rules(close, index, [rule("up", 10, 100.0), rule("down", 10, -50.0, "down"),
+                                                   rule("both", 10, 100.0, "both")])
+    assert up["triggered"].tolist()[-2:] == [True, False]
+    assert down["triggered"].tolist()[-2:] == [False, True]
+    assert both["triggered"].tolist()[-2:] == [True, False]
+    assert up["today"]["left_space"] == pytest.approx(100 - (-70))
+    assert down["today"]["left_space"] == pytest.approx(-70 - (-50))
+
+
+def test_next_day_trigger_price_is_rounded_boundary():
+    # 触线价为恰好触线的价格四舍五入到分 (原口径)，高一分必触发，低一分必不触发
+    close, index = market(2)
+    for r in (rule("10日", 10, 100.0), rule("30日", 30, 200.0)):
+        res, = evaluate_rules(close, index, [r])
+        price = res["today"]["trigger_price"]
+        nxt = lambda p: evaluate_rules(np.r_[close, p], np.r_[index, index[-1]], [r])[0]["deviation"][-1]
+        assert nxt(round(price + 0.01, 2)) >= r.threshold
+        assert nxt(round(price - 0.01, 2)) < r.threshold
+        assert abs(nxt(price) - r.threshold) < 0.01 / price * 100
+
+
+def test_register_rule_replaces_and_filters_by_board():
+    saved = list(rules.RULES)
+    try:
+        register_rule("测试规则", 5, 50.0, boards=(rules.BOARD_BSE,))
+        register_rule("测试规则", 6, 60.0, boards=(rules.BOARD_BSE,))
+        mine = [r for r in rules.RULES if r.name == "测试规则"]
+        assert len(mine) == 1 and mine[0].days == 6
+        assert mine[0] in get_rules(rules.BOARD_BSE) and mine[0] not in get_rules(rules.BOARD_SH_MAIN)
+        with pytest.raises(ValueError):
+            register_rule("坏规则", 5, 50.0, direction="sideways")
+    finally:
+        rules.RULES[:] = saved
+
+
+def test_board_rules():
+    names = lambda board: {r.name for r in get_rules(board)}
+    assert "3日异常波动" in names(rules.BOARD_SH_MAIN)
+    assert "3日异常波动(20cm)" in names(rules.BOARD_CHINEXT) and "3日异常波动" not in names(rules.BOARD_CHINEXT)
+    assert rules.get_board("688001") == rules.BOARD_STAR and rules.get_board("920001") == rules.BOARD_BSE
+
+
+def test_period_table_is_derived_from_engine():
+    close, index = market(3)
+    df = frame(close, index)
+    future = DATES[len(close):len(close) + 5]
+    a = analyze_frame("600001", df, future, 1.10)
+    engine = {r["rule"].days: r for r in evaluate_rules(close, index, get_rules(rules.BOARD_SH_MAIN))
+              if r["rule"].method == "cum" and r["rule"].direction == "up"}
+    for days in (10, 30):
+        res = a.result(days)
+        hist = res.offset <= 0
+        rows = len(close) - 1 + res.offset[hist]
+        np.testing.assert_array_equal(res.deviation[hist], engine[days]["deviation"][rows])
+        np.testing.assert_array_equal(res.triggered[hist], engine[days]["triggered"][rows])
+        # T+1 触线价与引擎的次日触线价一致
+        assert res.trigger_price[res.offset == 1][0] == engine[days]["today"]["trigger_price"]
+        # 不经引擎单独计算的结果相同
+        alone = period_result(df, future, days, float(days * 10 if days == 10 else 200), 1.10)
+        np.testing.assert_array_equal(alone.deviation, res.deviation)
+        np.testing.assert_array_equal(alone.trigger_price, res.trigger_price)
+    # 状态只含该板块的注册规则
+    assert [s["rule"].name for s in a.status] == [r.name for r in get_rules(rules.BOARD_SH_MAIN)]
+
+
+def test_custom_table_rule_is_evaluated_once():
+    close, index = market(4)
+    a = analyze_frame("600001", frame(close, index), DATES[70:73], 1.10, rules=((5, 30.0),))
+    res = a.result(5)
+    assert len(res.offset) == 6 and (res.offset > 0).sum() == 3
+    assert not any(s["rule"].days == 5 for s in a.status)
@@ -0,0 +1,62 @@
+"""
+calASM_scenario 情景网格: 零涨跌情景与预测表一致，情景方向单调
+"""
+import numpy as np
+import pandas as pd
+import pytest
+
+from calASM_period import period_result
+from calASM_scenario import parse_moves, scenario_grid, scenario_grid_from_frames, stack_tails
+
+DATES = [d.strftime("%Y%m%d") for d in pd.bdate_range("2026-01-05", periods=60)]
+FUTURE = [d.strftime("%Y%m%d") for d in pd.bdate_range("2026-03-30", periods=40)]
+
+
+def frame(seed=0, n=len(DATES), drift=0.005):
+    rng = np.random.default_rng(seed)
+    close = np.round(10 * np.cumprod(1 + rng.normal(drift, 0.02, n)), 2)
+    index = np.round(3000 * np.cumprod(1 + rng.normal(0, 0.01, n)), 2)
+    return pd.DataFrame({"date": DATES[:n], "close": close, "index_close": index})
+
+
+def test_parse_moves():
+    assert parse_moves("-1:1:0.5").tolist() == [-1.0, -0.5, 0.0, 0.5, 1.0]
+    assert parse_moves("-3:3:0.5").tolist()[-1] == 3.0 and len(parse_moves("-3:3:0.5")) == 13
+    assert parse_moves("-2, 0 1.5").tolist() == [-2.0, 0.0, 1.5]
+    for bad in ("", "1:2", "1:2:0", "a,b"):
+        with pytest.raises(ValueError):
+            parse_moves(bad)
+
+
+def test_stack_tails():
+    out = stack_tails([[1, 2, 3, 4], [5], []], 3)
+    np.testing.assert_array_equal(out[0], [2, 3, 4])
+    assert np.isnan(out[1, :2]).all() and out[1, 2] == 5 and np.isnan(out[2]).all()
+
+
+def test_flat_scenario_matches_period_table():
+    frames = [(frame(k), ratio) for k, ratio in enumerate((1.10, 1.20, 1.05))]
+    for days, threshold in ((10, 100.0), (30, 200.0)):
+        grid = scenario_grid_from_frames(frames, days, threshold, 35, [0.0], [0.0])
+        assert grid["deviation"].shape == (3, 1, 1, 35)
+        for i, (df, ratio) in enumerate(frames):
+            res = period_result(df, FUTURE[:35], days, threshold, ratio)
+            fut = res.offset > 0
+            np.testing.assert_allclose(grid["deviation"][i, 0, 0], res.deviation[fut], rtol=0, atol=1e-9)
+            np.testing.assert_array_equal(grid["trigger_price"][i, 0, 0], res.trigger_price[fut])
+            np.testing.assert_array_equal(grid["boards"][i, 0, 0], res.boards[fut])
+
+
+def test_scenario_paths_and_monotonic_moves():
+    closes = np.full((1, 11), 10.0)
+    index = np.full((1, 11), 3000.0)
+    grid = scenario_grid(closes, index, 10, 100.0, 1.10, 5,
+                         index_moves=[-1.0, 0.0, 1.0], stock_moves=[0.0, 5.0, 10.0])
+    dev = grid["deviation"][0]
+    # 个股涨得越多、指数涨得越少，偏离越大
+    assert (np.diff(dev, axis=1) > 0).all() and (np.diff(dev, axis=0) < 0).all()
+    # 每天 +10%: 路径逐日四舍五入到分 11.00、12.10、13.31、14.64、16.10
+    np.testing.assert_allclose(dev[1, 2], [10.0, 21.0, 33.1, 46.4, 61.0])
+    # T+1 的基准与指数都还是历史值: 触线价为基准价翻倍，现价起 7 个涨停仍未触线
+    assert grid["trigger_price"][0, 1, 1, 0] == 20.0
+    assert (grid["boards"][0, 1, :, 0] == 7).all()
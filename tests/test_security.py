@@ -0,0 +1,86 @@
+"""
+证券主表: 交易所列表合并、某个列表取不到时沿用上一份主表，ST 与涨跌停比例识别
+"""
+import pandas as pd
+import pytest
+
+import calASM_data
+import calASM_security
+from calASM_cache import DataStore
+from calASM_data import fetch_security_list
+from calASM_security import SecurityMaster, no_limit_dates
+
+
+def sources(failing=()):
+    """四个交易所列表 (与 SECURITY_SOURCES 同序)，failing 中的序号取数时抛异常"""
+    frames = [
+        pd.DataFrame({"证券代码": ["600001", "600002"], "证券简称": ["*ST 甲", "乙"],
+                      "上市日期": ["2000-01-04", "2026-01-06"]}),
+        pd.DataFrame({"证券代码": ["688001"], "证券简称": ["ST丙"], "上市日期": ["2019-07-22"]}),
+        pd.DataFrame({"A股代码": [1, 300001], "A股简称": ["平安 银行", "ST丁"], "A股上市日期": ["1991-04-03", ""]}),
+        pd.DataFrame({"证券代码": ["920001"], "证券简称": ["戊"], "上市日期": ["2020-01-01"]}),
+    ]
+
+    def loader(i):
+        def load():
+            if i in failing:
+                raise ConnectionError("board offline")
+            return frames[i]
+        return load
+    return tuple((boards, loader(i), *cols) for i, (boards, _, *cols) in enumerate(calASM_data.SECURITY_SOURCES))
+
+
+def test_security_list_merges_exchange_lists(monkeypatch):
+    monkeypatch.setattr(calASM_data, "SECURITY_SOURCES", sources())
+    df = fetch_security_list()
+    assert list(df['code']) == ["600001", "600002", "688001", "000001", "300001", "920001"]
+    assert df.set_index("code")['name']['000001'] == "平安银行"
+    assert list(df['list_date']) == ["20000104", "20260106", "20190722", "19910403", "", "20200101"]
+
+
+def test_failed_board_keeps_previous_rows(monkeypatch):
+    monkeypatch.setattr(calASM_data, "SECURITY_SOURCES", sources())
+    previous = fetch_security_list()
+    monkeypatch.setattr(calASM_data, "SECURITY_SOURCES", sources(failing={0}))
+    df = fetch_security_list(previous)
+    # 沪主板列表取不到: 沿用上一份主表的沪主板记录，*ST 仍按 5% 涨跌停
+    assert sorted(df['code']) == sorted(previous['code'])
+    master = SecurityMaster(df)
+    assert master.get("600001").st and master.get("600001").limit_ratio == 1.05
+    # 没有上一份主表、或上一份里也没有该板块时不返回残缺的表
+    assert fetch_security_list() is None
+    assert fetch_security_list(previous.iloc[2:]) is None
+
+
+def test_refresh_master_uses_latest_stored_table(monkeypatch):
+    store = DataStore()
+    monkeypatch.setattr(calASM_data, "SECURITY_SOURCES", sources())
+    store.put("security", "20000101", fetch_security_list())
+    monkeypatch.setattr(calASM_data, "SECURITY_SOURCES", sources(failing={2}))
+    master = calASM_security.refresh_master(store)
+    assert master is not None and len(master) == 6
+    assert master.get("300001").st and master.get("300001").limit_ratio == 1.20
+
+
+def test_master_lookup_and_fallback():
+    master = SecurityMaster(pd.DataFrame({"code": ["600001", "1"], "name": ["*ST甲", "平安银行"],
+                                          "list_date": ["20260106", None]}))
+    assert master.get("000001").name == "平安银行" and master.get("000001").list_date == ""
+    assert master.get("600001").limit_ratio == 1.05
+    # 主表没有的代码按前缀推断
+    unknown = master.get("688999")
+    assert unknown.name == "688999" and not unknown.st and unknown.limit_ratio == 1.20
+    assert master.name("688999", "默认") == "默认"
+
+
+def test_no_limit_dates():
+    calendar = [d.strftime("%Y%m%d") for d in pd.bdate_range("2026-01-05", periods=10)]
+    assert no_limit_dates("600002", calendar, "20260106") == tuple(calendar[1:6])
+    assert no_limit_dates("300001", calendar, "20260106") == tuple(calendar[1:6])
+    assert no_limit_dates("600002", calendar, "20250101") == ()
+    assert no_limit_dates("600002", calendar, "") == ()
+
+
+@pytest.mark.parametrize("name, st", [("*ST甲", True), ("S*ST乙", True), ("st丙", True), ("平安银行", False)])
+def test_is_st(name, st):
+    assert calASM_security.is_st(name) == st
@@ -0,0 +1,143 @@
+"""
+本地分析服务: 在 localhost 临时端口上启动，注入内存面板，不联网
+"""
+import asyncio
+import json
+from concurrent.futures import ThreadPoolExecutor
+import urllib.error
+import urllib.request
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import calASM_service
+from calASM_panel import MarketPanel
+from calASM_period import MAX_HORIZON
+
+DATES = [d.strftime("%Y%m%d") for d in pd.bdate_range("2026-01-05", periods=60)]
+
+
+def make_panel(codes):
+    """第一只股票每天涨 7% (10日偏离接近 100%，30日已触发)，其余走平"""
+    stocks = []
+    for i, code in enumerate(codes):
+        close = 10 * 1.07 ** np.arange(len(DATES)) if i == 0 else np.full(len(DATES), 10.0 + i)
+        stocks.append((code, f"股{code}", pd.DataFrame({"date": DATES, "close": np.round(close, 2)}), "idx", 1.10))
+    index = pd.DataFrame({"date": DATES, "index_close": np.full(len(DATES), 3000.0)})
+    return MarketPanel.from_frames(stocks, {"idx": index}, DATES)
+
+
+class PanelService(calASM_service.AnalysisService):
+    """面板由内存数据组装；panel_calls 为实际计算次数"""
+
+    def __init__(self, delay=0.0):
+        super().__init__()
+        self.delay = delay
+        self.panel_calls = 0
+
+    async def panel(self, codes, date):
+        self.panel_calls += 1
+        await asyncio.sleep(self.delay)
+        return make_panel(codes) if codes else None
+
+
+@pytest.fixture(autouse=True)
+def offline(monkeypatch):
+    # 跨日刷新证券主表会联网，测试中跳过
+    monkeypatch.setattr(calASM_service, "ensure_fresh", lambda: None)
+
+
+def get(port, path):
+    try:
+        with urllib.request.urlopen(f"http://127.0.0.1:{port}{path}", timeout=10) as resp:
+            return resp.status, json.loads(resp.read().decode("utf-8"))
+    except urllib.error.HTTPError as e:
+        return e.code, json.loads(e.read().decode("utf-8"))
+
+
+def serve(service, *paths, concurrent=1):
+    """启动服务，每个 path 并发请求 concurrent 次，返回 [(状态码, JSON), ...]"""
+    async def run():
+        server, _ = await calASM_service.start_server(service, port=0)
+        port = server.sockets[0].getsockname()[1]
+        loop = asyncio.get_running_loop()
+        pool = ThreadPoolExecutor(max_workers=len(paths) * concurrent)
+        try:
+            return await asyncio.gather(*(loop.run_in_executor(pool, get, port, path)
+                                          for path in paths for _ in range(concurrent)))
+        finally:
+            pool.shutdown()
+            server.close()
+            await server.wait_closed()
+    return asyncio.run(run())
+
+
+def test_analyse():
+    (status, body), = serve(PanelService(), "/analyse?codes=600001,sz000002&horizon=4&date=" + DATES[-1])
+    assert status == 200 and body["horizon"] == 4
+    assert sorted(body["stocks"]) == ["000002", "600001"]
+    s = body["stocks"]["600001"]
+    assert s["close"] == round(10 * 1.07 ** 59, 2) and s["date"] == DATES[-1]
+    assert set(s["rules"]) == {"10日(100%)", "30日(200%)"}
+    assert len(s["rules"]["10日(100%)"]["trigger_price"]) == 4
+    assert s["status"]
+
+
+def test_screen():
+    (status, body), = serve(PanelService(), "/screen?codes=600001,000002&near=50")
+    assert status == 200 and body["near"] == 50.0
+    assert {h["code"] for h in body["hits"]} == {"600001"}
+    rooms = [h["room_pct"] for h in body["hits"]]
+    assert rooms == sorted(rooms)
+
+
+@pytest.mark.parametrize("query", [
+    "/analyse?codes=600001&horizon=0",
+    "/analyse?codes=600001&horizon=-3",
+    f"/analyse?codes=600001&horizon={MAX_HORIZON + 1}",
+    "/analyse?codes=600001&horizon=100000",
+    "/analyse?codes=600001&horizon=abc",
+    "/screen?near=-1",
+    "/screen?near=nan",
+    "/screen?near=1e9",
+    "/daily?code=bogus",
+    "/find",
+])
+def test_bad_parameters(query):
+    service = PanelService()
+    (status, body), = serve(service, query)
+    assert status == 400 and "参数错误" in body["error"]
+    assert service.panel_calls == 0
+
+
+def test_unknown_path():
+    (status, _), = serve(PanelService(), "/nope")
+    assert status == 404
+
+
+def test_concurrent_requests_coalesce():
+    service = PanelService(delay=0.5)
+    results = serve(service, "/analyse?codes=600001,000002&horizon=3&date=" + DATES[-1], concurrent=8)
+    assert [status for status, _ in results] == [200] * 8
+    assert all(body == results[0][1] for _, body in results)
+    assert service.panel_calls == 1
+    assert len(service.inflight) == 0
+
+
+def test_inflight_shares_one_result():
+    calls = []
+
+    async def work():
+        calls.append(1)
+        await asyncio.sleep(0.05)
+        return len(calls)
+
+    async def run():
+        inflight = calASM_service.InFlight()
+        first = await asyncio.gather(*(inflight.do("k", work) for _ in range(5)))
+        second = await inflight.do("k", work)
+        return first, second
+
+    first, second = asyncio.run(run())
+    assert first == [1] * 5 and second == 2
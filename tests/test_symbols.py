@@ -0,0 +1,42 @@
+"""
+calASM_symbols 代码规范化与自选列表去重
+"""
+import pytest
+
+from calASM_symbols import dedupe_stocks, normalize_code, parse_codes, parse_stock_list
+
+
+@pytest.mark.parametrize("raw", ["600372", "sh600372", "SH600372", "SH.600372", "sh-600372", "sh_600372",
+                                 "600372.SH", "600372.ss", " 600372 ", "SS600372"])
+def test_normalize_variants(raw):
+    assert normalize_code(raw) == "600372"
+
+
+@pytest.mark.parametrize("raw", ["", "60037", "6003720", "sh600372.SH", "XX600372", "600372.HK", "abc", None])
+def test_normalize_rejects(raw):
+    assert normalize_code(raw) is None
+
+
+def test_dedupe_keeps_first_name_and_order():
+    stocks, duplicates, invalid = dedupe_stocks([
+        ("sz002149", "西部材料"), ("600372", "中航机载"), ("002149.SZ", "别名"), ("bogus", "坏"), ("300058", "300058"),
+    ])
+    assert stocks == [("002149", "西部材料"), ("600372", "中航机载"), ("300058", "300058")]
+    assert duplicates == ["002149.SZ"] and invalid == ["bogus"]
+
+
+def test_dedupe_replaces_raw_code_as_name():
+    # 名称就是原始写法 (只粘贴了代码) 时用规范代码作名称
+    stocks, _, _ = dedupe_stocks([("sh600372", "sh600372")])
+    assert stocks == [("600372", "600372")]
+
+
+def test_parse_stock_list_text():
+    text = "600372 中航机载\nsh600372,重复\n\n002149，西部材料\n  300058\nfoo bar\n"
+    stocks, duplicates, invalid = parse_stock_list(text)
+    assert stocks == [("600372", "中航机载"), ("002149", "西部材料"), ("300058", "300058")]
+    assert duplicates == ["sh600372"] and invalid == ["foo"]
+
+
+def test_parse_codes():
+    assert parse_codes("600372, sh002149，600372.SH,,bad,920001") == ["600372", "002149", "920001"]
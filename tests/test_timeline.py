@@ -0,0 +1,77 @@
+"""
+calASM_timeline 盘中偏离走势: 分钟网格对齐、逐分钟偏离与逐点精确计算一致、首次临近/触线时刻
+"""
+import numpy as np
+import pandas as pd
+
+import calASM_timeline
+from calASM_minute import BAR_DTYPE
+from calASM_numeric import cum_deviation
+from calASM_timeline import align_bars, base_closes, build_timeline, deviation_timeline, minute_grid, minute_label
+
+DATE = "20260105"
+HISTORY = [d.strftime("%Y%m%d") for d in pd.bdate_range("2025-11-03", "2026-01-02")]
+
+
+def make_bars(times, closes):
+    bars = np.zeros(len(times), dtype=BAR_DTYPE)
+    bars["time"] = np.array([f"2026-01-05T{t}" for t in times], dtype="datetime64[m]")
+    bars["close"] = np.round(np.asarray(closes) * 100).astype(np.int32)
+    return bars
+
+
+def test_minute_grid_and_align():
+    grid = minute_grid(DATE)
+    assert len(grid) == 240 and minute_label(grid, 0) == "09:31" and minute_label(grid, 119) == "11:30"
+    assert minute_label(grid, 120) == "13:01" and minute_label(grid, 239) == "15:00" and minute_label(grid, -1) == "-"
+    out = align_bars(make_bars(["09:31", "09:33", "13:01"], [10.0, 10.5, 11.0]), grid)
+    # 缺的分钟沿用前一根收盘，午休跨过去，最新一分钟之后为 nan
+    assert out[:3].tolist() == [10.0, 10.0, 10.5] and out[119] == 10.5 and out[120] == 11.0
+    assert np.isnan(out[121:]).all() and np.isnan(align_bars(None, grid)).all()
+
+
+def test_base_closes():
+    merged = pd.DataFrame({"date": HISTORY, "close": np.arange(len(HISTORY), dtype=float),
+                           "index_close": 3000.0 + np.arange(len(HISTORY))})
+    # 表中尚无 T 日: 基准为倒数第 days 行
+    assert base_closes(merged, DATE, 10) == (len(HISTORY) - 10, 3000.0 + len(HISTORY) - 10)
+    # 表中已有 T 日 (收盘后): 基准为 T 往前 days 行
+    assert base_closes(merged, HISTORY[-1], 10) == (len(HISTORY) - 11, 3000.0 + len(HISTORY) - 11)
+    assert np.isnan(base_closes(merged.iloc[:5], DATE, 10)).all()
+
+
+def test_deviation_timeline_events():
+    prices = np.array([[10.0, 18.0, 19.5, 20.1, 19.0], [10.0, np.nan, 10.5, 10.4, 10.6]])
+    res = deviation_timeline(prices, np.full((2, 5), 3000.0), [10.0, 10.0], [3000.0, 3000.0], 100.0)
+    assert res["trigger_price"][0].tolist() == [20.0] * 5
+    assert res["first_near"].tolist() == [2, -1] and res["first_cross"].tolist() == [3, -1]
+    assert res["peak"].tolist() == [3, 4] and res["room_pct"][0, 3] == 0.0
+    assert res["triggered"][0].tolist() == [False, False, False, True, False]
+
+
+def test_build_timeline_matches_exact_deviation(monkeypatch):
+    rng = np.random.default_rng(0)
+    frames, bars = {}, {}
+    for code, ratio in (("600001", 1.10), ("300002", 1.20)):
+        merged = pd.DataFrame({"date": HISTORY, "close": np.round(rng.uniform(5, 50, len(HISTORY)), 2),
+                               "index_close": np.round(rng.uniform(2900, 3100, len(HISTORY)), 2)})
+        frames[code] = (f"股{code}", merged, ratio)
+        bars[("stock", code)] = make_bars(["09:31", "10:00", "13:30"], np.round(rng.uniform(5, 50, 3), 2))
+    bars[("index", "sh000001")] = make_bars(["09:31", "13:30"], [3012.34, 3020.56])
+
+    class Cache:
+        def refresh(self, code, kind="stock", date=None):
+            return bars.get((kind, code))
+
+    monkeypatch.setattr(calASM_timeline, "get_market_rules",
+                        lambda code: ("sh000001", "上证指数", 1.10) if code.startswith("6") else ("sz399006", "创业板指", 1.20))
+    tl = build_timeline(frames, date=DATE, cache=Cache())
+    assert tl["codes"] == ["600001", "300002"] and tl["upto"] == 120 + 30
+    for i, (code, (_, merged, _)) in enumerate(frames.items()):
+        # 创业板指分钟线取不到时按最新收盘点位
+        level = 3020.56 if i == 0 else float(merged['index_close'].iloc[-1])
+        for (days, threshold), res in tl["results"].items():
+            p_base, i_base = base_closes(merged, DATE, days)
+            got = res["deviation"][i, tl["upto"] - 1]
+            assert got == cum_deviation(tl["prices"][i, tl["upto"] - 1], p_base, level, i_base)[2]
+            assert np.isnan(res["deviation"][i, tl["upto"]:]).all()